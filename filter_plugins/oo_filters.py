@@ -1,10 +1,13 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 # vim: expandtab:tabstop=4:shiftwidth=4
-# pylint: disable=no-name-in-module, import-error, wrong-import-order, ungrouped-imports
+# pylint: disable=no-name-in-module, import-error, wrong-import-order, ungrouped-imports, too-many-lines
+# Reason: too-many-lines because the filters ship apart from the roles, so this file carries its own
+#         copy of the certificate decoding helpers of openshift_cert_expiry.
 """
 Custom filters for use in openshift-ansible
 """
+import datetime
 import os
 import pdb
 import pkg_resources
@@ -28,6 +31,14 @@ try:
 except ImportError:
     pass
 
+HAS_CRYPTOGRAPHY = False
+try:
+    from cryptography import x509
+    from cryptography.hazmat.backends import default_backend
+    HAS_CRYPTOGRAPHY = True
+except ImportError:
+    pass
+
 try:
     # ansible-2.2
     # ansible.utils.unicode.to_unicode is deprecated in ansible-2.2,
@@ -491,6 +502,154 @@ def oo_parse_heat_stack_outputs(data):
     return revamped_outputs
 
 
+# OpenSSL short names of the subject attributes, as pyOpenSSL reports
+# them. Others are reported by dotted OID, like OpenSSL does for the
+# attributes it doesn't know.
+SUBJECT_SHORT_NAMES = {
+    '2.5.4.3': 'CN',
+    '2.5.4.4': 'SN',
+    '2.5.4.5': 'serialNumber',
+    '2.5.4.6': 'C',
+    '2.5.4.7': 'L',
+    '2.5.4.8': 'ST',
+    '2.5.4.9': 'street',
+    '2.5.4.10': 'O',
+    '2.5.4.11': 'OU',
+    '2.5.4.12': 'title',
+    '2.5.4.42': 'GN',
+    '0.9.2342.19200300.100.1.1': 'UID',
+    '0.9.2342.19200300.100.1.25': 'DC',
+    '1.2.840.113549.1.9.1': 'emailAddress',
+}
+
+
+# The certificate decoding helpers are shared with the
+# openshift_cert_expiry module of the openshift_certificate_expiry role,
+# keep them in sync. openshift_cert_expiry_decode_tests.py fails when
+# the copies differ.
+def decode_certificate(cert_string):
+    """Decode the subject, subject alternative names and expiration date of
+a PEM certificate, with the cryptography x509 API when it is installed
+and with pyOpenSSL otherwise. Both report the same values.
+
+Params:
+
+- `cert_string` (string) - a PEM certificate
+
+Returns:
+A 3-tuple of the form: (subject, subject_alt_names, not_after) where
+`subject` is a list of (short name, value) tuples, `subject_alt_names`
+is a list of names formatted like OpenSSL prints them, ex: 'DNS:foo' or
+'IP Address:172.30.0.1', and `not_after` is a naive UTC datetime
+    """
+    if HAS_CRYPTOGRAPHY:
+        return decode_certificate_cryptography(cert_string)
+    return decode_certificate_openssl(cert_string)
+
+
+def format_general_name(name):
+    """Format a cryptography x509 GeneralName like OpenSSL prints it"""
+    value = name.value
+    if isinstance(name, x509.IPAddress) and value.version == 6:
+        # OpenSSL doesn't compress IPv6 addresses
+        value = ':'.join('{:X}'.format(int(group, 16)) for group in value.exploded.split(':'))
+    elif isinstance(name, x509.RegisteredID):
+        value = value.dotted_string
+    for kind, prefix in [(x509.DNSName, 'DNS'), (x509.IPAddress, 'IP Address'), (x509.RFC822Name, 'email'),
+                         (x509.UniformResourceIdentifier, 'URI'), (x509.RegisteredID, 'Registered ID')]:
+        if isinstance(name, kind):
+            return '{}:{}'.format(prefix, value)
+    return 'othername:<unsupported>'
+
+
+def decode_certificate_cryptography(cert_string):
+    """decode_certificate() with the cryptography x509 API"""
+    if not isinstance(cert_string, bytes):
+        cert_string = cert_string.encode('ascii')
+    cert = x509.load_pem_x509_certificate(cert_string, default_backend())
+
+    subject = [(SUBJECT_SHORT_NAMES.get(attribute.oid.dotted_string, attribute.oid.dotted_string),
+                attribute.value)
+               for attribute in cert.subject]
+
+    try:
+        san = cert.extensions.get_extension_for_class(x509.SubjectAlternativeName)
+    except x509.ExtensionNotFound:
+        subject_alt_names = []
+    else:
+        subject_alt_names = [format_general_name(name) for name in san.value]
+
+    if hasattr(cert, 'not_valid_after_utc'):
+        not_after = cert.not_valid_after_utc.replace(tzinfo=None)
+    else:
+        not_after = cert.not_valid_after
+
+    return (subject, subject_alt_names, not_after)
+
+
+def decode_certificate_openssl(cert_string):
+    """decode_certificate() with pyOpenSSL"""
+    cert_loaded = OpenSSL.crypto.load_certificate(
+        OpenSSL.crypto.FILETYPE_PEM, cert_string)
+
+    subject = [(to_native(name), to_native(value))
+               for name, value in cert_loaded.get_subject().get_components()]
+
+    # To read SANs from a cert we must read the subjectAltName
+    # extension from the X509 Object. What makes this more difficult
+    # is that pyOpenSSL does not give extensions as a list, nor does
+    # it provide a count of all loaded extensions.
+    #
+    # Rather, extensions are REQUESTED by index. We must iterate over
+    # all extensions until we find the one called 'subjectAltName'. If
+    # we don't find that extension we'll eventually request an
+    # extension at an index where no extension exists (IndexError is
+    # raised). When that happens we know that the cert has no SANs so
+    # we break out of the loop.
+    i = 0
+    checked_all_extensions = False
+    while not checked_all_extensions:
+        try:
+            # Read the extension at index 'i'
+            ext = cert_loaded.get_extension(i)
+        except IndexError:
+            # We tried to read an extension but it isn't there, that
+            # means we ran out of extensions to check. Abort
+            san = None
+            checked_all_extensions = True
+        else:
+            # We were able to load the extension at index 'i'
+            if to_native(ext.get_short_name()) == 'subjectAltName':
+                san = ext
+                checked_all_extensions = True
+            else:
+                # Try reading the next extension
+                i += 1
+
+    if san is not None:
+        # The X509Extension object for subjectAltName prints as a
+        # string with the alt names separated by a comma and a
+        # space.
+        subject_alt_names = str(san).split(', ')
+    else:
+        subject_alt_names = []
+
+    # Grab the expiration date
+    not_after = datetime.datetime.strptime(
+        to_native(cert_loaded.get_notAfter()),
+        # example get_notAfter() => 20180922170439Z
+        '%Y%m%d%H%M%SZ')
+
+    return (subject, subject_alt_names, not_after)
+
+
+def to_native(value):
+    """pyOpenSSL returns bytes on python 3, make them a str"""
+    if isinstance(value, bytes) and not isinstance(value, str):
+        return value.decode('utf-8')
+    return value
+
+
 # pylint: disable=too-many-branches
 def oo_parse_named_certificates(certificates, named_certs_dir, internal_hostnames):
     """ Parses names from list of certificate hashes.
@@ -518,8 +677,8 @@ def oo_parse_named_certificates(certificates, named_certs_dir, internal_hostname
     if not isinstance(internal_hostnames, list):
         raise errors.AnsibleFilterError("|failed expects internal_hostnames is list")
 
-    if not HAS_OPENSSL:
-        raise errors.AnsibleFilterError("|missing OpenSSL python bindings")
+    if not HAS_CRYPTOGRAPHY and not HAS_OPENSSL:
+        raise errors.AnsibleFilterError("|missing cryptography or OpenSSL python bindings")
 
     for certificate in certificates:
         if 'names' in certificate.keys():
@@ -533,12 +692,10 @@ def oo_parse_named_certificates(certificates, named_certs_dir, internal_hostname
 
         try:
             st_cert = open(certificate['certfile'], 'rt').read()
-            cert = OpenSSL.crypto.load_certificate(OpenSSL.crypto.FILETYPE_PEM, st_cert)
-            certificate['names'].append(str(cert.get_subject().commonName.decode()))
-            for i in range(cert.get_extension_count()):
-                if cert.get_extension(i).get_short_name() == 'subjectAltName':
-                    for name in str(cert.get_extension(i)).replace('DNS:', '').split(', '):
-                        certificate['names'].append(name)
+            subject, subject_alt_names, _ = decode_certificate(st_cert)
+            certificate['names'].append(to_text(next(value for name, value in subject if name == 'CN')))
+            for name in subject_alt_names:
+                certificate['names'].append(name.replace('DNS:', ''))
         except Exception:
             raise errors.AnsibleFilterError(("|failed to parse certificate '%s', " % certificate['certfile'] +
                                              "please specify certificate names in host inventory"))
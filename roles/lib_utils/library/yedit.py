@@ -29,10 +29,12 @@
 import json
 import os
 import re
+from collections import OrderedDict
 # pylint: disable=import-error
 import ruamel.yaml as yaml
 import shutil
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.six import string_types
 
 DOCUMENTATION = '''
 ---
@@ -135,6 +137,16 @@ options:
     required: false
     default: true
     aliases: []
+  edits:
+    description:
+    - A list of edits applied in order, only with state=present. Each is a hash of
+    - key, value, value_type, update, append, index, curr_value,
+    - curr_value_format and state (present or absent, present by default).
+    - The file is loaded and written once for the whole list and the
+    - changed status of every edit is returned in 'edits'.
+    required: false
+    default: None
+    aliases: []
 author:
 - "Kenny Woodson <kwoodson@redhat.com>"
 extends_documentation_fragment: []
@@ -162,6 +174,24 @@ EXAMPLES = '''
 # a:
 #   b:
 #     c: d
+
+# Several edits of the same file, written once
+- name: edit the master config
+  yedit:
+    src: /etc/origin/master/master-config.yaml
+    edits:
+    - key: kubernetesMasterConfig.apiServerArguments.storage-backend
+      value: [etcd3]
+    - key: corsAllowedOrigins
+      value: master.example.com
+      append: true
+    - key: assetConfig.logoutURL
+      state: absent
+# Results:
+# edits:
+# - changed: true
+#   key: kubernetesMasterConfig.apiServerArguments.storage-backend
+# ...
 '''
 
 
@@ -170,25 +200,100 @@ class YeditException(Exception):
     pass
 
 
-class Yedit(object):
-    ''' Class to modify yaml files '''
+class KeyPath(object):
+    ''' A validated and tokenized Yedit key
+
+        Keys are parsed once per (key, separator), see KeyPath.get. Each
+        token is a tuple of (list index, dict key), one of them None.
+    '''
     re_valid_key = r"(((\[-?\d+\])|([0-9a-zA-Z%s/_-]+)).?)+$"
     re_key = r"(?:\[(-?\d+)\])|([0-9a-zA-Z%s/_-]+)"
     com_sep = set(['.', '#', '|', ':'])
 
+    # number of parsed keys kept by KeyPath.get
+    cache_size = 1024
+    _cache = OrderedDict()
+    _patterns = {}
+
+    def __init__(self, key, sep='.'):
+        self.key = key
+        self.sep = sep
+        if not isinstance(key, string_types):
+            # None, numbers... are invalid, like the empty key
+            self.valid = False
+            self.tokens = []
+            return
+        valid_re, key_re = KeyPath.patterns(sep)
+        self.valid = bool(key) and valid_re.match(key) is not None
+        self.tokens = [(int(arr_ind) if arr_ind else None, dict_key or None)
+                       for arr_ind, dict_key in key_re.findall(key)]
+
+    @staticmethod
+    def patterns(sep='.'):
+        ''' the compiled validation and tokenizing regexes of a separator '''
+        try:
+            return KeyPath._patterns[sep]
+        except KeyError:
+            common_separators = ''.join(KeyPath.com_sep - set([sep]))
+            patterns = (re.compile(KeyPath.re_valid_key % common_separators),
+                        re.compile(KeyPath.re_key % common_separators))
+            KeyPath._patterns[sep] = patterns
+            return patterns
+
+    @staticmethod
+    def get(key, sep='.'):
+        ''' return the parsed key, from the cache of the recently used ones '''
+        if not isinstance(key, string_types):
+            # not worth caching, and might not even be hashable
+            return KeyPath(key, sep)
+        cache_key = (key, sep)
+        try:
+            path = KeyPath._cache.pop(cache_key)
+        except KeyError:
+            path = KeyPath(key, sep)
+            while len(KeyPath._cache) >= KeyPath.cache_size:
+                KeyPath._cache.popitem(last=False)
+        KeyPath._cache[cache_key] = path
+        return path
+
+    @staticmethod
+    def walk(data, tokens):
+        ''' follow the tokens down data, None when one of them is missing '''
+        for arr_ind, dict_key in tokens:
+            if dict_key is not None and isinstance(data, dict):
+                data = data.get(dict_key, None)
+            elif (arr_ind is not None and isinstance(data, list) and
+                  arr_ind <= len(data) - 1):
+                data = data[arr_ind]
+            else:
+                return None
+
+        return data
+
+
+class Yedit(object):
+    ''' Class to modify yaml files '''
+    re_valid_key = KeyPath.re_valid_key
+    re_key = KeyPath.re_key
+    com_sep = KeyPath.com_sep
+    # read only loads skip the round trip, with libyaml when it is available
+    read_only_loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
     # pylint: disable=too-many-arguments
     def __init__(self,
                  filename=None,
                  content=None,
                  content_type='yaml',
                  separator='.',
-                 backup=False):
+                 backup=False,
+                 read_only=False):
         self.content = content
         self._separator = separator
         self.filename = filename
         self.__yaml_dict = content
         self.content_type = content_type
         self.backup = backup
+        self.read_only = read_only
         self.load(content_type=self.content_type)
         if self.__yaml_dict is None:
             self.__yaml_dict = {}
@@ -216,17 +321,12 @@ class Yedit(object):
     @staticmethod
     def parse_key(key, sep='.'):
         '''parse the key allowing the appropriate separator'''
-        common_separators = list(Yedit.com_sep - set([sep]))
-        return re.findall(Yedit.re_key % ''.join(common_separators), key)
+        return KeyPath.patterns(sep)[1].findall(key)
 
     @staticmethod
     def valid_key(key, sep='.'):
         '''validate the incoming key'''
-        common_separators = list(Yedit.com_sep - set([sep]))
-        if not re.match(Yedit.re_valid_key % ''.join(common_separators), key):
-            return False
-
-        return True
+        return KeyPath.get(key, sep).valid
 
     @staticmethod
     def remove_entry(data, key, sep='.'):
@@ -238,29 +338,22 @@ class Yedit(object):
             del data[:]
             return True
 
-        if not (key and Yedit.valid_key(key, sep)) and \
-           isinstance(data, (list, dict)):
+        path = KeyPath.get(key, sep)
+        if not path.valid and isinstance(data, (list, dict)):
             return None
 
-        key_indexes = Yedit.parse_key(key, sep)
-        for arr_ind, dict_key in key_indexes[:-1]:
-            if dict_key and isinstance(data, dict):
-                data = data.get(dict_key, None)
-            elif (arr_ind and isinstance(data, list) and
-                  int(arr_ind) <= len(data) - 1):
-                data = data[int(arr_ind)]
-            else:
-                return None
+        key_indexes = path.tokens
+        data = KeyPath.walk(data, key_indexes[:-1])
 
         # process last index for remove
         # expected list entry
-        if key_indexes[-1][0]:
-            if isinstance(data, list) and int(key_indexes[-1][0]) <= len(data) - 1:  # noqa: E501
-                del data[int(key_indexes[-1][0])]
+        if key_indexes[-1][0] is not None:
+            if isinstance(data, list) and key_indexes[-1][0] <= len(data) - 1:
+                del data[key_indexes[-1][0]]
                 return True
 
         # expected dict entry
-        elif key_indexes[-1][1]:
+        elif key_indexes[-1][1] is not None:
             if isinstance(data, dict):
                 del data[key_indexes[-1][1]]
                 return True
@@ -272,15 +365,15 @@ class Yedit(object):
             key = a#b
             return c
         '''
+        path = KeyPath.get(key, sep)
         if key == '':
             pass
-        elif (not (key and Yedit.valid_key(key, sep)) and
-              isinstance(data, (list, dict))):
+        elif not path.valid and isinstance(data, (list, dict)):
             return None
 
-        key_indexes = Yedit.parse_key(key, sep)
+        key_indexes = path.tokens
         for arr_ind, dict_key in key_indexes[:-1]:
-            if dict_key:
+            if dict_key is not None:
                 if isinstance(data, dict) and dict_key in data and data[dict_key]:  # noqa: E501
                     data = data[dict_key]
                     continue
@@ -291,9 +384,9 @@ class Yedit(object):
                 data[dict_key] = {}
                 data = data[dict_key]
 
-            elif (arr_ind and isinstance(data, list) and
-                  int(arr_ind) <= len(data) - 1):
-                data = data[int(arr_ind)]
+            elif (arr_ind is not None and isinstance(data, list) and
+                  arr_ind <= len(data) - 1):
+                data = data[arr_ind]
             else:
                 return None
 
@@ -302,11 +395,12 @@ class Yedit(object):
 
         # process last index for add
         # expected list entry
-        elif key_indexes[-1][0] and isinstance(data, list) and int(key_indexes[-1][0]) <= len(data) - 1:  # noqa: E501
-            data[int(key_indexes[-1][0])] = item
+        elif key_indexes[-1][0] is not None and isinstance(data, list) and \
+                key_indexes[-1][0] <= len(data) - 1:
+            data[key_indexes[-1][0]] = item
 
         # expected dict entry
-        elif key_indexes[-1][1] and isinstance(data, dict):
+        elif key_indexes[-1][1] is not None and isinstance(data, dict):
             data[key_indexes[-1][1]] = item
 
         return data
@@ -318,42 +412,50 @@ class Yedit(object):
             key = a.b
             return c
         '''
+        path = KeyPath.get(key, sep)
         if key == '':
             pass
-        elif (not (key and Yedit.valid_key(key, sep)) and
-              isinstance(data, (list, dict))):
+        elif not path.valid and isinstance(data, (list, dict)):
             return None
 
-        key_indexes = Yedit.parse_key(key, sep)
-        for arr_ind, dict_key in key_indexes:
-            if dict_key and isinstance(data, dict):
-                data = data.get(dict_key, None)
-            elif (arr_ind and isinstance(data, list) and
-                  int(arr_ind) <= len(data) - 1):
-                data = data[int(arr_ind)]
-            else:
-                return None
-
-        return data
+        return KeyPath.walk(data, path.tokens)
 
     def write(self):
         ''' write to file '''
         if not self.filename:
             raise YeditException('Please specify a filename.')
 
+        if self.read_only:
+            raise YeditException('Cannot write a file loaded read only.')
+
+        # pylint: disable=no-member
+        if hasattr(self.yaml_dict, 'fa'):
+            self.yaml_dict.fa.set_block_style()
+
+        contents = yaml.dump(self.yaml_dict, Dumper=yaml.RoundTripDumper)
+
+        # Nothing changed, leave the file, its backup and its watchers alone
+        if self.read() == contents:
+            return (False, self.yaml_dict)
+
         if self.backup and self.file_exists():
             shutil.copy(self.filename, self.filename + '.orig')
 
         tmp_filename = self.filename + '.yedit'
         with open(tmp_filename, 'w') as yfd:
-            # pylint: disable=no-member
-            if hasattr(self.yaml_dict, 'fa'):
-                self.yaml_dict.fa.set_block_style()
-
-            yfd.write(yaml.dump(self.yaml_dict, Dumper=yaml.RoundTripDumper))
+            yfd.write(contents)
+            yfd.flush()
+            os.fsync(yfd.fileno())
 
         os.rename(tmp_filename, self.filename)
 
+        # the rename itself is only durable once the directory is synced
+        dir_fd = os.open(os.path.dirname(os.path.abspath(self.filename)), os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
         return (True, self.yaml_dict)
 
     def read(self):
@@ -391,7 +493,9 @@ class Yedit(object):
 
         # check if it is yaml
         try:
-            if content_type == 'yaml' and contents:
+            if content_type == 'yaml' and contents and self.read_only:
+                self.yaml_dict = yaml.load(contents, Yedit.read_only_loader)
+            elif content_type == 'yaml' and contents:
                 self.yaml_dict = yaml.load(contents, yaml.RoundTripLoader)
                 # pylint: disable=no-member
                 if hasattr(self.yaml_dict, 'fa'):
@@ -590,13 +694,61 @@ class Yedit(object):
 
         return (False, self.yaml_dict)
 
+    @staticmethod
+    def process_edits(edits, yamlfile):
+        '''run through a list of edits and process them one-by-one'''
+        results = []
+        for edit in edits:
+            if not isinstance(edit, dict) or 'key' not in edit:
+                return {'failed': True,
+                        'msg': 'Every edit requires a key. edit=[%s]' % edit}
+
+            state = edit.get('state', 'present')
+            if state == 'absent':
+                if edit.get('update'):
+                    rval = yamlfile.pop(edit['key'], edit.get('value'))
+                else:
+                    rval = yamlfile.delete(edit['key'])
+
+            elif state == 'present':
+                if edit.get('value') is None:
+                    return {'failed': True,
+                            'msg': 'Edit of key [%s] requires a value.' % edit['key']}
+
+                value = parse_value(edit['value'], edit.get('value_type', ''))
+                if edit.get('update'):
+                    curr_value = get_curr_value(parse_value(edit.get('curr_value')),
+                                                edit.get('curr_value_format', 'yaml'))
+
+                    rval = yamlfile.update(edit['key'], value, edit.get('index'), curr_value)
+
+                elif edit.get('append'):
+                    rval = yamlfile.append(edit['key'], value)
+                else:
+                    rval = yamlfile.put(edit['key'], value)
+
+            else:
+                return {'failed': True,
+                        'msg': 'Unkown state [%s] passed in edit of key [%s]' % (state, edit['key'])}
+
+            results.append({'key': edit['key'], 'changed': rval[0]})
+
+        return {'changed': any(result['changed'] for result in results),
+                'results': results}
+
     # pylint: disable=too-many-return-statements,too-many-branches
     @staticmethod
     def run_ansible(module):
         '''perform the idempotent crud operations'''
+        if module.params['edits'] and module.params['state'] != 'present':
+            return {'failed': True,
+                    'msg': 'Edits can only be applied with state=present, ' +
+                           'each edit has its own state.'}
+
         yamlfile = Yedit(filename=module.params['src'],
                          backup=module.params['backup'],
-                         separator=module.params['separator'])
+                         separator=module.params['separator'],
+                         read_only=module.params['state'] == 'list')
 
         if module.params['src']:
             rval = yamlfile.load()
@@ -644,13 +796,28 @@ class Yedit(object):
 
                 # We had no edits to make and the contents are the same
                 if yamlfile.yaml_dict == content and \
-                   module.params['value'] is None:
+                   module.params['value'] is None and \
+                   not module.params['edits']:
                     return {'changed': False,
                             'result': yamlfile.yaml_dict,
                             'state': "present"}
 
                 yamlfile.yaml_dict = content
 
+            # we were passed a list of edits; apply them all, write once
+            if module.params['edits']:
+                rval = Yedit.process_edits(module.params['edits'], yamlfile)
+                if 'failed' in rval:
+                    return rval
+
+                if rval['changed'] and module.params['src']:
+                    yamlfile.write()
+
+                return {'changed': rval['changed'],
+                        'result': yamlfile.yaml_dict,
+                        'edits': rval['results'],
+                        'state': "present"}
+
             # we were passed a value; parse it
             if module.params['value']:
                 value = parse_value(module.params['value'],
@@ -750,8 +917,9 @@ def main():
                                    type='str'),
             backup=dict(default=True, type='bool'),
             separator=dict(default='.', type='str'),
+            edits=dict(default=None, type='list'),
         ),
-        mutually_exclusive=[["curr_value", "index"], ['update', "append"]],
+        mutually_exclusive=[["curr_value", "index"], ['update', "append"], ['edits', 'value']],
         required_one_of=[["content", "src"]],
     )
 
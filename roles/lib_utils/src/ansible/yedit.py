@@ -68,8 +68,9 @@ def main():
                                    type='str'),
             backup=dict(default=True, type='bool'),
             separator=dict(default='.', type='str'),
+            edits=dict(default=None, type='list'),
         ),
-        mutually_exclusive=[["curr_value", "index"], ['update', "append"]],
+        mutually_exclusive=[["curr_value", "index"], ['update', "append"], ['edits', 'value']],
         required_one_of=[["content", "src"]],
     )
 
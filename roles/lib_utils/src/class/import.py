@@ -5,7 +5,9 @@
 import json
 import os
 import re
+from collections import OrderedDict
 # pylint: disable=import-error
 import ruamel.yaml as yaml
 import shutil
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.six import string_types
@@ -0,0 +1,319 @@
+#!/usr/bin/env python
+'''
+ Benchmark of the yedit key lookups
+'''
+# To run
+# python yedit_benchmark.py [--number N]
+#
+# Compares the lookups per second on a master-config sized document of
+# Yedit.get_entry with the key validated and tokenized on every call, as
+# it was before KeyPath, and with the parsed KeyPath cache. Also compares
+# the loads per second of the document with the round trip loader and with
+# the read only loader used by state=list.
+
+import argparse
+import os
+import re
+import sys
+import timeit
+
+# pylint: disable=invalid-name,import-error,wrong-import-position
+yedit_path = os.path.join('/'.join(os.path.realpath(__file__).split('/')[:-4]), 'library')  # noqa: E501
+sys.path.insert(0, yedit_path)
+
+import ruamel.yaml as yaml  # noqa: E402
+from yedit import Yedit  # noqa: E402
+
+MASTER_CONFIG = '''
+admissionConfig:
+  pluginConfig:
+    BuildDefaults:
+      configuration:
+        apiVersion: v1
+        env: []
+        kind: BuildDefaultsConfig
+        resources:
+          limits: {}
+          requests: {}
+    BuildOverrides:
+      configuration:
+        apiVersion: v1
+        kind: BuildOverridesConfig
+    openshift.io/ImagePolicy:
+      configuration:
+        apiVersion: v1
+        executionRules:
+        - matchImageAnnotations:
+          - key: images.openshift.io/deny-execution
+            value: 'true'
+          name: execution-denied
+          onResources:
+          - resource: pods
+          - resource: builds
+          reject: true
+          skipOnResolutionFailure: true
+        kind: ImagePolicyConfig
+apiLevels:
+- v1
+apiVersion: v1
+assetConfig:
+  extensionScripts: []
+  extensionStylesheets: []
+  logoutURL: ""
+  masterPublicURL: https://master.example.com:8443
+  metricsPublicURL: https://hawkular-metrics.apps.example.com/hawkular/metrics
+  publicURL: https://master.example.com:8443/console/
+  servingInfo:
+    bindAddress: 0.0.0.0:8443
+    bindNetwork: tcp4
+    certFile: master.server.crt
+    clientCA: ""
+    keyFile: master.server.key
+    maxRequestsInFlight: 0
+    requestTimeoutSeconds: 0
+controllerConfig:
+  serviceServingCert:
+    signer:
+      certFile: service-signer.crt
+      keyFile: service-signer.key
+controllers: '*'
+corsAllowedOrigins:
+- 127.0.0.1
+- localhost
+- 10.0.0.5
+- kubernetes.default
+- master.example.com
+dnsConfig:
+  bindAddress: 0.0.0.0:8053
+  bindNetwork: tcp4
+etcdClientInfo:
+  ca: master.etcd-ca.crt
+  certFile: master.etcd-client.crt
+  keyFile: master.etcd-client.key
+  urls:
+  - https://etcd1.example.com:2379
+  - https://etcd2.example.com:2379
+  - https://etcd3.example.com:2379
+etcdStorageConfig:
+  kubernetesStoragePrefix: kubernetes.io
+  kubernetesStorageVersion: v1
+  openShiftStoragePrefix: openshift.io
+  openShiftStorageVersion: v1
+imageConfig:
+  format: openshift/origin-${component}:${version}
+  latest: false
+kind: MasterConfig
+kubeletClientInfo:
+  ca: ca-bundle.crt
+  certFile: master.kubelet-client.crt
+  keyFile: master.kubelet-client.key
+  port: 10250
+kubernetesMasterConfig:
+  admissionConfig:
+    pluginConfig: {}
+  apiServerArguments:
+    storage-backend:
+    - etcd3
+    storage-media-type:
+    - application/vnd.kubernetes.protobuf
+  controllerArguments:
+    pod-eviction-timeout:
+    - 5m
+  masterCount: 3
+  masterIP: 10.0.0.5
+  podEvictionTimeout: ""
+  proxyClientInfo:
+    certFile: master.proxy-client.crt
+    keyFile: master.proxy-client.key
+  schedulerConfigFile: /etc/origin/master/scheduler.json
+  servicesNodePortRange: ""
+  servicesSubnet: 172.30.0.0/16
+masterClients:
+  externalKubernetesClientConnectionOverrides:
+    acceptContentTypes: application/vnd.kubernetes.protobuf,application/json
+    burst: 400
+    contentType: application/vnd.kubernetes.protobuf
+    qps: 200
+  externalKubernetesKubeConfig: ""
+  openshiftLoopbackClientConnectionOverrides:
+    acceptContentTypes: application/vnd.kubernetes.protobuf,application/json
+    burst: 600
+    contentType: application/vnd.kubernetes.protobuf
+    qps: 300
+  openshiftLoopbackKubeConfig: openshift-master.kubeconfig
+masterPublicURL: https://master.example.com:8443
+networkConfig:
+  clusterNetworkCIDR: 10.128.0.0/14
+  externalIPNetworkCIDRs:
+  - 0.0.0.0/0
+  hostSubnetLength: 9
+  networkPluginName: redhat/openshift-ovs-subnet
+  serviceNetworkCIDR: 172.30.0.0/16
+oauthConfig:
+  assetPublicURL: https://master.example.com:8443/console/
+  grantConfig:
+    method: auto
+  identityProviders:
+  - challenge: true
+    login: true
+    mappingMethod: claim
+    name: htpasswd_auth
+    provider:
+      apiVersion: v1
+      file: /etc/origin/master/htpasswd
+      kind: HTPasswdPasswordIdentityProvider
+  - challenge: false
+    login: true
+    mappingMethod: add
+    name: ldap_auth
+    provider:
+      apiVersion: v1
+      attributes:
+        email:
+        - mail
+        id:
+        - dn
+        name:
+        - cn
+        preferredUsername:
+        - uid
+      bindDN: ""
+      bindPassword: ""
+      ca: ldap-ca.crt
+      insecure: false
+      kind: LDAPPasswordIdentityProvider
+      url: ldaps://ldap.example.com/ou=users,dc=example,dc=com?uid
+  masterCA: ca-bundle.crt
+  masterPublicURL: https://master.example.com:8443
+  masterURL: https://master.example.com:8443
+  sessionConfig:
+    sessionMaxAgeSeconds: 3600
+    sessionName: ssn
+    sessionSecretsFile: /etc/origin/master/session-secrets.yaml
+  tokenConfig:
+    accessTokenMaxAgeSeconds: 86400
+    authorizeTokenMaxAgeSeconds: 500
+pauseControllers: false
+policyConfig:
+  bootstrapPolicyFile: /etc/origin/master/policy.json
+  openshiftInfrastructureNamespace: openshift-infra
+  openshiftSharedResourcesNamespace: openshift
+projectConfig:
+  defaultNodeSelector: ""
+  projectRequestMessage: ""
+  projectRequestTemplate: ""
+  securityAllocator:
+    mcsAllocatorRange: s0:/2
+    mcsLabelsPerProject: 5
+    uidAllocatorRange: 1000000000-1999999999/10000
+routingConfig:
+  subdomain: apps.example.com
+serviceAccountConfig:
+  limitSecretReferences: false
+  managedNames:
+  - default
+  - builder
+  - deployer
+  masterCA: ca-bundle.crt
+  privateKeyFile: serviceaccounts.private.key
+  publicKeyFiles:
+  - serviceaccounts.public.key
+servingInfo:
+  bindAddress: 0.0.0.0:8443
+  bindNetwork: tcp4
+  certFile: master.server.crt
+  clientCA: ca.crt
+  keyFile: master.server.key
+  maxRequestsInFlight: 500
+  namedCertificates:
+  - certFile: /etc/origin/master/named_certificates/master.example.com.crt
+    keyFile: /etc/origin/master/named_certificates/master.example.com.key
+    names:
+    - master.example.com
+  requestTimeoutSeconds: 3600
+volumeConfig:
+  dynamicProvisioningEnabled: true
+'''
+
+KEYS = [
+    'kubernetesMasterConfig.apiServerArguments.storage-backend[0]',
+    'servingInfo.namedCertificates[0].certFile',
+    'oauthConfig.identityProviders[1].provider.attributes.preferredUsername',
+    'admissionConfig.pluginConfig.BuildDefaults.configuration.env',
+    'etcdClientInfo.urls[2]',
+    'assetConfig.metricsPublicURL',
+    'masterClients.openshiftLoopbackClientConnectionOverrides.qps',
+    'projectConfig.defaultNodeSelector',
+    'networkConfig.clusterNetworkCIDR',
+    'oauthConfig.sessionConfig.sessionMaxAgeSeconds',
+]
+
+
+def legacy_get_entry(data, key, sep='.'):
+    ''' Yedit.get_entry validating and tokenizing the key on every call '''
+    common_separators = ''.join(list(Yedit.com_sep - set([sep])))
+    if key == '':
+        pass
+    elif (not (key and re.match(Yedit.re_valid_key % common_separators, key)) and
+          isinstance(data, (list, dict))):
+        return None
+
+    key_indexes = re.findall(Yedit.re_key % common_separators, key)
+    for arr_ind, dict_key in key_indexes:
+        if dict_key and isinstance(data, dict):
+            data = data.get(dict_key, None)
+        elif (arr_ind and isinstance(data, list) and
+              int(arr_ind) <= len(data) - 1):
+            data = data[int(arr_ind)]
+        else:
+            return None
+
+    return data
+
+
+def bench(get_entry, data, number):
+    ''' lookups per second of every key, the best of 3 runs '''
+    for key in KEYS:
+        if get_entry(data, key) is None:
+            raise AssertionError('%s was not found' % key)
+
+    def lookups():
+        ''' look up every key once '''
+        for key in KEYS:
+            get_entry(data, key)
+
+    best = min(timeit.repeat(lookups, number=number, repeat=3))
+    return number * len(KEYS) / best
+
+
+def bench_load(loader, number):
+    ''' loads per second of the document, the best of 3 runs '''
+    best = min(timeit.repeat(lambda: yaml.load(MASTER_CONFIG, loader), number=number, repeat=3))
+    return number / best
+
+
+def main():
+    ''' print the lookups per second before and after '''
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', type=int, default=20000,
+                        help='lookups of every key per run')
+    parser.add_argument('--loads', type=int, default=50,
+                        help='loads of the document per run')
+    args = parser.parse_args()
+
+    data = yaml.load(MASTER_CONFIG, yaml.RoundTripLoader)
+    before = bench(legacy_get_entry, data, args.number)
+    after = bench(Yedit.get_entry, data, args.number)
+    print('%-32s %12.0f lookups/s' % ('parsed on every call', before))
+    print('%-32s %12.0f lookups/s' % ('KeyPath cache', after))
+    print('%-32s %12.1fx' % ('speedup', after / before))
+
+    before = bench_load(yaml.RoundTripLoader, args.loads)
+    after = bench_load(Yedit.read_only_loader, args.loads)
+    print('%-32s %12.0f loads/s' % ('round trip load', before))
+    print('%-32s %12.0f loads/s' % ('read only load (%s)' % Yedit.read_only_loader.__name__, after))
+    print('%-32s %12.1fx' % ('speedup', after / before))
+
+
+if __name__ == '__main__':
+    main()
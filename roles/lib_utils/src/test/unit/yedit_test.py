@@ -23,12 +23,22 @@ import unittest
 yedit_path = os.path.join('/'.join(os.path.realpath(__file__).split('/')[:-4]), 'library')  # noqa: E501
 sys.path.insert(0, yedit_path)
 
-from yedit import Yedit  # noqa: E402
+from yedit import Yedit, YeditException, KeyPath  # noqa: E402
 
 # pylint: disable=too-many-public-methods
 # Silly pylint, moar tests!
 
 
+class FakeModule(object):
+    ''' stand-in for AnsibleModule with the yedit defaults '''
+    def __init__(self, **params):
+        self.params = dict(state='present', src=None, content=None, content_type='dict', key='',
+                           value=None, value_type='', update=False, append=False, index=None,
+                           curr_value=None, curr_value_format='yaml', backup=False, separator='.',
+                           edits=None)
+        self.params.update(params)
+
+
 class YeditTest(unittest.TestCase):
     '''
      Test class for yedit
@@ -268,6 +278,169 @@ class YeditTest(unittest.TestCase):
         yed.pop('a#b', 'c')
         self.assertTrue({'a': {'b': {'d': 2}}} == yed.yaml_dict)
 
+    def test_key_path_tokens(self):
+        '''test the key is tokenized once per key and separator'''
+        path = KeyPath.get('b:c:d[0]:[-1]:x', ':')
+        self.assertTrue(path.valid)
+        self.assertEqual([(None, 'b'), (None, 'c'), (None, 'd'), (0, None), (-1, None), (None, 'x')],
+                         path.tokens)
+        self.assertTrue(path is KeyPath.get('b:c:d[0]:[-1]:x', ':'))
+        self.assertFalse(path is KeyPath.get('b:c:d[0]:[-1]:x', '.'))
+        self.assertFalse(KeyPath.get('a.$b').valid)
+        self.assertFalse(KeyPath.get('').valid)
+
+    def test_key_path_not_a_string(self):
+        '''test keys which are not strings are invalid'''
+        for key in [None, 1, ['a']]:
+            self.assertFalse(KeyPath.get(key).valid)
+            self.assertEqual([], KeyPath.get(key).tokens)
+            self.assertEqual(None, Yedit.get_entry({'a': 1}, key))
+            self.assertEqual(None, Yedit.add_entry({'a': 1}, key, 2))
+
+        for key in [None, 1]:
+            rval = Yedit.run_ansible(FakeModule(src=YeditTest.filename, edits=[{'key': key, 'value': 1}]))
+            self.assertFalse(rval['changed'])
+        self.assertEqual(YeditTest.data, Yedit(YeditTest.filename).yaml_dict)
+
+    def test_key_path_cache_size(self):
+        '''test the least recently used keys are dropped from the cache'''
+        cache_size = KeyPath.cache_size
+        KeyPath.cache_size = 2
+        try:
+            first = KeyPath.get('first')
+            KeyPath.get('second')
+            self.assertTrue(first is KeyPath.get('first'))
+            KeyPath.get('third')
+            self.assertTrue(first is KeyPath.get('first'))
+            self.assertEqual(2, len(KeyPath._cache))  # pylint: disable=protected-access
+            self.assertTrue(('first', '.') in KeyPath._cache)  # pylint: disable=protected-access
+            self.assertFalse(('second', '.') in KeyPath._cache)  # pylint: disable=protected-access
+        finally:
+            KeyPath.cache_size = cache_size
+
+    def test_get_negative_index(self):
+        '''test a negative list index'''
+        yed = Yedit("yedit_test.yml", separator=':')
+        self.assertEqual('g', yed.get('b:c:d[-1]'))
+        self.assertEqual('x', yed.get('b:c:d[0]:e'))
+        self.assertEqual(None, yed.get('b:c:d[3]'))
+
+    def test_edits(self):
+        '''test a list of edits is applied in order and written once'''
+        module = FakeModule(src=YeditTest.filename, edits=[
+            {'key': 'x.y', 'value': [1, 2]},
+            {'key': 'x.y', 'value': 3, 'append': True},
+            {'key': 'x.y', 'value': 4, 'update': True, 'index': 0},
+            {'key': 'a', 'value': 'a'},
+            {'key': 'b.c', 'state': 'absent'},
+            {'key': 'missing', 'state': 'absent'},
+        ])
+        writes = []
+        write = Yedit.write
+        Yedit.write = lambda yed: writes.append(yed) or write(yed)
+        try:
+            rval = Yedit.run_ansible(module)
+        finally:
+            Yedit.write = write
+
+        self.assertTrue(rval['changed'])
+        self.assertEqual([True, True, True, False, True, False],
+                         [edit['changed'] for edit in rval['edits']])
+        self.assertEqual(['x.y', 'x.y', 'x.y', 'a', 'b.c', 'missing'],
+                         [edit['key'] for edit in rval['edits']])
+        self.assertEqual(1, len(writes))
+        yed = Yedit(YeditTest.filename)
+        self.assertEqual([4, 2, 3], yed.get('x.y'))
+        self.assertEqual({}, yed.get('b'))
+
+    def test_edits_unchanged(self):
+        '''test edits which change nothing do not write the file'''
+        module = FakeModule(src=YeditTest.filename, separator=':', edits=[
+            {'key': 'a', 'value': 'a'},
+            {'key': 'b:c:d', 'value': 'f', 'update': True, 'curr_value': 'f', 'curr_value_format': 'str'},
+            {'key': 'b:c:missing', 'state': 'absent'},
+        ])
+        mtime = os.stat(YeditTest.filename).st_mtime
+        rval = Yedit.run_ansible(module)
+        self.assertFalse(rval['changed'])
+        self.assertEqual([False, False, False], [edit['changed'] for edit in rval['edits']])
+        self.assertEqual(mtime, os.stat(YeditTest.filename).st_mtime)
+
+    def test_edits_invalid(self):
+        '''test an edit without a key or a value fails'''
+        rval = Yedit.run_ansible(FakeModule(src=YeditTest.filename, edits=[{'value': 1}]))
+        self.assertTrue(rval['failed'])
+        rval = Yedit.run_ansible(FakeModule(src=YeditTest.filename, edits=[{'key': 'a'}]))
+        self.assertTrue(rval['failed'])
+        rval = Yedit.run_ansible(FakeModule(src=YeditTest.filename, edits=[{'key': 'a', 'state': 'list'}]))
+        self.assertTrue(rval['failed'])
+
+        for state in ['absent', 'list']:
+            rval = Yedit.run_ansible(FakeModule(src=YeditTest.filename, state=state, edits=[{'key': 'a'}]))
+            self.assertTrue(rval['failed'])
+        self.assertEqual(YeditTest.data, Yedit(YeditTest.filename).yaml_dict)
+
+    def test_read_only_load(self):
+        '''test state=list returns the same results as a round trip load'''
+        kube_manager = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                                    '..', 'integration', 'files', 'kube-manager.yaml')
+        with open(YeditTest.filename, 'a') as yfd:
+            yfd.write('v:\n  yes: on\n  octal: 0o17\n  date: 2017-01-01\n  float: 1e3\n'
+                      '  anchor: &anchor {q: 1}\n  alias: *anchor\n  merge: {<<: *anchor, z: 2}\n')
+
+        for filename, keys in [(YeditTest.filename, ['', 'a', 'b.c.d', 'b.c.d[0].e', 'b.c.d[-1]', 'v',
+                                                     'v.merge', 'missing']),
+                               (kube_manager, ['', 'spec.containers[0].command', 'spec.volumes[1]',
+                                               'metadata.name', 'spec.containers[0].volumeMounts[1].readOnly'])]:
+            round_trip = Yedit(filename)
+            read_only = Yedit(filename, read_only=True)
+            self.assertFalse(hasattr(read_only.yaml_dict, 'fa'))
+            for key in keys:
+                rval = Yedit.run_ansible(FakeModule(src=filename, state='list', key=key))
+                self.assertEqual(round_trip.get(key) or ({} if key else None), rval['result'])
+                self.assertEqual(round_trip.get(key), read_only.get(key))
+
+    def test_read_only_write(self):
+        '''test a file loaded read only is not written'''
+        yed = Yedit(YeditTest.filename, read_only=True)
+        yed.put('a', 'b')
+        self.assertRaises(YeditException, yed.write)
+
+    def test_write_unchanged(self):
+        '''test an unchanged document is not written again'''
+        stat = os.stat(YeditTest.filename)
+        yed = Yedit(YeditTest.filename, backup=True)
+        self.assertEqual((False, yed.yaml_dict), yed.write())
+        self.assertEqual(stat, os.stat(YeditTest.filename))
+        self.assertFalse(os.path.exists(YeditTest.filename + '.orig'))
+
+        rval = Yedit.run_ansible(FakeModule(src=YeditTest.filename, backup=True))
+        self.assertFalse(rval['changed'])
+        self.assertEqual(stat, os.stat(YeditTest.filename))
+        self.assertFalse(os.path.exists(YeditTest.filename + '.orig'))
+
+    def test_write_changed(self):
+        '''test a changed document is synced, renamed over the file and backed up'''
+        with open(YeditTest.filename) as yfd:
+            original = yfd.read()
+        synced = []
+        fsync = os.fsync
+        os.fsync = lambda fd: synced.append(fd) or fsync(fd)
+        try:
+            yed = Yedit(YeditTest.filename, backup=True)
+            yed.put('a', 'b')
+            self.assertEqual((True, yed.yaml_dict), yed.write())
+        finally:
+            os.fsync = fsync
+
+        # the temporary file, then the directory
+        self.assertEqual(2, len(synced))
+        self.assertEqual('b', Yedit(YeditTest.filename).get('a'))
+        self.assertFalse(os.path.exists(YeditTest.filename + '.yedit'))
+        with open(YeditTest.filename + '.orig') as yfd:
+            self.assertEqual(original, yfd.read())
+        os.unlink(YeditTest.filename + '.orig')
+
     def tearDown(self):
         '''TearDown method'''
         os.unlink(YeditTest.filename)
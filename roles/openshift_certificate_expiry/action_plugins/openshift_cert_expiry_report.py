@@ -0,0 +1,191 @@
+"""
+Controller side, streaming, aggregation of certificate expiry results.
+
+With `state: check` the action runs the openshift_cert_expiry module on the
+host and streams the examined certificates into an on-disk index under
+`report_dir` as soon as the host returns, keeping only the summary of the
+host in its result. The index buckets certificates by expiry date, one
+JSON-lines file per day, and a running summary of the whole run is updated
+with every host.
+
+`state: reset` (run once, before the checks) empties the index and
+`state: finalize` (run once, after the checks) merges the buckets into
+`expiry.jsonl`, every certificate of every host sorted by expiry date.
+Memory use is bounded by the certificates of one host, or of one day,
+whatever the number of hosts.
+"""
+# pylint: disable=missing-docstring
+
+import fcntl
+import json
+import os
+import shutil
+import tempfile
+
+from ansible.plugins.action import ActionBase
+
+# The result categories of the openshift_cert_expiry module
+CERT_CATEGORIES = ['ocp_certs', 'kubeconfigs', 'etcd', 'router', 'registry', 'secrets', 'discovered']
+
+
+class ExpiryReportIndex(object):
+    """ On-disk index of the certificates examined across a cluster
+
+        Attributes:
+            report_dir (str): directory of the index and of the reports
+    """
+    index_dirname = 'index'
+    summary_filename = 'summary.json'
+    report_filename = 'expiry.jsonl'
+    lock_filename = '.lock'
+
+    def __init__(self, report_dir):
+        self.report_dir = report_dir
+
+    def path(self, *names):
+        return os.path.join(self.report_dir, *names)
+
+    def lock(self):
+        """ Exclusive lock of the index, hosts are added by concurrent forks """
+        if not os.path.isdir(self.path(self.index_dirname)):
+            os.makedirs(self.path(self.index_dirname))
+        lock_file = open(self.path(self.lock_filename), 'a')
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    def reset(self):
+        """ Remove the index and reports of an earlier run """
+        lock_file = self.lock()
+        try:
+            shutil.rmtree(self.path(self.index_dirname))
+            os.makedirs(self.path(self.index_dirname))
+            for filename in [self.summary_filename, self.report_filename]:
+                if os.path.exists(self.path(filename)):
+                    os.unlink(self.path(filename))
+        finally:
+            lock_file.close()
+
+    def summary(self):
+        """ The running summary of the run
+
+            Returns:
+                dict: host count and certificate counts by health, the
+                      earliest expiry date and the host of that certificate
+        """
+        try:
+            with open(self.path(self.summary_filename), 'r') as summary_file:
+                return json.load(summary_file)
+        except (IOError, OSError, ValueError):
+            return dict(hosts=0, total=0, ok=0, warning=0, expired=0, earliest_expiry=None, earliest_expiry_host=None)
+
+    def write_json(self, filename, data):
+        """ Atomically replace a report file """
+        fd, tmp_filename = tempfile.mkstemp(dir=self.report_dir, prefix='.' + filename)
+        with os.fdopen(fd, 'w') as report_file:
+            json.dump(data, report_file, indent=2, sort_keys=True)
+        os.rename(tmp_filename, self.path(filename))
+
+    def add_host(self, host, check_results, summary):
+        """ Add the certificates examined on a host to the index
+
+            Args:
+                host (str): the inventory hostname
+                check_results (dict): the check_results of the module
+                summary (dict): the summary of the module
+        """
+        buckets = dict()
+        for category in CERT_CATEGORIES:
+            for cert in check_results.get(category, []):
+                cert = dict(cert, host=host, category=category)
+                # expiry is 'YYYY-MM-DD HH:MM:SS', bucket by day
+                buckets.setdefault(cert['expiry'][:10], []).append(cert)
+
+        lock_file = self.lock()
+        try:
+            for day, certs in buckets.items():
+                with open(self.path(self.index_dirname, day + '.jsonl'), 'a') as bucket:
+                    for cert in certs:
+                        bucket.write(json.dumps(cert, sort_keys=True) + '\n')
+
+            running = self.summary()
+            running['hosts'] += 1
+            for key in ['total', 'ok', 'warning', 'expired']:
+                running[key] += summary.get(key, 0)
+            if buckets:
+                earliest = min((cert for certs in buckets.values() for cert in certs),
+                               key=lambda cert: cert['expiry'])
+                if running['earliest_expiry'] is None or earliest['expiry'] < running['earliest_expiry']:
+                    running['earliest_expiry'] = earliest['expiry']
+                    running['earliest_expiry_host'] = host
+            self.write_json(self.summary_filename, running)
+        finally:
+            lock_file.close()
+
+    def finalize(self):
+        """ Merge the index into the report of every certificate sorted by
+            expiry date, one bucket in memory at a time
+
+            Returns:
+                dict: the summary of the run
+        """
+        lock_file = self.lock()
+        try:
+            fd, tmp_filename = tempfile.mkstemp(dir=self.report_dir, prefix='.' + self.report_filename)
+            with os.fdopen(fd, 'w') as report:
+                for bucket_filename in sorted(os.listdir(self.path(self.index_dirname))):
+                    with open(self.path(self.index_dirname, bucket_filename), 'r') as bucket:
+                        lines = [(json.loads(line), line) for line in bucket]
+                    lines.sort(key=lambda cert_line: (cert_line[0]['expiry'], cert_line[0]['host'],
+                                                      cert_line[0]['category'], cert_line[0]['path']))
+                    report.writelines(line for _, line in lines)
+            os.rename(tmp_filename, self.path(self.report_filename))
+            summary = self.summary()
+            self.write_json(self.summary_filename, summary)
+            return summary
+        finally:
+            lock_file.close()
+
+
+class ActionModule(ActionBase):
+
+    TRANSFERS_FILES = False
+
+    def run(self, tmp=None, task_vars=None):
+        result = super(ActionModule, self).run(tmp, task_vars)
+        task_vars = task_vars or {}
+
+        module_args = dict(self._task.args)
+        state = module_args.pop('state', 'check')
+        report_dir = module_args.pop('report_dir', None)
+        if not report_dir:
+            result['failed'] = True
+            result['msg'] = 'report_dir is required'
+            return result
+        index = ExpiryReportIndex(os.path.expanduser(report_dir))
+
+        if state == 'reset':
+            index.reset()
+            result['changed'] = True
+            return result
+
+        if state == 'finalize':
+            result['summary'] = index.finalize()
+            result['report'] = index.path(index.report_filename)
+            result['changed'] = True
+            return result
+
+        if state != 'check':
+            result['failed'] = True
+            result['msg'] = 'state must be one of reset, check or finalize, not {0}'.format(state)
+            return result
+
+        module_result = self._execute_module(module_name='openshift_cert_expiry', module_args=module_args,
+                                             task_vars=task_vars, tmp=tmp)
+        if module_result.get('failed') or 'check_results' not in module_result:
+            result.update(module_result)
+            return result
+
+        index.add_host(task_vars['inventory_hostname'], module_result.pop('check_results'),
+                       module_result.get('summary', {}))
+        result.update(module_result)
+        return result
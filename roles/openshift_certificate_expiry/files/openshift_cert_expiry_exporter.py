@@ -0,0 +1,322 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""
+Continuous certificate expiry exporter.
+
+Examines the same certificates as the openshift_cert_expiry module, with its
+scanning functions, and writes their expiry as metrics for the Prometheus
+node_exporter textfile collector:
+
+    openshift_cert_expiry_seconds_remaining{category="etcd",cn="...",path="..."} 31535999
+    openshift_cert_expiry_timestamp_seconds{category="etcd",cn="...",path="..."} 1537635879
+
+The directories holding the certificates and their configuration are watched
+with inotify. The metrics are only written again when something changes in
+them or when a day boundary is crossed, and then only the certificates that
+changed are parsed again (see CertMetadataCache). Without inotify, the
+directories are rescanned every --poll-interval seconds.
+
+The openshift_cert_expiry module is looked up next to this script, then in
+the library directory of the role.
+"""
+# pylint: disable=invalid-name
+
+from __future__ import print_function
+
+import argparse
+import ctypes
+import ctypes.util
+import datetime
+import os
+import select
+import sys
+import tempfile
+import time
+
+sys.path = [os.path.dirname(os.path.realpath(__file__)),
+            os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'library')] + sys.path
+
+# pylint: disable=import-error,wrong-import-position
+import openshift_cert_expiry  # noqa: E402
+
+# Epoch of the expiry timestamps
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+class Inotify(object):
+    """ Minimal inotify binding, waiting for any change in a set of directories
+
+        Raises:
+            OSError: inotify is not available
+    """
+    # Creating, replacing, removing or rewriting a file, see inotify(7)
+    IN_ATTRIB = 0x4
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_DELETE_SELF = 0x400
+    IN_MOVE_SELF = 0x800
+    MASK = IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | \
+        IN_DELETE_SELF | IN_MOVE_SELF
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    def __init__(self):
+        try:
+            self.libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            init = self.libc.inotify_init1
+        except (OSError, AttributeError) as ex:
+            raise OSError('inotify is not available: {0}'.format(ex))
+        self.fd = init(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+    def watch(self, path):
+        """ Watch a directory, again after it was replaced. Watching a
+            directory which doesn't exist is not an error.
+
+            Returns:
+                bool: the directory is watched
+        """
+        return self.libc.inotify_add_watch(self.fd, path.encode('utf-8'), self.MASK) >= 0
+
+    def wait(self, timeout):
+        """ Wait for changes in the watched directories
+
+            Args:
+                timeout (float): seconds to wait at most
+            Returns:
+                bool: something changed
+        """
+        readable = select.select([self.fd], [], [], max(timeout, 0))[0]
+        if not readable:
+            return False
+        self.drain()
+        return True
+
+    def drain(self):
+        """ Discard the pending events """
+        while True:
+            try:
+                if not os.read(self.fd, 65536):
+                    return
+            except OSError:
+                # EAGAIN, every event was read
+                return
+
+    def close(self):
+        """ Stop watching every directory """
+        os.close(self.fd)
+
+
+class Poller(object):
+    """ Stand-in for Inotify, reporting a change every `interval` seconds """
+
+    def __init__(self, interval):
+        self.interval = interval
+
+    @staticmethod
+    def watch(_):
+        """ Every directory is rescanned, nothing to watch """
+        return True
+
+    def wait(self, timeout):
+        """ Sleep until the next poll, or `timeout` if it comes first
+
+            Returns:
+                bool: it is time to poll
+        """
+        if timeout < self.interval:
+            time.sleep(max(timeout, 0))
+            return False
+        time.sleep(self.interval)
+        return True
+
+    def drain(self):
+        """ No events are queued while polling """
+        pass
+
+    def close(self):
+        """ Nothing to release while polling """
+        pass
+
+
+def escape_label(value):
+    """ Escape a Prometheus label value """
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_metrics(classified, now, scanned_at):
+    """ Format the classified certificates as Prometheus text exposition
+
+        Args:
+            classified (dict): result of scan_certificates
+            now (datetime): UTC time the seconds remaining are counted from
+            scanned_at (float): unix time of the scan
+        Returns:
+            str: the metrics
+    """
+    lines = [
+        '# HELP openshift_cert_expiry_seconds_remaining Seconds until the certificate expires.',
+        '# TYPE openshift_cert_expiry_seconds_remaining gauge',
+    ]
+    timestamps = [
+        '# HELP openshift_cert_expiry_timestamp_seconds Expiry date of the certificate as a unix timestamp.',
+        '# TYPE openshift_cert_expiry_timestamp_seconds gauge',
+    ]
+    for category in openshift_cert_expiry.CERT_CATEGORIES:
+        for cert in classified[category]:
+            expiry = datetime.datetime.strptime(cert['expiry'], openshift_cert_expiry.CERT_EXPIRY_FORMAT)
+            labels = '{{category="{0}",cn="{1}",path="{2}"}}'.format(
+                category, escape_label(cert['cert_cn']), escape_label(cert['path']))
+            lines.append('openshift_cert_expiry_seconds_remaining{0} {1:d}'.format(
+                labels, int((expiry - now).total_seconds())))
+            timestamps.append('openshift_cert_expiry_timestamp_seconds{0} {1:d}'.format(
+                labels, int((expiry - EPOCH).total_seconds())))
+    lines.extend(timestamps)
+    lines.extend([
+        '# HELP openshift_cert_expiry_last_scan_timestamp_seconds Time of the last certificate scan.',
+        '# TYPE openshift_cert_expiry_last_scan_timestamp_seconds gauge',
+        'openshift_cert_expiry_last_scan_timestamp_seconds {0:d}'.format(int(scanned_at)),
+    ])
+    return '\n'.join(lines) + '\n'
+
+
+def write_textfile(path, content):
+    """ Atomically replace the metrics file, the collector must never read
+        a partial one
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix='.' + os.path.basename(path))
+    try:
+        with os.fdopen(fd, 'w') as textfile:
+            textfile.write(content)
+        os.chmod(tmp_path, 0o644)
+        os.rename(tmp_path, path)
+    except (IOError, OSError):
+        os.unlink(tmp_path)
+        raise
+
+
+def seconds_to_next_day(now):
+    """ Seconds from `now` (local time) to the next midnight """
+    tomorrow = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time())
+    return (tomorrow - now).total_seconds()
+
+
+class Exporter(object):
+    """ Scans the certificates and writes the metrics file
+
+        Attributes:
+            args (argparse.Namespace): command line options
+            cache (CertMetadataCache): metadata of the parsed certificates
+            watched (set): directories watched for changes
+    """
+
+    def __init__(self, args, watcher):
+        self.args = args
+        self.watcher = watcher
+        self.cache = openshift_cert_expiry.CertMetadataCache(args.cache_path or None)
+        self.watched = set()
+
+    def watch_paths(self, cert_checks):
+        """ The directories a change of the certificates would happen in """
+        paths = set([os.path.join(self.args.config_base, 'master'), os.path.join(self.args.config_base, 'node'),
+                     self.args.config_base, '/etc/etcd'])
+        for check in cert_checks:
+            if check['kind'] in ['file', 'kubeconfig']:
+                paths.add(os.path.dirname(check['path']))
+        for root in self.args.discovery_path:
+            if os.path.isfile(root):
+                paths.add(os.path.dirname(root))
+            for dirpath, _, _ in os.walk(root):
+                paths.add(dirpath)
+        return paths
+
+    def scan(self):
+        """ Scan the certificates, write the metrics and watch any new directory
+
+            Returns:
+                dict: result of scan_certificates
+        """
+        cert_checks = openshift_cert_expiry.collect_cert_checks(
+            self.args.config_base, discovery_paths=self.args.discovery_path, include_secrets=False)
+        # Certificates removed between collecting and reading them are
+        # picked up by the next scan
+        cert_checks = [check for check in cert_checks
+                       if check['kind'] not in ['file', 'kubeconfig'] or os.path.exists(check['path'])]
+
+        now = datetime.datetime.utcnow()
+        classified = openshift_cert_expiry.scan_certificates(
+            cert_checks, now, datetime.timedelta(days=self.args.warning_days), self.args.workers, self.cache)
+        self.cache.save()
+        for unparsable in classified['unparsable']:
+            print('skipping {0}: {1}'.format(unparsable['path'], unparsable['error']), file=sys.stderr)
+        write_textfile(self.args.textfile, format_metrics(classified, now, time.time()))
+
+        # Watching a directory twice is a no-op, watching them all again
+        # also picks up the directories which were replaced or created
+        self.watched = set(path for path in self.watch_paths(cert_checks) if self.watcher.watch(path))
+        return classified
+
+    def run(self, iterations=None):
+        """ Scan, then scan again on every change or day boundary
+
+            Args:
+                iterations (int): number of scans, forever by default
+        """
+        scans = 0
+        while True:
+            self.scan()
+            scans += 1
+            if iterations is not None and scans >= iterations:
+                return
+            # Past midnight, so the days remaining changed
+            if self.watcher.wait(seconds_to_next_day(datetime.datetime.now()) + 1):
+                # Let a certificate rotation finish writing every file
+                time.sleep(self.args.settle)
+                self.watcher.drain()
+
+
+def parse_args(argv=None):
+    """ Parse the command line options """
+    parser = argparse.ArgumentParser(description='Export certificate expiry dates for the Prometheus '
+                                                 'node_exporter textfile collector')
+    parser.add_argument('--textfile', required=True,
+                        help='metrics file to write, ex: /var/lib/node_exporter/textfile/cert_expiry.prom')
+    parser.add_argument('--config-base', default='/etc/origin', help='base path to OCP system settings')
+    parser.add_argument('--discovery-path', action='append', default=[],
+                        help='also export every PEM certificate found in this directory, may be repeated')
+    parser.add_argument('--cache-path', default='/var/cache/openshift_cert_expiry.json',
+                        help="cache of the parsed certificates, '' to disable")
+    parser.add_argument('--warning-days', type=int, default=30)
+    parser.add_argument('--workers', type=int, default=1, help='processes parsing certificates')
+    parser.add_argument('--poll-interval', type=int, default=300,
+                        help='seconds between scans when inotify is not available')
+    parser.add_argument('--settle', type=float, default=1.0,
+                        help='seconds to wait after a change before scanning')
+    parser.add_argument('--once', action='store_true', help='write the metrics once and exit')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """ Export the certificate expiry dates until interrupted """
+    args = parse_args(argv)
+    try:
+        watcher = Inotify()
+    except OSError as ex:
+        print('{0}, polling every {1} seconds'.format(ex, args.poll_interval), file=sys.stderr)
+        watcher = Poller(args.poll_interval)
+    try:
+        Exporter(args, watcher).run(1 if args.once else None)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
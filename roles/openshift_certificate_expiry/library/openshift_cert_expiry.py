@@ -1,17 +1,43 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
-# pylint: disable=line-too-long,invalid-name
+# pylint: disable=line-too-long,invalid-name,too-many-lines
+# Reason: Disable pylint too-many-lines because we don't want to split up this file.
+# Status: Permanently disabled to keep this module as self-contained as possible.
 
 """For details on this module see DOCUMENTATION (below)"""
 
+import base64
 import datetime
+import functools
+import hashlib
+import json
+import multiprocessing
 import os
+import shutil
+import ssl
 import subprocess
+import tempfile
 
-from six.moves import configparser
+from six.moves import configparser, http_client
+from six.moves.urllib.parse import urlencode
+from six.moves.urllib.request import build_opener, HTTPSHandler, Request
 
 import yaml
-import OpenSSL.crypto
+
+# Certificates are decoded with cryptography if it's available, falling
+# back to pyOpenSSL
+try:
+    from cryptography import x509
+    from cryptography.hazmat.backends import default_backend
+    HAVE_CRYPTOGRAPHY = True
+except ImportError:
+    HAVE_CRYPTOGRAPHY = False
+
+try:
+    import OpenSSL.crypto
+    HAVE_OPENSSL = True
+except ImportError:
+    HAVE_OPENSSL = False
 
 DOCUMENTATION = '''
 ---
@@ -50,6 +76,32 @@ options:
       - By default only certificates which have expired, or will expire within the C(warning_days) window will be reported.
     required: false
     default: false
+  workers:
+    description:
+      - Maximum number of processes reading and parsing certificates concurrently.
+      - By default certificates are parsed one at a time, unless more than 256 of them need parsing (are not cached), then by up to 4 processes.
+      - Set to 1 to always parse the certificates one at a time.
+    required: false
+    default: null
+  cache_path:
+    description:
+      - File caching the subject and expiry date of the certificates parsed by earlier runs. Certificates are only parsed again once their file (inode, mtime, size or content) or secret changes.
+      - Set to an empty string to parse every certificate on each run.
+    required: false
+    default: /var/cache/openshift_cert_expiry.json
+  tls_secret_namespaces:
+    description:
+      - Also examine the certificate of every TLS secret (type C(kubernetes.io/tls)) of these namespaces. They are reported in C(secrets).
+      - The router and registry secrets are examined on masters regardless. All the secrets are listed with a single request to the API server, authenticated with the admin kubeconfig.
+    required: false
+    default: []
+  discovery_paths:
+    description:
+      - Also examine every PEM certificate found in these directories (or files), including each certificate of a bundle. They are reported in C(discovered), and the PEM blocks which can't be parsed in C(unparsable).
+      - A certificate found in several places is examined once, its C(locations) list where it was found. The Nth certificate of a bundle is located as C(path#N).
+      - Certificates already examined in another category, like the master, node and etcd certificates when searching C(/etc/origin) or C(/etc/etcd), are only reported there.
+    required: false
+    default: []
 
 author: "Tim Bielawa (@tbielawa) <tbielawa@redhat.com>"
 '''
@@ -63,6 +115,21 @@ EXAMPLES = '''
 
 # Show expired, soon to expire (now + 30 days), and all other certificates examined
 - openshift_cert_expiry: show_all=true
+
+# Also check the certificates of the TLS secrets of the application namespaces
+- openshift_cert_expiry:
+    tls_secret_namespaces:
+      - myapp
+      - myotherapp
+
+# Also check every certificate, CA bundles included, under the config directories
+- openshift_cert_expiry:
+    discovery_paths:
+      - /etc/origin
+      - /etc/etcd
+
+# Parse the certificates with at most 2 processes
+- openshift_cert_expiry: workers=2
 '''
 
 
@@ -100,33 +167,96 @@ will be returned
     return [p for p in path_list if os.path.exists(os.path.realpath(p))]
 
 
-def load_and_handle_cert(cert_string, now, base64decode=False):
-    """Load a certificate, split off the good parts, and return some
-useful data
+# OpenSSL short names of the subject attributes, as pyOpenSSL reports
+# them. Others are reported by dotted OID, like OpenSSL does for the
+# attributes it doesn't know.
+SUBJECT_SHORT_NAMES = {
+    '2.5.4.3': 'CN',
+    '2.5.4.4': 'SN',
+    '2.5.4.5': 'serialNumber',
+    '2.5.4.6': 'C',
+    '2.5.4.7': 'L',
+    '2.5.4.8': 'ST',
+    '2.5.4.9': 'street',
+    '2.5.4.10': 'O',
+    '2.5.4.11': 'OU',
+    '2.5.4.12': 'title',
+    '2.5.4.42': 'GN',
+    '0.9.2342.19200300.100.1.1': 'UID',
+    '0.9.2342.19200300.100.1.25': 'DC',
+    '1.2.840.113549.1.9.1': 'emailAddress',
+}
+
+
+# Copied into the oo_parse_named_certificates filter (filter_plugins/oo_filters.py), keep in sync.
+# openshift_cert_expiry_decode_tests.py fails when the copies differ.
+def decode_certificate(cert_string):
+    """Decode the subject, subject alternative names and expiration date of
+a PEM certificate, with the cryptography x509 API when it is installed
+and with pyOpenSSL otherwise. Both report the same values.
 
 Params:
 
-- `cert_string` (string) - a certificate loaded into a string object
-- `now` (datetime) - a datetime object of the time to calculate the certificate 'time_remaining' against
-- `base64decode` (bool) - run .decode('base64') on the input?
+- `cert_string` (string) - a PEM certificate
 
 Returns:
-A 3-tuple of the form: (certificate_common_name, certificate_expiry_date, certificate_time_remaining)
-
+A 3-tuple of the form: (subject, subject_alt_names, not_after) where
+`subject` is a list of (short name, value) tuples, `subject_alt_names`
+is a list of names formatted like OpenSSL prints them, ex: 'DNS:foo' or
+'IP Address:172.30.0.1', and `not_after` is a naive UTC datetime
     """
-    if base64decode:
-        _cert_string = cert_string.decode('base-64')
+    if HAVE_CRYPTOGRAPHY:
+        return decode_certificate_cryptography(cert_string)
+    return decode_certificate_openssl(cert_string)
+
+
+def format_general_name(name):
+    """Format a cryptography x509 GeneralName like OpenSSL prints it"""
+    value = name.value
+    if isinstance(name, x509.IPAddress) and value.version == 6:
+        # OpenSSL doesn't compress IPv6 addresses
+        value = ':'.join('{:X}'.format(int(group, 16)) for group in value.exploded.split(':'))
+    elif isinstance(name, x509.RegisteredID):
+        value = value.dotted_string
+    for kind, prefix in [(x509.DNSName, 'DNS'), (x509.IPAddress, 'IP Address'), (x509.RFC822Name, 'email'),
+                         (x509.UniformResourceIdentifier, 'URI'), (x509.RegisteredID, 'Registered ID')]:
+        if isinstance(name, kind):
+            return '{}:{}'.format(prefix, value)
+    return 'othername:<unsupported>'
+
+
+def decode_certificate_cryptography(cert_string):
+    """decode_certificate() with the cryptography x509 API"""
+    if not isinstance(cert_string, bytes):
+        cert_string = cert_string.encode('ascii')
+    cert = x509.load_pem_x509_certificate(cert_string, default_backend())
+
+    subject = [(SUBJECT_SHORT_NAMES.get(attribute.oid.dotted_string, attribute.oid.dotted_string),
+                attribute.value)
+               for attribute in cert.subject]
+
+    try:
+        san = cert.extensions.get_extension_for_class(x509.SubjectAlternativeName)
+    except x509.ExtensionNotFound:
+        subject_alt_names = []
     else:
-        _cert_string = cert_string
+        subject_alt_names = [format_general_name(name) for name in san.value]
+
+    if hasattr(cert, 'not_valid_after_utc'):
+        not_after = cert.not_valid_after_utc.replace(tzinfo=None)
+    else:
+        not_after = cert.not_valid_after
+
+    return (subject, subject_alt_names, not_after)
 
+
+def decode_certificate_openssl(cert_string):
+    """decode_certificate() with pyOpenSSL"""
     cert_loaded = OpenSSL.crypto.load_certificate(
-        OpenSSL.crypto.FILETYPE_PEM, _cert_string)
+        OpenSSL.crypto.FILETYPE_PEM, cert_string)
 
-    ######################################################################
-    # Read all possible names from the cert
-    cert_subjects = []
-    for name, value in cert_loaded.get_subject().get_components():
-        cert_subjects.append('{}:{}'.format(name, value))
+    subject = [(to_native(name), to_native(value))
+               for name, value in cert_loaded.get_subject().get_components()]
 
     # To read SANs from a cert we must read the subjectAltName
     # extension from the X509 Object. What makes this more difficult
@@ -152,7 +282,7 @@ A 3-tuple of the form: (certificate_common_name, certificate_expiry_date, certif
             checked_all_extensions = True
         else:
             # We were able to load the extension at index 'i'
-            if ext.get_short_name() == 'subjectAltName':
+            if to_native(ext.get_short_name()) == 'subjectAltName':
                 san = ext
                 checked_all_extensions = True
             else:
@@ -162,20 +292,53 @@ A 3-tuple of the form: (certificate_common_name, certificate_expiry_date, certif
     if san is not None:
         # The X509Extension object for subjectAltName prints as a
         # string with the alt names separated by a comma and a
-        # space. Split the string by ', ' and then add our new names
-        # to the list of existing names
-        cert_subjects.extend(str(san).split(', '))
-
-    cert_subject = ', '.join(cert_subjects)
-    ######################################################################
+        # space.
+        subject_alt_names = str(san).split(', ')
+    else:
+        subject_alt_names = []
 
     # Grab the expiration date
-    cert_expiry = cert_loaded.get_notAfter()
-    cert_expiry_date = datetime.datetime.strptime(
-        cert_expiry,
+    not_after = datetime.datetime.strptime(
+        to_native(cert_loaded.get_notAfter()),
         # example get_notAfter() => 20180922170439Z
         '%Y%m%d%H%M%SZ')
 
+    return (subject, subject_alt_names, not_after)
+
+
+def to_native(value):
+    """pyOpenSSL returns bytes on python 3, make them a str"""
+    if isinstance(value, bytes) and not isinstance(value, str):
+        return value.decode('utf-8')
+    return value
+
+
+def load_and_handle_cert(cert_string, now, base64decode=False):
+    """Load a certificate, split off the good parts, and return some
+useful data
+
+Params:
+
+- `cert_string` (string) - a certificate loaded into a string object
+- `now` (datetime) - a datetime object of the time to calculate the certificate 'time_remaining' against
+- `base64decode` (bool) - base64 decode the input?
+
+Returns:
+A 3-tuple of the form: (certificate_common_name, certificate_expiry_date, certificate_time_remaining)
+
+    """
+    if base64decode:
+        _cert_string = base64.b64decode(cert_string)
+    else:
+        _cert_string = cert_string
+
+    subject, subject_alt_names, cert_expiry_date = decode_certificate(_cert_string)
+
+    # Read all possible names from the cert
+    cert_subjects = ['{}:{}'.format(name, value) for name, value in subject]
+    cert_subjects.extend(subject_alt_names)
+    cert_subject = ', '.join(cert_subjects)
+
     time_remaining = cert_expiry_date - now
 
     return (cert_subject, cert_expiry_date, time_remaining)
@@ -214,7 +377,671 @@ Return:
     return cert_list
 
 
-def tabulate_summary(certificates, kubeconfigs, etcd_certs, router_certs, registry_certs):
+# The categories of the examined certificates, in the order they are
+# checked
+CERT_CATEGORIES = ['ocp_certs', 'kubeconfigs', 'etcd', 'router', 'registry', 'secrets', 'discovered']
+
+# How the expiry date of cached certificates is recorded
+CERT_EXPIRY_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# What decoding a PEM block which is not a certificate raises
+CERT_PARSE_ERRORS = (ValueError, OpenSSL.crypto.Error) if HAVE_OPENSSL else (ValueError,)
+
+
+def cert_check(category, path, kind='file', data=None, details=None):
+    """Describe a certificate to examine
+
+Params:
+
+- `category` (string) - one of CERT_CATEGORIES, the result list the cert is classified into
+- `path` (string) - the path reported for the certificate
+- `kind` (string) - where the certificate is read from: 'file' (a PEM file at `path`),
+  'kubeconfig' (the client certificate of the first user of the kubeconfig at `path`),
+  'secret' (the base64 encoded certificate in `data`) or 'pem' (the PEM certificate in `data`)
+- `data` (string) - the certificate of 'secret' and 'pem' checks
+- `details` (dict) - extra keys reported with the result of the check
+
+Returns:
+A dict describing the check, which can be handed to another process
+    """
+    return {
+        'category': category,
+        'path': path,
+        'kind': kind,
+        'data': data,
+        'details': details or {},
+    }
+
+
+def parse_cert_check(check, now, cached=None):
+    """Read and parse the certificate of a check (see cert_check)
+
+The certificate is only parsed if `cached`, the metadata recorded for
+the check by an earlier scan, doesn't match the identity of what is
+read now: the inode, mtime and size of the file and the hash of its
+content, or the hash of the data of a secret or PEM certificate.
+
+Params:
+
+- `check` (dict) - the check to run
+- `now` (datetime) - a datetime object of the time to calculate the certificate 'time_remaining' against
+- `cached` (dict) - cached metadata of the certificate, as returned by an earlier call
+
+Returns:
+A dict of the JSON serializable metadata of the certificate: its
+'identity', 'subject' and 'expiry' (formatted with CERT_EXPIRY_FORMAT).
+A discovered PEM block which can't be parsed has an 'error' instead of
+the 'subject' and 'expiry'.
+    """
+    if check['kind'] in ['secret', 'pem']:
+        content = check['data']
+        identity = [None, None, None, content_hash(content)]
+    else:
+        with open(check['path'], 'r') as fp:
+            stat = os.fstat(fp.fileno())
+            content = fp.read()
+        identity = [stat.st_ino, stat.st_mtime, stat.st_size, content_hash(content)]
+
+    if cached is not None and cached['identity'] == identity:
+        return cached
+
+    if check['kind'] == 'kubeconfig':
+        # Per conversation, "the kubeconfigs you care about:
+        # admin, router, registry should all be single
+        # value". Following that advice we only grab the data for
+        # the user at index 0 in the 'users' list. There should
+        # not be more than one user.
+        cfg = yaml.safe_load(content)
+        cert_subject, cert_expiry_date, _ = load_and_handle_cert(
+            cfg['users'][0]['user']['client-certificate-data'], now, base64decode=True)
+    elif check['kind'] == 'pem':
+        # Anything can be found under a discovery path, a block which
+        # isn't a certificate must not fail the whole scan
+        try:
+            cert_subject, cert_expiry_date, _ = load_and_handle_cert(content, now)
+        except CERT_PARSE_ERRORS as err:
+            return {
+                'identity': identity,
+                'error': str(err) or err.__class__.__name__,
+            }
+    else:
+        cert_subject, cert_expiry_date, _ = load_and_handle_cert(
+            content, now, base64decode=check['kind'] == 'secret')
+
+    return {
+        'identity': identity,
+        'subject': cert_subject,
+        'expiry': cert_expiry_date.strftime(CERT_EXPIRY_FORMAT),
+    }
+
+
+def parse_cert_check_job(job, now):
+    """Run parse_cert_check() for a (check, cached) tuple of scan_certificates()"""
+    check, cached = job
+    return parse_cert_check(check, now, cached)
+
+
+def content_hash(content):
+    """Return the sha256 hex digest of a certificate or of its container"""
+    if not isinstance(content, bytes):
+        content = content.encode('utf-8')
+    return hashlib.sha256(content).hexdigest()
+
+
+class CertMetadataCache(object):
+    """Per-host cache of the metadata of parsed certificates
+
+Entries are keyed by the kind and path of their check and record the
+identity of what was parsed (see parse_cert_check), so a certificate is
+parsed again as soon as it is replaced. The expiry of cached
+certificates is classified against the time of every scan.
+
+Attributes:
+
+- `filename` (string) - cache file, None to keep the cache in memory
+- `entries` (dict) - certificate metadata by check key
+- `changed` (bool) - entries were updated since the cache was loaded
+    """
+    version = 1
+
+    def __init__(self, filename=None):
+        self.filename = filename
+        self.entries = {}
+        self.changed = False
+        if filename is not None:
+            try:
+                with open(filename, 'r') as cache_file:
+                    cache = json.load(cache_file)
+                if cache.get('version') == self.version:
+                    self.entries = cache['entries']
+            except (IOError, OSError, ValueError, KeyError, AttributeError):
+                pass
+
+    @staticmethod
+    def key(check):
+        """Return the cache key of a check"""
+        return '{}:{}'.format(check['kind'], check['path'])
+
+    def get(self, check):
+        """Return the cached metadata of a check, None if there is none"""
+        return self.entries.get(self.key(check))
+
+    def replace(self, entries):
+        """Replace the entries with those of the latest scan, dropping the
+certificates which are no longer examined
+        """
+        if entries != self.entries:
+            self.entries = entries
+            self.changed = True
+
+    def save(self):
+        """Persist the cache if it changed. Failing to write the cache is
+not an error, the certificates will simply be parsed again next time.
+        """
+        if self.filename is None or not self.changed:
+            return
+        try:
+            fd, tmp_filename = tempfile.mkstemp(dir=os.path.dirname(self.filename) or '.',
+                                                prefix='.' + os.path.basename(self.filename))
+        except (IOError, OSError):
+            return
+        try:
+            with os.fdopen(fd, 'w') as cache_file:
+                json.dump({'version': self.version, 'entries': self.entries}, cache_file)
+                cache_file.flush()
+                os.fsync(cache_file.fileno())
+            os.chmod(tmp_filename, 0o600)
+            os.rename(tmp_filename, self.filename)
+            self.changed = False
+        except (IOError, OSError):
+            try:
+                os.unlink(tmp_filename)
+            except OSError:
+                pass
+
+
+# Starting a pool of processes costs more than parsing a few hundred
+# certificates, so by default smaller scans parse them one at a time
+POOL_MIN_CHECKS = 256
+# Default maximum number of processes parsing certificates
+POOL_MAX_WORKERS = 4
+
+
+def needs_parsing(check, cached):
+    """Tell whether a check has to be parsed again, with the cheap part of
+the identity of parse_cert_check: the stat of a file or the hash of the
+data of a secret or PEM certificate
+
+Params:
+
+- `check` (dict) - the check to run (see cert_check)
+- `cached` (dict) - cached metadata of the certificate, None if there is none
+
+Returns:
+True if the certificate is not cached or changed since
+    """
+    if cached is None:
+        return True
+    if check['kind'] in ['secret', 'pem']:
+        return cached['identity'][3] != content_hash(check['data'])
+    try:
+        stat = os.stat(check['path'])
+    except OSError:
+        return True
+    return cached['identity'][:3] != [stat.st_ino, stat.st_mtime, stat.st_size]
+
+
+def scan_workers(workers, uncached):
+    """Return the number of processes to parse `uncached` certificates with
+
+Params:
+
+- `workers` (int) - the maximum number of worker processes, None for the default
+- `uncached` (int) - the number of certificates to parse
+
+Returns:
+The number of processes, 1 to parse the certificates in this one
+    """
+    if workers is None:
+        if uncached < POOL_MIN_CHECKS:
+            return 1
+        workers = min(multiprocessing.cpu_count(), POOL_MAX_WORKERS)
+    return max(1, min(workers, uncached))
+
+
+# pylint: disable=too-many-arguments
+def scan_certificates(cert_checks, now, expire_window, workers=None, cache=None):
+    """Read, parse and classify certificates, concurrently in a pool of
+processes when there are many to parse (see scan_workers).
+
+Results are merged in the order of `cert_checks`, whatever the order
+the workers finish in, so a scan reports the same thing however many
+workers run it.
+
+Params:
+
+- `cert_checks` (list of dicts) - the checks to run (see cert_check)
+- `now` (datetime) - a datetime object of the time to calculate the certificate 'time_remaining' against
+- `expire_window` (datetime.timedelta) - a timedelta for how long the warning window is
+- `workers` (int) - the maximum number of worker processes, by default 1 below POOL_MIN_CHECKS certificates to parse, else up to POOL_MAX_WORKERS
+- `cache` (CertMetadataCache) - metadata of the certificates parsed by earlier scans, updated with this one
+
+Returns:
+A dict of the lists of classified certificates by category (see
+CERT_CATEGORIES), and the 'unparsable' list of the discovered PEM blocks
+which aren't certificates, each a dict of their 'path' and 'error'
+    """
+    if cache is None:
+        cache = CertMetadataCache()
+    jobs = [(check, cache.get(check)) for check in cert_checks]
+    # Cached certificates are cheap to check, only count the others
+    workers = scan_workers(workers, sum(1 for job in jobs if needs_parsing(*job)))
+    parse = functools.partial(parse_cert_check_job, now=now)
+
+    # Daemonic processes, ex: ansible workers, can't have children.
+    if workers > 1 and not multiprocessing.current_process().daemon:
+        pool = multiprocessing.Pool(workers)
+        try:
+            parsed = pool.map(parse, jobs)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        parsed = [parse(job) for job in jobs]
+
+    cache.replace(dict((cache.key(check), cert_meta) for check, cert_meta in zip(cert_checks, parsed)))
+
+    classified = dict((category, []) for category in CERT_CATEGORIES)
+    classified['unparsable'] = []
+    for check, cert_meta in zip(cert_checks, parsed):
+        if 'error' in cert_meta:
+            unparsable = {'path': check['path'], 'error': cert_meta['error']}
+            unparsable.update(check['details'])
+            classified['unparsable'].append(unparsable)
+            continue
+
+        cert_expiry_date = datetime.datetime.strptime(cert_meta['expiry'], CERT_EXPIRY_FORMAT)
+        time_remaining = cert_expiry_date - now
+        expire_check_result = {
+            'cert_cn': cert_meta['subject'],
+            'path': check['path'],
+            'expiry': cert_expiry_date,
+            'days_remaining': time_remaining.days,
+            'health': None,
+        }
+        expire_check_result.update(check['details'])
+
+        classify_cert(expire_check_result, now, time_remaining, expire_window, classified[check['category']])
+
+    return classified
+
+
+# The certificates kept in secrets: the category they are reported in,
+# the namespace and name of their secret and their key in its data
+SECRET_CERTS = [
+    ('router', 'default', 'router-certs', 'tls.crt'),
+    ('registry', 'default', 'registry-certificates', 'registry.crt'),
+]
+
+# Service account tokens and dockercfgs are the bulk of the secrets of a
+# cluster and never hold certificates we check
+SECRETS_FIELD_SELECTOR = 'type!=kubernetes.io/service-account-token,type!=kubernetes.io/dockercfg'
+
+
+def kubeconfig_credentials(kubeconfig_path):
+    """Read the API server and the credentials of the current context of
+a kubeconfig
+
+Params:
+
+- `kubeconfig_path` (string) - path of the kubeconfig
+
+Returns:
+A dict of the 'server' URL, the 'token' and the PEM 'ca', 'cert' and
+'key' (strings, None when missing) to authenticate with
+
+Raises:
+IOError or OSError when the kubeconfig can't be read, ValueError or
+KeyError when it is malformed
+    """
+    with open(kubeconfig_path, 'r') as fp:
+        try:
+            cfg = yaml.safe_load(fp)
+        except yaml.YAMLError as err:
+            raise ValueError('{}: {}'.format(kubeconfig_path, err))
+    if not isinstance(cfg, dict):
+        raise ValueError('{}: not a kubeconfig'.format(kubeconfig_path))
+
+    def named(section, kind, name):
+        """ the `kind` dict of the entry `name` of a section, of the first entry if there is no such entry """
+        entries = cfg.get(section)
+        entries = [entry for entry in entries if isinstance(entry, dict)] if isinstance(entries, list) else []
+        if not entries:
+            raise KeyError(section)
+        entry = next((entry for entry in entries if entry.get('name') == name), entries[0])
+        if not isinstance(entry.get(kind), dict):
+            raise KeyError(kind)
+        return entry[kind]
+
+    context = named('contexts', 'context', cfg.get('current-context'))
+    cluster = named('clusters', 'cluster', context.get('cluster'))
+    user = named('users', 'user', context.get('user'))
+
+    def pem(section, key):
+        """ inline base64 data of `key`, or the content of the file it names """
+        if section.get(key + '-data'):
+            return base64.b64decode(section[key + '-data']).decode('utf-8')
+        if section.get(key):
+            # paths are relative to the kubeconfig
+            with open(os.path.join(os.path.dirname(kubeconfig_path), section[key]), 'r') as pem_fp:
+                return pem_fp.read()
+        return None
+
+    return {
+        'server': cluster['server'].rstrip('/'),
+        'ca': pem(cluster, 'certificate-authority'),
+        'cert': pem(user, 'client-certificate'),
+        'key': pem(user, 'client-key'),
+        'token': user.get('token'),
+    }
+
+
+def secrets_api_path(namespaces):
+    """Return the API path listing the secrets of `namespaces` in a
+single request, the secrets of every namespace when there are several
+    """
+    if len(namespaces) == 1:
+        path = '/api/v1/namespaces/{}/secrets'.format(namespaces[0])
+    else:
+        path = '/api/v1/secrets'
+    return path + '?' + urlencode({'fieldSelector': SECRETS_FIELD_SELECTOR})
+
+
+def fetch_secrets_from_api(kubeconfig_path, namespaces, timeout=30):
+    """List the secrets of `namespaces` with a single HTTPS request to the
+API server, authenticated with the credentials of a kubeconfig
+
+Returns:
+The list of secrets (dicts)
+
+Raises:
+IOError, OSError, ValueError or KeyError when the secrets can't be listed
+    """
+    creds = kubeconfig_credentials(kubeconfig_path)
+    context = ssl.create_default_context(cadata=creds['ca'])
+    headers = {'Accept': 'application/json'}
+    if creds['token']:
+        headers['Authorization'] = 'Bearer ' + creds['token']
+
+    # The ssl module only loads client certificates from files
+    tmpdir = tempfile.mkdtemp()
+    try:
+        if creds['cert'] and creds['key']:
+            cert_file = os.path.join(tmpdir, 'client.crt')
+            key_file = os.path.join(tmpdir, 'client.key')
+            for path, content in [(cert_file, creds['cert']), (key_file, creds['key'])]:
+                with os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), 'w') as fp:
+                    fp.write(content)
+            context.load_cert_chain(cert_file, key_file)
+
+        opener = build_opener(HTTPSHandler(context=context))
+        request = Request(creds['server'] + secrets_api_path(namespaces), headers=headers)
+        response = opener.open(request, timeout=timeout)
+        try:
+            secrets = json.loads(response.read().decode('utf-8'))
+        finally:
+            response.close()
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    return secret_list_items(secrets)
+
+
+def secret_list_items(secret_list):
+    """Return the items of a decoded secret List
+
+Raises:
+ValueError or KeyError when `secret_list` isn't a List of secrets
+    """
+    if not isinstance(secret_list, dict) or not isinstance(secret_list['items'], list):
+        raise ValueError('not a List of secrets')
+    return [item for item in secret_list['items'] if isinstance(item, dict)]
+
+
+def fetch_secrets_with_oc(namespaces):
+    """List the secrets of `namespaces` with a single `oc get` command
+
+Returns:
+The list of secrets (dicts)
+
+Raises:
+OSError when there is no oc command, ValueError or KeyError when the
+secrets can't be listed
+    """
+    command = ['oc', 'get', 'secrets', '-o', 'json']
+    if len(namespaces) == 1:
+        command.extend(['-n', namespaces[0]])
+    else:
+        command.append('--all-namespaces')
+    output = subprocess.Popen(command, stdout=subprocess.PIPE).communicate()[0]
+    return secret_list_items(json.loads(output.decode('utf-8')))
+
+
+def fetch_secrets(kubeconfig_path, namespaces):
+    """List the secrets of `namespaces`. The API server is asked directly
+when this host has `kubeconfig_path`, falling back to the oc command.
+On non-masters both fail, that is expected and no secrets are returned.
+
+Params:
+
+- `kubeconfig_path` (string) - the kubeconfig of a cluster admin
+- `namespaces` (list) - namespaces to list the secrets of
+
+Returns:
+The list of secrets (dicts) of `namespaces`
+    """
+    namespaces = sorted(set(namespaces))
+    for fetch in [functools.partial(fetch_secrets_from_api, kubeconfig_path),
+                  fetch_secrets_with_oc]:
+        try:
+            secrets = fetch(namespaces)
+        except (IOError, OSError, http_client.HTTPException, ValueError, KeyError):
+            continue
+        return [secret for secret in secrets
+                if secret.get('metadata', {}).get('namespace') in namespaces]
+    return []
+
+
+def secret_cert_checks(secrets, tls_namespaces=()):
+    """Describe the certificates to examine in secrets (see cert_check)
+
+Params:
+
+- `secrets` (list of dicts) - secrets listed by fetch_secrets
+- `tls_namespaces` (list) - namespaces where every TLS secret is also examined
+
+Returns:
+The checks of the SECRET_CERTS found in `secrets`, in that order,
+followed by those of the other TLS secrets of `tls_namespaces` sorted
+by namespace and name
+    """
+    by_name = {}
+    for secret in secrets:
+        metadata = secret.get('metadata', {})
+        by_name[(metadata.get('namespace'), metadata.get('name'))] = secret
+
+    def secret_check(category, namespace, name, key):
+        """ the check of the certificate `key` of a secret, None when it has none """
+        secret = by_name[(namespace, name)]
+        data = (secret.get('data') or {}).get(key)
+        if not data:
+            return None
+        path = secret['metadata'].get('selfLink') or '/api/v1/namespaces/{}/secrets/{}'.format(namespace, name)
+        return cert_check(category, path, kind='secret', data=data)
+
+    checks = []
+    for category, namespace, name, key in SECRET_CERTS:
+        if (namespace, name) in by_name:
+            checks.append(secret_check(category, namespace, name, key))
+
+    named = set((namespace, name) for _, namespace, name, _ in SECRET_CERTS)
+    for namespace, name in sorted(by_name):
+        if (namespace, name) in named or namespace not in tls_namespaces:
+            continue
+        if by_name[(namespace, name)].get('type') == 'kubernetes.io/tls':
+            checks.append(secret_check('secrets', namespace, name, 'tls.crt'))
+
+    return [check for check in checks if check is not None]
+
+
+# Certificates are recognised by these PEM armor lines
+PEM_CERT_BEGIN = b'-----BEGIN CERTIFICATE-----'
+PEM_CERT_END = b'-----END CERTIFICATE-----'
+
+# Larger files are not searched for certificates during discovery
+DISCOVERY_MAX_FILE_SIZE = 1024 * 1024
+
+
+def iter_pem_certificates(fp):
+    """Yield the PEM certificates of a file, one at a time, as they are
+read line by line. Other PEM blocks, like private keys, are skipped.
+
+Params:
+
+- `fp` (file) - a file opened in binary mode
+
+Yields:
+Each PEM certificate (bytes), armor lines included
+    """
+    block = None
+    for line in fp:
+        line = line.strip()
+        if block is None:
+            if line == PEM_CERT_BEGIN:
+                block = [line]
+        elif line == PEM_CERT_END:
+            block.append(line)
+            yield b'\n'.join(block) + b'\n'
+            block = None
+        elif line.startswith(b'-----'):
+            # Truncated certificate followed by another block
+            block = [line] if line == PEM_CERT_BEGIN else None
+        else:
+            block.append(line)
+
+
+def pem_fingerprint(pem):
+    """Return the sha256 fingerprint of a PEM certificate: the digest of
+its DER encoding, which doesn't depend on how the PEM was wrapped
+    """
+    body = b''.join(pem.strip().split(b'\n')[1:-1])
+    return hashlib.sha256(base64.b64decode(body)).hexdigest()
+
+
+def iter_discovery_files(roots):
+    """Walk the discovery roots, yielding regular files small enough to be
+searched for certificates, in a stable (sorted) order. Roots can also
+be files.
+    """
+    for root in roots:
+        if os.path.isfile(root):
+            walk = [(os.path.dirname(root), [], [os.path.basename(root)])]
+        else:
+            walk = os.walk(root)
+        for dirpath, dirnames, filenames in walk:
+            dirnames.sort()
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if os.path.isfile(path) and stat.st_size <= DISCOVERY_MAX_FILE_SIZE:
+                    yield path
+
+
+def check_fingerprint(check):
+    """Return the fingerprint (see pem_fingerprint) of the certificate
+examined by a check, or None if it can't be read
+
+Params:
+
+- `check` (dict) - the check (see cert_check)
+
+Returns:
+The sha256 hex digest of the DER of the certificate, or None
+    """
+    try:
+        if check['kind'] == 'file':
+            with open(check['path'], 'rb') as fp:
+                pems = list(iter_pem_certificates(fp))
+        elif check['kind'] == 'kubeconfig':
+            with open(check['path'], 'r') as fp:
+                cfg = yaml.safe_load(fp)
+            data = base64.b64decode(cfg['users'][0]['user']['client-certificate-data'])
+            pems = list(iter_pem_certificates(data.splitlines()))
+        elif check['kind'] == 'secret':
+            pems = list(iter_pem_certificates(base64.b64decode(check['data']).splitlines()))
+        else:
+            pems = list(iter_pem_certificates(check['data'].encode('ascii').splitlines()))
+        # Like parse_cert_check, only the first certificate is examined
+        return pem_fingerprint(pems[0]) if pems else None
+    # binascii.Error is a ValueError
+    except (IOError, OSError, KeyError, IndexError, TypeError, ValueError, AttributeError, yaml.YAMLError):
+        return None
+
+
+def discover_certificates(roots, examined=None):
+    """Find every PEM certificate under the discovery roots
+
+Every certificate of a bundle is examined. A certificate found in
+several places, compared by fingerprint, is only examined once and
+reported with all of its locations. The location of the Nth (N > 1)
+certificate of a file is 'path#N'.
+
+The certificates already examined by the other categories win: they
+are skipped, so that a discovery path like /etc/origin doesn't report
+(and count) the master, node and etcd certificates twice.
+
+Params:
+
+- `roots` (list) - directories (or files) to search
+- `examined` (set) - fingerprints of the certificates already examined
+
+Returns:
+A list of 'pem' checks (see cert_check) in the 'discovered' category,
+in the order the certificates were first found
+    """
+    examined = examined or set()
+    checks = []
+    by_fingerprint = {}
+    for path in iter_discovery_files(roots):
+        try:
+            with open(path, 'rb') as fp:
+                for index, pem in enumerate(iter_pem_certificates(fp)):
+                    location = path if index == 0 else '{}#{}'.format(path, index + 1)
+                    try:
+                        fingerprint = pem_fingerprint(pem)
+                    except (TypeError, ValueError):
+                        # Not base64, binascii.Error is a ValueError
+                        continue
+                    if fingerprint in examined:
+                        continue
+                    if fingerprint in by_fingerprint:
+                        by_fingerprint[fingerprint]['details']['locations'].append(location)
+                        continue
+                    check = cert_check('discovered', location, kind='pem', data=pem.decode('ascii'),
+                                       details={'fingerprint': fingerprint, 'locations': [location]})
+                    by_fingerprint[fingerprint] = check
+                    checks.append(check)
+        except (IOError, OSError):
+            continue
+    return checks
+
+
+# pylint: disable=too-many-arguments
+def tabulate_summary(certificates, kubeconfigs, etcd_certs, router_certs, registry_certs, secret_certs=None,
+                     discovered_certs=None):
     """Calculate the summary text for when the module finishes
 running. This includes counts of each classification and what have
 you.
@@ -225,13 +1052,19 @@ Params:
   dicts with filled in `health` keys for system certificates.
 - `kubeconfigs` - as above for kubeconfigs
 - `etcd_certs` - as above for etcd certs
+- `router_certs` - as above for the router certs
+- `registry_certs` - as above for the registry certs
+- `secret_certs` - as above for the certs of other TLS secrets
+- `discovered_certs` - as above for the certs found in the discovery paths
 
 Return:
 
 - `summary_results` (dict) - Counts of each cert type classification
   and total items examined.
     """
-    items = certificates + kubeconfigs + etcd_certs + router_certs + registry_certs
+    secret_certs = secret_certs or []
+    discovered_certs = discovered_certs or []
+    items = certificates + kubeconfigs + etcd_certs + router_certs + registry_certs + secret_certs + discovered_certs
 
     summary_results = {
         'system_certificates': len(certificates),
@@ -239,6 +1072,8 @@ Return:
         'etcd_certificates': len(etcd_certs),
         'router_certs': len(router_certs),
         'registry_certs': len(registry_certs),
+        'secret_certs': len(secret_certs),
+        'discovered_certs': len(discovered_certs),
         'total': len(items),
         'ok': 0,
         'warning': 0,
@@ -252,39 +1087,30 @@ Return:
     return summary_results
 
 
-######################################################################
-# This is our module MAIN function after all, so there's bound to be a
-# lot of code bundled up into one block
-#
-# Reason: These checks are disabled because the issue was introduced
-# during a period where the pylint checks weren't enabled for this file
-# Status: temporarily disabled pending future refactoring
-# pylint: disable=too-many-locals,too-many-statements,too-many-branches
-def main():
-    """This module examines certificates (in various forms) which compose
-an OpenShift Container Platform cluster
-    """
+# pylint: disable=too-many-locals,too-many-branches,too-many-statements
+def collect_cert_checks(config_base, tls_secret_namespaces=None, discovery_paths=None, include_secrets=True):
+    """Locate the certificates to examine on this host: the serving
+certificates of the master and node configs, the client certificates of
+the kubeconfigs, the etcd certificates, the certificates of the secrets
+and those found in the discovery paths. Only the configuration files,
+not the certificates, are read, unless there are discovery paths: the
+certificates found there which are already examined are then skipped.
 
-    module = AnsibleModule(
-        argument_spec=dict(
-            config_base=dict(
-                required=False,
-                default="/etc/origin",
-                type='str'),
-            warning_days=dict(
-                required=False,
-                default=30,
-                type='int'),
-            show_all=dict(
-                required=False,
-                default=False,
-                type='bool')
-        ),
-        supports_check_mode=True,
-    )
+Params:
+
+- `config_base` (string) - base path to the OCP system settings
+- `tls_secret_namespaces` (list) - namespaces whose TLS secrets are also examined
+- `discovery_paths` (list) - directories (or files) searched for PEM certificates
+- `include_secrets` (bool) - examine the certificates of the secrets at all
+
+Returns:
+A list of checks (see cert_check)
+    """
+    tls_secret_namespaces = tls_secret_namespaces or []
+    discovery_paths = discovery_paths or []
 
     # Basic scaffolding for OpenShift specific certs
-    openshift_base_config_path = module.params['config_base']
+    openshift_base_config_path = config_base
     openshift_master_config_path = os.path.normpath(
         os.path.join(openshift_base_config_path, "master/master-config.yaml")
     )
@@ -322,68 +1148,25 @@ an OpenShift Container Platform cluster
         "ETCD_PEER_CERT_FILE",
     ]
 
-    # Expiry checking stuff
-    now = datetime.datetime.now()
-    # todo, catch exception for invalid input and return a fail_json
-    warning_days = int(module.params['warning_days'])
-    expire_window = datetime.timedelta(days=warning_days)
-
-    # Module stuff
-    #
-    # The results of our cert checking to return from the task call
-    check_results = {}
-    check_results['meta'] = {}
-    check_results['meta']['warning_days'] = warning_days
-    check_results['meta']['checked_at_time'] = str(now)
-    check_results['meta']['warn_before_date'] = str(now + expire_window)
-    check_results['meta']['show_all'] = str(module.params['show_all'])
-    # All the analyzed certs accumulate here
-    ocp_certs = []
-
-    ######################################################################
-    # Sure, why not? Let's enable check mode.
-    if module.check_mode:
-        check_results['ocp_certs'] = []
-        module.exit_json(
-            check_results=check_results,
-            msg="Checked 0 total certificates. Expired/Warning/OK: 0/0/0. Warning window: %s days" % module.params['warning_days'],
-            rc=0,
-            changed=False
-        )
-
     ######################################################################
     # Check for OpenShift Container Platform specific certs
     ######################################################################
+    # Certificates are only located here, they are read, parsed and
+    # classified together by scan_certificates() once every check is known
+    cert_checks = []
+
     for os_cert in filter_paths(openshift_cert_check_paths):
         # Open up that config file and locate the cert and CA
         with open(os_cert, 'r') as fp:
-            cert_meta = {}
-            cfg = yaml.load(fp)
+            cfg = yaml.safe_load(fp)
             # cert files are specified in parsed `fp` as relative to the path
             # of the original config file. 'master-config.yaml' with certFile
             # = 'foo.crt' implies that 'foo.crt' is in the same
             # directory. certFile = '../foo.crt' is in the parent directory.
             cfg_path = os.path.dirname(fp.name)
-            cert_meta['certFile'] = os.path.join(cfg_path, cfg['servingInfo']['certFile'])
-            cert_meta['clientCA'] = os.path.join(cfg_path, cfg['servingInfo']['clientCA'])
-
-        ######################################################################
-        # Load the certificate and the CA, parse their expiration dates into
-        # datetime objects so we can manipulate them later
-        for _, v in cert_meta.items():
-            with open(v, 'r') as fp:
-                cert = fp.read()
-                cert_subject, cert_expiry_date, time_remaining = load_and_handle_cert(cert, now)
-
-                expire_check_result = {
-                    'cert_cn': cert_subject,
-                    'path': fp.name,
-                    'expiry': cert_expiry_date,
-                    'days_remaining': time_remaining.days,
-                    'health': None,
-                }
-
-                classify_cert(expire_check_result, now, time_remaining, expire_window, ocp_certs)
+            for key in ['certFile', 'clientCA']:
+                cert_checks.append(cert_check(
+                    'ocp_certs', os.path.join(cfg_path, cfg['servingInfo'][key])))
 
     ######################################################################
     # /Check for OpenShift Container Platform specific certs
@@ -392,8 +1175,6 @@ an OpenShift Container Platform cluster
     ######################################################################
     # Check service Kubeconfigs
     ######################################################################
-    kubeconfigs = []
-
     # There may be additional kubeconfigs to check, but their naming
     # is less predictable than the ones we've already assembled.
 
@@ -401,8 +1182,11 @@ an OpenShift Container Platform cluster
         # Try to read the standard 'node-config.yaml' file to check if
         # this host is a node.
         with open(openshift_node_config_path, 'r') as fp:
-            cfg = yaml.load(fp)
-
+            cfg = yaml.safe_load(fp)
+    except IOError:
+        # This is not a node
+        pass
+    else:
         # OK, the config file exists, therefore this is a
         # node. Nodes have their own kubeconfig files to
         # communicate with the master API. Let's read the relative
@@ -412,53 +1196,11 @@ an OpenShift Container Platform cluster
         # relative to `fp`
         cfg_path = os.path.dirname(fp.name)
         node_kubeconfig = os.path.join(cfg_path, node_masterKubeConfig)
-
-        with open(node_kubeconfig, 'r') as fp:
-            # Read in the nodes kubeconfig file and grab the good stuff
-            cfg = yaml.load(fp)
-
-        c = cfg['users'][0]['user']['client-certificate-data']
-        (cert_subject,
-         cert_expiry_date,
-         time_remaining) = load_and_handle_cert(c, now, base64decode=True)
-
-        expire_check_result = {
-            'cert_cn': cert_subject,
-            'path': fp.name,
-            'expiry': cert_expiry_date,
-            'days_remaining': time_remaining.days,
-            'health': None,
-        }
-
-        classify_cert(expire_check_result, now, time_remaining, expire_window, kubeconfigs)
-    except IOError:
-        # This is not a node
-        pass
+        for kube in filter_paths([node_kubeconfig]):
+            cert_checks.append(cert_check('kubeconfigs', kube, kind='kubeconfig'))
 
     for kube in filter_paths(kubeconfig_paths):
-        with open(kube, 'r') as fp:
-            # TODO: Maybe consider catching exceptions here?
-            cfg = yaml.load(fp)
-
-        # Per conversation, "the kubeconfigs you care about:
-        # admin, router, registry should all be single
-        # value". Following that advice we only grab the data for
-        # the user at index 0 in the 'users' list. There should
-        # not be more than one user.
-        c = cfg['users'][0]['user']['client-certificate-data']
-        (cert_subject,
-         cert_expiry_date,
-         time_remaining) = load_and_handle_cert(c, now, base64decode=True)
-
-        expire_check_result = {
-            'cert_cn': cert_subject,
-            'path': fp.name,
-            'expiry': cert_expiry_date,
-            'days_remaining': time_remaining.days,
-            'health': None,
-        }
-
-        classify_cert(expire_check_result, now, time_remaining, expire_window, kubeconfigs)
+        cert_checks.append(cert_check('kubeconfigs', kube, kind='kubeconfig'))
 
     ######################################################################
     # /Check service Kubeconfigs
@@ -474,7 +1216,6 @@ an OpenShift Container Platform cluster
     # Some values may be duplicated, make this a set for now so we
     # unique them all
     etcd_certs_to_check = set([])
-    etcd_certs = []
     etcd_cert_params.append('dne')
     try:
         with open('/etc/etcd/etcd.conf', 'r') as fp:
@@ -495,29 +1236,17 @@ an OpenShift Container Platform cluster
         # No etcd to see here, move along
         pass
 
-    for etcd_cert in filter_paths(etcd_certs_to_check):
-        with open(etcd_cert, 'r') as fp:
-            c = fp.read()
-            (cert_subject,
-             cert_expiry_date,
-             time_remaining) = load_and_handle_cert(c, now)
-
-            expire_check_result = {
-                'cert_cn': cert_subject,
-                'path': fp.name,
-                'expiry': cert_expiry_date,
-                'days_remaining': time_remaining.days,
-                'health': None,
-            }
-
-            classify_cert(expire_check_result, now, time_remaining, expire_window, etcd_certs)
+    # Sorted so the checks, and so the results, don't depend on the
+    # ordering of the set
+    for etcd_cert in filter_paths(sorted(etcd_certs_to_check)):
+        cert_checks.append(cert_check('etcd', etcd_cert))
 
     ######################################################################
     # Now the embedded etcd
     ######################################################################
     try:
         with open('/etc/origin/master/master-config.yaml', 'r') as fp:
-            cfg = yaml.load(fp)
+            cfg = yaml.safe_load(fp)
     except IOError:
         # Not present
         pass
@@ -533,21 +1262,7 @@ an OpenShift Container Platform cluster
             # etcd_crt_name is relative to the location of the
             # master-config.yaml file
             cfg_path = os.path.dirname(fp.name)
-            etcd_cert = os.path.join(cfg_path, etcd_crt_name)
-            with open(etcd_cert, 'r') as etcd_fp:
-                (cert_subject,
-                 cert_expiry_date,
-                 time_remaining) = load_and_handle_cert(etcd_fp.read(), now)
-
-                expire_check_result = {
-                    'cert_cn': cert_subject,
-                    'path': etcd_fp.name,
-                    'expiry': cert_expiry_date,
-                    'days_remaining': time_remaining.days,
-                    'health': None,
-                }
-
-                classify_cert(expire_check_result, now, time_remaining, expire_window, etcd_certs)
+            cert_checks.append(cert_check('etcd', os.path.join(cfg_path, etcd_crt_name)))
 
     ######################################################################
     # /Check etcd certs
@@ -557,76 +1272,128 @@ an OpenShift Container Platform cluster
     # Check router/registry certs
     #
     # These are saved as secrets in etcd. That means that we can not
-    # simply read a file to grab the data. Instead we're going to
-    # subprocess out to the 'oc get' command. On non-masters this
-    # command will fail, that is expected so we catch that exception.
+    # simply read a file to grab the data. Instead every secret we need
+    # is listed at once from the API server, with the credentials of the
+    # admin kubeconfig. On non-masters this will fail, that is expected
+    # and no secrets are checked.
     ######################################################################
-    router_certs = []
-    registry_certs = []
+    if include_secrets:
+        secrets = fetch_secrets(
+            os.path.join(openshift_base_config_path, 'master/admin.kubeconfig'),
+            [namespace for _, namespace, _, _ in SECRET_CERTS] + tls_secret_namespaces)
+        cert_checks.extend(secret_cert_checks(secrets, tls_secret_namespaces))
 
     ######################################################################
-    # First the router certs
-    try:
-        router_secrets_raw = subprocess.Popen('oc get -n default secret router-certs -o yaml'.split(),
-                                              stdout=subprocess.PIPE)
-        router_ds = yaml.load(router_secrets_raw.communicate()[0])
-        router_c = router_ds['data']['tls.crt']
-        router_path = router_ds['metadata']['selfLink']
-    except TypeError:
-        # YAML couldn't load the result, this is not a master
-        pass
-    except OSError:
-        # The OC command doesn't exist here. Move along.
-        pass
-    else:
-        (cert_subject,
-         cert_expiry_date,
-         time_remaining) = load_and_handle_cert(router_c, now, base64decode=True)
+    # /Check router/registry certs
+    ######################################################################
 
-        expire_check_result = {
-            'cert_cn': cert_subject,
-            'path': router_path,
-            'expiry': cert_expiry_date,
-            'days_remaining': time_remaining.days,
-            'health': None,
-        }
+    ######################################################################
+    # Discover the certificates of the discovery paths
+    #
+    # The certificates examined above win over the discovered ones,
+    # only fingerprint them if there is something to discover
+    ######################################################################
+    if discovery_paths:
+        examined = set(check_fingerprint(check) for check in cert_checks)
+        cert_checks.extend(discover_certificates(discovery_paths, examined))
 
-        classify_cert(expire_check_result, now, time_remaining, expire_window, router_certs)
+    return cert_checks
 
-    ######################################################################
-    # Now for registry
-    try:
-        registry_secrets_raw = subprocess.Popen('oc get -n default secret registry-certificates -o yaml'.split(),
-                                                stdout=subprocess.PIPE)
-        registry_ds = yaml.load(registry_secrets_raw.communicate()[0])
-        registry_c = registry_ds['data']['registry.crt']
-        registry_path = registry_ds['metadata']['selfLink']
-    except TypeError:
-        # YAML couldn't load the result, this is not a master
-        pass
-    except OSError:
-        # The OC command doesn't exist here. Move along.
-        pass
-    else:
-        (cert_subject,
-         cert_expiry_date,
-         time_remaining) = load_and_handle_cert(registry_c, now, base64decode=True)
 
-        expire_check_result = {
-            'cert_cn': cert_subject,
-            'path': registry_path,
-            'expiry': cert_expiry_date,
-            'days_remaining': time_remaining.days,
-            'health': None,
-        }
+######################################################################
+# This is our module MAIN function after all, so there's bound to be a
+# lot of code bundled up into one block
+#
+# Reason: These checks are disabled because the issue was introduced
+# during a period where the pylint checks weren't enabled for this file
+# Status: temporarily disabled pending future refactoring
+# pylint: disable=too-many-locals,too-many-statements,too-many-branches
+def main():
+    """This module examines certificates (in various forms) which compose
+an OpenShift Container Platform cluster
+    """
 
-        classify_cert(expire_check_result, now, time_remaining, expire_window, registry_certs)
+    module = AnsibleModule(
+        argument_spec=dict(
+            config_base=dict(
+                required=False,
+                default="/etc/origin",
+                type='str'),
+            warning_days=dict(
+                required=False,
+                default=30,
+                type='int'),
+            show_all=dict(
+                required=False,
+                default=False,
+                type='bool'),
+            workers=dict(
+                required=False,
+                default=None,
+                type='int'),
+            cache_path=dict(
+                required=False,
+                default='/var/cache/openshift_cert_expiry.json',
+                type='str'),
+            tls_secret_namespaces=dict(
+                required=False,
+                default=[],
+                type='list'),
+            discovery_paths=dict(
+                required=False,
+                default=[],
+                type='list')
+        ),
+        supports_check_mode=True,
+    )
+
+    if not HAVE_CRYPTOGRAPHY and not HAVE_OPENSSL:
+        module.fail_json(msg="Either the cryptography or the pyOpenSSL python module is required")
+
+    # Expiry checking stuff
+    now = datetime.datetime.now()
+    # todo, catch exception for invalid input and return a fail_json
+    warning_days = int(module.params['warning_days'])
+    expire_window = datetime.timedelta(days=warning_days)
+
+    # Module stuff
+    #
+    # The results of our cert checking to return from the task call
+    check_results = {}
+    check_results['meta'] = {}
+    check_results['meta']['warning_days'] = warning_days
+    check_results['meta']['checked_at_time'] = str(now)
+    check_results['meta']['warn_before_date'] = str(now + expire_window)
+    check_results['meta']['show_all'] = str(module.params['show_all'])
 
     ######################################################################
-    # /Check router/registry certs
-    ######################################################################
+    # Sure, why not? Let's enable check mode.
+    if module.check_mode:
+        check_results['ocp_certs'] = []
+        module.exit_json(
+            check_results=check_results,
+            msg="Checked 0 total certificates. Expired/Warning/OK: 0/0/0. Warning window: %s days" % module.params['warning_days'],
+            rc=0,
+            changed=False
+        )
+
+    cert_checks = collect_cert_checks(module.params['config_base'],
+                                      module.params['tls_secret_namespaces'],
+                                      module.params['discovery_paths'])
+
+    cache = CertMetadataCache(module.params['cache_path'] or None)
+    classified = scan_certificates(cert_checks, now, expire_window, module.params['workers'], cache)
+    cache.save()
+    ocp_certs = classified['ocp_certs']
+    kubeconfigs = classified['kubeconfigs']
+    etcd_certs = classified['etcd']
+    router_certs = classified['router']
+    registry_certs = classified['registry']
+    secret_certs = classified['secrets']
+    discovered_certs = classified['discovered']
 
-    res = tabulate_summary(ocp_certs, kubeconfigs, etcd_certs, router_certs, registry_certs)
+    res = tabulate_summary(ocp_certs, kubeconfigs, etcd_certs, router_certs, registry_certs, secret_certs,
+                           discovered_certs)
 
     msg = "Checked {count} total certificates. Expired/Warning/OK: {exp}/{warn}/{ok}. Warning window: {window} days".format(
         count=res['total'],
@@ -645,12 +1412,17 @@ an OpenShift Container Platform cluster
         check_results['etcd'] = [crt for crt in etcd_certs if crt['health'] in ['expired', 'warning']]
         check_results['registry'] = [crt for crt in registry_certs if crt['health'] in ['expired', 'warning']]
         check_results['router'] = [crt for crt in router_certs if crt['health'] in ['expired', 'warning']]
+        check_results['secrets'] = [crt for crt in secret_certs if crt['health'] in ['expired', 'warning']]
+        check_results['discovered'] = [crt for crt in discovered_certs if crt['health'] in ['expired', 'warning']]
     else:
         check_results['ocp_certs'] = ocp_certs
         check_results['kubeconfigs'] = kubeconfigs
         check_results['etcd'] = etcd_certs
         check_results['registry'] = registry_certs
         check_results['router'] = router_certs
+        check_results['secrets'] = secret_certs
+        check_results['discovered'] = discovered_certs
+    check_results['unparsable'] = classified['unparsable']
 
     # Sort the final results to report in order of ascending safety
     # time. That is to say, the certificates which will expire sooner
@@ -664,6 +1436,8 @@ an OpenShift Container Platform cluster
     check_results['ocp_certs'] = sorted(check_results['ocp_certs'], key=cert_key)
     check_results['kubeconfigs'] = sorted(check_results['kubeconfigs'], key=cert_key)
     check_results['etcd'] = sorted(check_results['etcd'], key=cert_key)
+    check_results['secrets'] = sorted(check_results['secrets'], key=cert_key)
+    check_results['discovered'] = sorted(check_results['discovered'], key=cert_key)
 
     # This module will never change anything, but we might want to
     # change the return code parameter if there is some catastrophic
@@ -681,6 +1455,11 @@ an OpenShift Container Platform cluster
 # It's just the way we do things in Ansible. So disable this warning
 #
 # pylint: disable=wrong-import-position,import-error
-from ansible.module_utils.basic import AnsibleModule  # noqa: E402
+try:
+    from ansible.module_utils.basic import AnsibleModule  # noqa: E402
+except ImportError:
+    # The scanning functions are also used by the certificate expiry
+    # exporter, on hosts without ansible
+    AnsibleModule = None
 if __name__ == '__main__':
     main()
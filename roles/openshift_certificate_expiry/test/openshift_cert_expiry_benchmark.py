@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+""" Benchmark of the openshift_cert_expiry certificate scan.
+
+Generates a synthetic tree of PEM certificates, laid out like the
+certificates of many masters and nodes, and scans it with an increasing
+number of workers, reporting the certificates parsed per second. Then
+compares the certificates decoded per second by the cryptography and
+pyOpenSSL decoding backends.
+
+Not collected by the test runner, run it directly:
+
+    python roles/openshift_certificate_expiry/test/openshift_cert_expiry_benchmark.py --certs 4000
+"""
+# pylint: disable=missing-docstring,invalid-name
+
+from __future__ import print_function
+
+import argparse
+import datetime
+import ipaddress
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from cryptography import x509
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+
+sys.path = [os.path.abspath(os.path.dirname(__file__) + "/../library/")] + sys.path
+
+# pylint: disable=import-error,wrong-import-position
+import openshift_cert_expiry  # noqa: E402
+
+
+def synthetic_cert_tree(root, count, seed=0):
+    """ Write `count` signed certificates under `root`, returning their paths
+
+        A single key signs every certificate, key generation would dominate
+        otherwise. Like master serving certificates they carry a dozen
+        subject alternative names. Expiry dates are spread from a year ago to
+        five years from now so every health classification is represented.
+    """
+    rng = random.Random(seed)
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048, backend=default_backend())
+    now = datetime.datetime.utcnow()
+    paths = []
+    for index in range(count):
+        host_dir = os.path.join(root, 'host-%03d' % (index // 20), 'origin', 'master')
+        if not os.path.isdir(host_dir):
+            os.makedirs(host_dir)
+
+        hostname = 'cert-%d.example.com' % index
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, hostname)])
+        alt_names = [x509.DNSName(hostname)] + \
+            [x509.DNSName('%s.default.svc.cluster.local' % svc) for svc in ['kubernetes', 'openshift', 'router']] + \
+            [x509.IPAddress(ipaddress.ip_address(u'172.30.%d.%d' % (index // 250, index % 250 + 1)))]
+        cert = x509.CertificateBuilder().subject_name(name).issuer_name(name) \
+            .public_key(key.public_key()).serial_number(index + 1) \
+            .not_valid_before(now - datetime.timedelta(days=400)) \
+            .not_valid_after(now + datetime.timedelta(days=rng.randint(-365, 5 * 365))) \
+            .add_extension(x509.SubjectAlternativeName(alt_names), critical=False) \
+            .sign(key, hashes.SHA256(), default_backend())
+
+        path = os.path.join(host_dir, 'cert-%d.crt' % index)
+        with open(path, 'wb') as fp:
+            fp.write(cert.public_bytes(serialization.Encoding.PEM))
+        paths.append(path)
+    return paths
+
+
+def bench_scan(paths, workers, number):
+    checks = [openshift_cert_expiry.cert_check('ocp_certs', path) for path in paths]
+    now = datetime.datetime.now()
+    window = datetime.timedelta(days=30)
+    best = None
+    result = None
+    for _ in range(number):
+        start = time.time()
+        result = openshift_cert_expiry.scan_certificates(checks, now, window, workers)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print('%-20s %10.1f certs/s  (%d in %.3fs)' % ('workers=%d' % workers, len(paths) / best, len(paths), best))
+    return result
+
+
+def bench_decode(paths, number):
+    pems = []
+    for path in paths:
+        with open(path, 'r') as fp:
+            pems.append(fp.read())
+
+    results = []
+    for name, decode in [('cryptography', openshift_cert_expiry.decode_certificate_cryptography),
+                         ('pyOpenSSL', openshift_cert_expiry.decode_certificate_openssl)]:
+        best = None
+        try:
+            for _ in range(number):
+                start = time.time()
+                decoded = [decode(pem) for pem in pems]
+                elapsed = time.time() - start
+                best = elapsed if best is None else min(best, elapsed)
+        except (AttributeError, NameError) as ex:
+            # pyOpenSSL >= 17.5 dropped the extension API, or the module is missing
+            print('%-20s unavailable (%s)' % ('decode ' + name, ex))
+            continue
+        print('%-20s %10.1f certs/s  (%d in %.3fs)' % ('decode ' + name, len(pems) / best, len(pems), best))
+        results.append(decoded)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--certs', type=int, default=3000, help='number of certificates to generate')
+    parser.add_argument('--workers', type=int, action='append',
+                        help='worker count to benchmark, may be repeated')
+    parser.add_argument('--number', type=int, default=3, help='scans per worker count, the best is reported')
+    args = parser.parse_args()
+
+    workers = args.workers or sorted(set([1, 2, 4, multiprocessing.cpu_count()]))
+    root = tempfile.mkdtemp(prefix='cert-expiry-bench-')
+    try:
+        paths = synthetic_cert_tree(root, args.certs)
+        results = [bench_scan(paths, count, args.number) for count in workers]
+        decoded = bench_decode(paths, args.number)
+    finally:
+        shutil.rmtree(root)
+
+    if any(result != results[0] for result in results):
+        print('scans with different worker counts disagree', file=sys.stderr)
+        return 1
+    if any(result != decoded[0] for result in decoded):
+        print('decoding backends disagree', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
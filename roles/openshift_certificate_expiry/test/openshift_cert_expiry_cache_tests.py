@@ -0,0 +1,116 @@
+""" Tests for the certificate metadata cache of openshift_cert_expiry. """
+# pylint: disable=missing-docstring,invalid-name
+
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path = [os.path.abspath(os.path.dirname(__file__) + "/../library/")] + sys.path
+
+# pylint: disable=import-error,wrong-import-position
+import openshift_cert_expiry  # noqa: E402
+
+NOW = datetime.datetime(2017, 1, 1)
+WINDOW = datetime.timedelta(days=30)
+
+
+class FakeLoadAndHandleCert(object):
+    """ 'certificates' are '<cn> <days remaining from NOW>' strings """
+    def __init__(self):
+        self.parsed = []
+
+    def __call__(self, cert_string, now, base64decode=False):
+        self.parsed.append(cert_string)
+        name, days = cert_string.split()
+        expiry = NOW + datetime.timedelta(days=int(days))
+        return ('CN:' + name, expiry, expiry - now)
+
+
+class CertMetadataCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.load_and_handle_cert = openshift_cert_expiry.load_and_handle_cert
+        self.fake = FakeLoadAndHandleCert()
+        openshift_cert_expiry.load_and_handle_cert = self.fake
+        self.tmpdir = tempfile.mkdtemp()
+        self.checks = [openshift_cert_expiry.cert_check('ocp_certs', self.write('cert-%d.crt' % i, 'cert-%d %d' % (i, i)))
+                       for i in range(5)]
+
+    def tearDown(self):
+        openshift_cert_expiry.load_and_handle_cert = self.load_and_handle_cert
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, name, content):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'w') as fp:
+            fp.write(content)
+        return path
+
+    def scan(self, cache, now=NOW):
+        return openshift_cert_expiry.scan_certificates(self.checks, now, WINDOW, workers=1, cache=cache)
+
+    def test_unchanged_certificates_are_not_parsed(self):
+        cache = openshift_cert_expiry.CertMetadataCache()
+        first = self.scan(cache)
+        self.assertEqual(5, len(self.fake.parsed))
+        self.assertEqual(first, self.scan(cache))
+        self.assertEqual(5, len(self.fake.parsed))
+
+    def test_changed_certificates_are_parsed(self):
+        cache = openshift_cert_expiry.CertMetadataCache()
+        self.scan(cache)
+        self.write('cert-1.crt', 'renewed 400')
+        # same content, new mtime
+        os.utime(self.checks[3]['path'], (0, 0))
+        classified = self.scan(cache)
+        self.assertEqual(['renewed 400', 'cert-3 3'], self.fake.parsed[5:])
+        self.assertEqual('CN:renewed', classified['ocp_certs'][1]['cert_cn'])
+        self.assertEqual(400, classified['ocp_certs'][1]['days_remaining'])
+
+    def test_health_is_classified_against_now(self):
+        cache = openshift_cert_expiry.CertMetadataCache()
+        self.assertEqual(['warning'] * 5, [cert['health'] for cert in self.scan(cache)['ocp_certs']])
+        later = self.scan(cache, now=NOW + datetime.timedelta(days=3, hours=1))['ocp_certs']
+        self.assertEqual(5, len(self.fake.parsed))
+        self.assertEqual(['expired', 'expired', 'expired', 'expired', 'warning'], [cert['health'] for cert in later])
+        self.assertEqual([-4, -3, -2, -1, 0], [cert['days_remaining'] for cert in later])
+
+    def test_persisted_cache(self):
+        filename = os.path.join(self.tmpdir, 'cache.json')
+        cache = openshift_cert_expiry.CertMetadataCache(filename)
+        first = self.scan(cache)
+        cache.save()
+        self.assertEqual(0o600, os.stat(filename).st_mode & 0o777)
+
+        self.assertEqual(first, self.scan(openshift_cert_expiry.CertMetadataCache(filename)))
+        self.assertEqual(5, len(self.fake.parsed))
+
+    def test_removed_checks_are_dropped(self):
+        cache = openshift_cert_expiry.CertMetadataCache()
+        self.scan(cache)
+        del self.checks[0]
+        cache.changed = False
+        self.scan(cache)
+        self.assertTrue(cache.changed)
+        self.assertEqual(4, len(cache.entries))
+
+    def test_invalid_cache_file(self):
+        filename = self.write('cache.json', '{"version": 1, "entr')
+        cache = openshift_cert_expiry.CertMetadataCache(filename)
+        self.assertEqual({}, cache.entries)
+        self.scan(cache)
+        cache.save()
+        self.assertEqual(cache.entries, openshift_cert_expiry.CertMetadataCache(filename).entries)
+
+    def test_unwritable_cache_is_ignored(self):
+        cache = openshift_cert_expiry.CertMetadataCache(os.path.join(self.tmpdir, 'missing', 'cache.json'))
+        self.scan(cache)
+        cache.save()
+        self.assertTrue(cache.changed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+""" Tests for the certificate decoding backends of openshift_cert_expiry. """
+# pylint: disable=missing-docstring,invalid-name
+
+import ast
+import base64
+import datetime
+import os
+import sys
+import unittest
+
+sys.path = [os.path.abspath(os.path.dirname(__file__) + "/../library/")] + sys.path
+
+# pylint: disable=import-error,wrong-import-position
+import openshift_cert_expiry  # noqa: E402
+
+try:
+    import ipaddress
+    from cryptography import x509
+    from cryptography.hazmat.backends import default_backend
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.x509.oid import NameOID
+    HAVE_CRYPTOGRAPHY = True
+except ImportError:
+    HAVE_CRYPTOGRAPHY = False
+
+NOT_AFTER = datetime.datetime(2018, 9, 22, 17, 4, 39)
+
+OO_FILTERS = os.path.abspath(os.path.dirname(__file__) + "/../../../filter_plugins/oo_filters.py")
+MODULE = os.path.abspath(os.path.dirname(__file__) + "/../library/openshift_cert_expiry.py")
+
+# The decoding helpers the oo_parse_named_certificates filter carries a
+# copy of. The filter names the backend flags HAS_* instead of HAVE_*.
+SHARED_HELPERS = ['SUBJECT_SHORT_NAMES', 'decode_certificate', 'format_general_name',
+                  'decode_certificate_cryptography', 'decode_certificate_openssl', 'to_native']
+
+
+def shared_helpers(path):
+    """ the definitions of SHARED_HELPERS in a file, with the HAS_* flags renamed HAVE_* """
+    with open(path) as source:
+        tree = ast.parse(source.read().replace('HAS_CRYPTOGRAPHY', 'HAVE_CRYPTOGRAPHY')
+                         .replace('HAS_OPENSSL', 'HAVE_OPENSSL'), path)
+    helpers = {}
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef):
+            name = node.name
+        elif isinstance(node, ast.Assign) and isinstance(node.targets[0], ast.Name):
+            name = node.targets[0].id
+        else:
+            continue
+        if name in SHARED_HELPERS:
+            helpers[name] = node
+    return helpers
+
+
+def load_filter_helpers():
+    """ compile the filter's copy of the helpers, oo_filters itself needs ansible and python 2 """
+    helpers = shared_helpers(OO_FILTERS)
+    namespace = dict(datetime=datetime, HAVE_CRYPTOGRAPHY=openshift_cert_expiry.HAVE_CRYPTOGRAPHY,
+                     HAVE_OPENSSL=openshift_cert_expiry.HAVE_OPENSSL)
+    for name in ['x509', 'default_backend', 'OpenSSL']:
+        if hasattr(openshift_cert_expiry, name):
+            namespace[name] = getattr(openshift_cert_expiry, name)
+    module = ast.parse('')
+    module.body = [helpers[name] for name in SHARED_HELPERS]
+    exec(compile(module, OO_FILTERS, 'exec'), namespace)  # pylint: disable=exec-used
+    return namespace
+
+
+def make_pem(alt_names=None):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048, backend=default_backend())
+    name = x509.Name([x509.NameAttribute(NameOID.ORGANIZATION_NAME, u'system:nodes'),
+                      x509.NameAttribute(NameOID.COMMON_NAME, u'system:node:m01.example.com')])
+    builder = x509.CertificateBuilder().subject_name(name).issuer_name(name) \
+        .public_key(key.public_key()).serial_number(1) \
+        .not_valid_before(datetime.datetime(2016, 9, 22)).not_valid_after(NOT_AFTER)
+    if alt_names:
+        builder = builder.add_extension(x509.SubjectAlternativeName(alt_names), critical=False)
+    return builder.sign(key, hashes.SHA256(), default_backend()).public_bytes(serialization.Encoding.PEM)
+
+
+def openssl_has_extension_api():
+    return openshift_cert_expiry.HAVE_OPENSSL and hasattr(openshift_cert_expiry.OpenSSL.crypto.X509, 'get_extension')
+
+
+@unittest.skipUnless(HAVE_CRYPTOGRAPHY, 'cryptography is needed to generate the certificates')
+class DecodeCertificateTests(unittest.TestCase):
+
+    def setUp(self):
+        self.pem = make_pem([x509.DNSName(u'kubernetes'),
+                             x509.IPAddress(ipaddress.ip_address(u'172.30.0.1')),
+                             x509.IPAddress(ipaddress.ip_address(u'2001:db8::1'))])
+
+    def test_cryptography(self):
+        subject, subject_alt_names, not_after = openshift_cert_expiry.decode_certificate_cryptography(self.pem)
+        self.assertEqual([('O', 'system:nodes'), ('CN', 'system:node:m01.example.com')], subject)
+        self.assertEqual(['DNS:kubernetes', 'IP Address:172.30.0.1', 'IP Address:2001:DB8:0:0:0:0:0:1'],
+                         subject_alt_names)
+        self.assertEqual(NOT_AFTER, not_after)
+
+    def test_without_subject_alt_names(self):
+        self.assertEqual([], openshift_cert_expiry.decode_certificate_cryptography(make_pem())[1])
+
+    @unittest.skipUnless(openssl_has_extension_api(), 'pyOpenSSL dropped X509.get_extension')
+    def test_backends_agree(self):
+        for pem in [self.pem, make_pem()]:
+            self.assertEqual(openshift_cert_expiry.decode_certificate_cryptography(pem),
+                             openshift_cert_expiry.decode_certificate_openssl(pem))
+
+    def test_load_and_handle_cert(self):
+        now = datetime.datetime(2017, 9, 22, 17, 4, 39)
+        expected = ('O:system:nodes, CN:system:node:m01.example.com, DNS:kubernetes, IP Address:172.30.0.1, '
+                    'IP Address:2001:DB8:0:0:0:0:0:1', NOT_AFTER, datetime.timedelta(days=365))
+        self.assertEqual(expected, openshift_cert_expiry.load_and_handle_cert(self.pem.decode('ascii'), now))
+        self.assertEqual(expected, openshift_cert_expiry.load_and_handle_cert(base64.b64encode(self.pem), now,
+                                                                              base64decode=True))
+
+
+class FilterCopyTests(unittest.TestCase):
+    """ the copy of the helpers in filter_plugins/oo_filters.py must not drift """
+
+    def test_same_code(self):
+        module_helpers = shared_helpers(MODULE)
+        filter_helpers = shared_helpers(OO_FILTERS)
+        for name in SHARED_HELPERS:
+            self.assertEqual(ast.dump(module_helpers[name]), ast.dump(filter_helpers[name]),
+                             '{} differs between the module and the filter'.format(name))
+
+    @unittest.skipUnless(HAVE_CRYPTOGRAPHY, 'cryptography is needed to generate the certificates')
+    def test_same_results(self):
+        helpers = load_filter_helpers()
+        pems = [make_pem([x509.DNSName(u'kubernetes'),
+                          x509.IPAddress(ipaddress.ip_address(u'172.30.0.1')),
+                          x509.IPAddress(ipaddress.ip_address(u'2001:db8::1')),
+                          x509.RFC822Name(u'admin@example.com'),
+                          x509.UniformResourceIdentifier(u'https://example.com'),
+                          x509.RegisteredID(x509.ObjectIdentifier(u'1.2.3.4'))]),
+                make_pem()]
+        for pem in pems:
+            self.assertEqual(openshift_cert_expiry.decode_certificate(pem), helpers['decode_certificate'](pem))
+            self.assertEqual(openshift_cert_expiry.decode_certificate_cryptography(pem),
+                             helpers['decode_certificate_cryptography'](pem))
+            if openssl_has_extension_api():
+                self.assertEqual(openshift_cert_expiry.decode_certificate_openssl(pem),
+                                 helpers['decode_certificate_openssl'](pem))
+
+
+if __name__ == '__main__':
+    unittest.main()
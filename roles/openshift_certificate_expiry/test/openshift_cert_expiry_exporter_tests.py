@@ -0,0 +1,147 @@
+""" Tests for the continuous certificate expiry exporter. """
+# pylint: disable=missing-docstring,invalid-name
+
+import argparse
+import base64
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path = [os.path.abspath(os.path.dirname(__file__) + "/../files/")] + sys.path
+
+# pylint: disable=import-error,wrong-import-position
+import openshift_cert_expiry_exporter as exporter  # noqa: E402
+from openshift_cert_expiry_exporter import openshift_cert_expiry  # noqa: E402
+
+
+def pem(name, days):
+    body = base64.b64encode(('%s %d' % (name, days)).encode('ascii') * 20)
+    return b'-----BEGIN CERTIFICATE-----\n' + body + b'\n-----END CERTIFICATE-----\n'
+
+
+class FakeLoadAndHandleCert(object):
+    """ the DER of the fake certificates is '<cn> <days until expiry from 2017-01-01>' repeated 20 times """
+    def __init__(self):
+        self.parsed = []
+
+    def __call__(self, cert_string, now, base64decode=False):
+        der = base64.b64decode(''.join(cert_string.strip().split('\n')[1:-1]))
+        name, days = der[:len(der) // 20].decode('ascii').split()
+        self.parsed.append(name)
+        expiry = datetime.datetime(2017, 1, 1) + datetime.timedelta(days=int(days))
+        return ('CN:' + name, expiry, expiry - now)
+
+
+class FakeWatcher(object):
+    def __init__(self):
+        self.watched = []
+        self.waits = 0
+
+    def watch(self, path):
+        self.watched.append(path)
+        return os.path.isdir(path)
+
+    def wait(self, _):
+        self.waits += 1
+        return True
+
+    def drain(self):
+        pass
+
+
+class FormatMetricsTests(unittest.TestCase):
+
+    def test_format_metrics(self):
+        classified = dict((category, []) for category in openshift_cert_expiry.CERT_CATEGORIES)
+        classified['etcd'].append(dict(cert_cn='CN:etcd-signer@1474563722', path='/etc/etcd/ca.crt',
+                                       expiry='2017-01-02 00:00:00', days_remaining=1, health='warning'))
+        classified['discovered'].append(dict(cert_cn='CN:"quoted"\\', path='/etc/origin/ca-bundle.crt#2',
+                                             expiry='1970-01-02 00:00:00', days_remaining=-1, health='expired'))
+        metrics = exporter.format_metrics(classified, datetime.datetime(2017, 1, 1), 1483228800.5)
+        self.assertIn('\nopenshift_cert_expiry_seconds_remaining{category="etcd",cn="CN:etcd-signer@1474563722",'
+                      'path="/etc/etcd/ca.crt"} 86400\n', metrics)
+        self.assertIn('\nopenshift_cert_expiry_timestamp_seconds{category="discovered",cn="CN:\\"quoted\\"\\\\",'
+                      'path="/etc/origin/ca-bundle.crt#2"} 86400\n', metrics)
+        self.assertTrue(metrics.endswith('\nopenshift_cert_expiry_last_scan_timestamp_seconds 1483228800\n'))
+
+    def test_seconds_to_next_day(self):
+        self.assertEqual(3600, exporter.seconds_to_next_day(datetime.datetime(2017, 1, 1, 23)))
+        self.assertEqual(86400, exporter.seconds_to_next_day(datetime.datetime(2017, 1, 1)))
+
+
+class InotifyTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        try:
+            self.inotify = exporter.Inotify()
+        except OSError as ex:
+            self.skipTest(str(ex))
+
+    def tearDown(self):
+        self.inotify.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_changes_are_seen(self):
+        self.assertTrue(self.inotify.watch(self.tmpdir))
+        self.assertFalse(self.inotify.watch(os.path.join(self.tmpdir, 'missing')))
+        self.assertFalse(self.inotify.wait(0))
+        with open(os.path.join(self.tmpdir, 'ca.crt'), 'w') as fp:
+            fp.write('changed')
+        self.assertTrue(self.inotify.wait(1))
+        self.assertFalse(self.inotify.wait(0))
+        os.rename(os.path.join(self.tmpdir, 'ca.crt'), os.path.join(self.tmpdir, 'ca.crt.old'))
+        self.assertTrue(self.inotify.wait(1))
+
+
+class ExporterTests(unittest.TestCase):
+
+    def setUp(self):
+        self.load_and_handle_cert = openshift_cert_expiry.load_and_handle_cert
+        self.fake = FakeLoadAndHandleCert()
+        openshift_cert_expiry.load_and_handle_cert = self.fake
+        self.tmpdir = tempfile.mkdtemp()
+        self.certs = os.path.join(self.tmpdir, 'certs')
+        os.makedirs(os.path.join(self.certs, 'named'))
+        self.write('certs/ca.crt', pem('ca', 400))
+        self.write('certs/named/web.crt', pem('web', 20) + pem('ca', 400))
+        self.args = argparse.Namespace(
+            textfile=os.path.join(self.tmpdir, 'cert_expiry.prom'), config_base=os.path.join(self.tmpdir, 'origin'),
+            discovery_path=[self.certs], cache_path='', warning_days=30, workers=1, settle=0)
+        self.watcher = FakeWatcher()
+
+    def tearDown(self):
+        openshift_cert_expiry.load_and_handle_cert = self.load_and_handle_cert
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, name, content):
+        with open(os.path.join(self.tmpdir, name), 'wb') as fp:
+            fp.write(content)
+
+    def metrics(self):
+        with open(self.args.textfile) as textfile:
+            return [line for line in textfile if line.startswith('openshift_cert_expiry_seconds_remaining')]
+
+    def test_rescan_parses_changed_certificates(self):
+        export = exporter.Exporter(self.args, self.watcher)
+        export.run(iterations=1)
+        self.assertEqual(['ca', 'web'], self.fake.parsed)
+        self.assertEqual(2, len(self.metrics()))
+        self.assertEqual(set([self.certs, os.path.join(self.certs, 'named')]), export.watched)
+
+        self.write('certs/named/web.crt', pem('web', 420) + pem('ca', 400))
+        export.run(iterations=1)
+        self.assertEqual(['ca', 'web', 'web'], self.fake.parsed)
+        self.assertEqual(2, len(self.metrics()))
+
+    def test_run_waits_for_changes(self):
+        exporter.Exporter(self.args, self.watcher).run(iterations=3)
+        self.assertEqual(2, self.watcher.waits)
+        self.assertEqual(2, len(self.fake.parsed))
+
+
+if __name__ == '__main__':
+    unittest.main()
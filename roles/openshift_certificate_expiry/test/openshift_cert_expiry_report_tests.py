@@ -0,0 +1,97 @@
+""" Tests for the streaming expiry report of openshift_cert_expiry_report. """
+# pylint: disable=missing-docstring,invalid-name
+
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path = [os.path.abspath(os.path.dirname(__file__) + "/../action_plugins/")] + sys.path
+
+# pylint: disable=import-error,wrong-import-position
+from openshift_cert_expiry_report import ExpiryReportIndex  # noqa: E402
+
+
+def cert(path, expiry, health='ok'):
+    return dict(cert_cn='CN:' + os.path.basename(path), path=path, expiry=expiry, days_remaining=0, health=health)
+
+
+def host_results(index):
+    check_results = dict(
+        meta=dict(warning_days=30),
+        ocp_certs=[cert('/etc/origin/master/master.server.crt', '2019-0%d-01 12:00:00' % (index % 9 + 1))],
+        etcd=[cert('/etc/etcd/ca.crt', '2017-01-01 00:00:0%d' % (index % 10), 'expired')],
+        kubeconfigs=[],
+    )
+    summary = dict(total=3, ok=1, warning=1, expired=1)
+    return check_results, summary
+
+
+def add_host(args):
+    report_dir, index = args
+    check_results, summary = host_results(index)
+    ExpiryReportIndex(report_dir).add_host('node%02d' % index, check_results, summary)
+
+
+class ExpiryReportIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.report_dir = tempfile.mkdtemp()
+        self.index = ExpiryReportIndex(self.report_dir)
+        self.index.reset()
+
+    def tearDown(self):
+        shutil.rmtree(self.report_dir)
+
+    def report(self):
+        with open(os.path.join(self.report_dir, 'expiry.jsonl')) as report:
+            return [json.loads(line) for line in report]
+
+    def test_summary_is_updated_per_host(self):
+        add_host((self.report_dir, 1))
+        self.assertEqual(dict(hosts=1, total=3, ok=1, warning=1, expired=1, earliest_expiry='2017-01-01 00:00:01',
+                              earliest_expiry_host='node01'), self.index.summary())
+        add_host((self.report_dir, 0))
+        summary = self.index.summary()
+        self.assertEqual((2, 6), (summary['hosts'], summary['total']))
+        self.assertEqual(('2017-01-01 00:00:00', 'node00'), (summary['earliest_expiry'], summary['earliest_expiry_host']))
+
+    def test_report_is_sorted_by_expiry(self):
+        for index in [3, 12, 0, 7]:
+            add_host((self.report_dir, index))
+        summary = self.index.finalize()
+        self.assertEqual(4, summary['hosts'])
+
+        report = self.report()
+        self.assertEqual(8, len(report))
+        self.assertEqual(sorted(cert['expiry'] for cert in report), [cert['expiry'] for cert in report])
+        self.assertEqual(dict(cert_cn='CN:ca.crt', path='/etc/etcd/ca.crt', expiry='2017-01-01 00:00:00',
+                              days_remaining=0, health='expired', host='node00', category='etcd'), report[0])
+        # same expiry, ordered by host
+        self.assertEqual(['node00', 'node03', 'node12', 'node07'], [cert['host'] for cert in report[4:]])
+
+    def test_concurrent_hosts(self):
+        pool = multiprocessing.Pool(4)
+        try:
+            pool.map(add_host, [(self.report_dir, index) for index in range(40)])
+        finally:
+            pool.close()
+            pool.join()
+        summary = self.index.finalize()
+        self.assertEqual((40, 120, 40), (summary['hosts'], summary['total'], summary['expired']))
+        self.assertEqual(80, len(self.report()))
+
+    def test_reset(self):
+        add_host((self.report_dir, 1))
+        self.index.finalize()
+        self.index.reset()
+        self.assertEqual(0, self.index.summary()['hosts'])
+        self.assertFalse(os.path.exists(os.path.join(self.report_dir, 'expiry.jsonl')))
+        self.assertEqual([], os.listdir(os.path.join(self.report_dir, 'index')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+""" Tests for the concurrent certificate scan of openshift_cert_expiry. """
+# pylint: disable=missing-docstring,invalid-name
+
+import base64
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path = [os.path.abspath(os.path.dirname(__file__) + "/../library/")] + sys.path
+
+# pylint: disable=import-error,wrong-import-position
+import openshift_cert_expiry  # noqa: E402
+
+NOW = datetime.datetime(2017, 1, 1)
+WINDOW = datetime.timedelta(days=30)
+
+
+def fake_load_and_handle_cert(cert_string, now, base64decode=False):
+    """ 'certificates' are '<cn> <days remaining>' strings """
+    if base64decode:
+        cert_string = base64.b64decode(cert_string).decode('utf-8')
+    name, days = cert_string.split()
+    time_remaining = datetime.timedelta(days=int(days))
+    return ('CN:' + name, now + time_remaining, time_remaining)
+
+
+class ScanCertificatesTests(unittest.TestCase):
+
+    def setUp(self):
+        self.load_and_handle_cert = openshift_cert_expiry.load_and_handle_cert
+        openshift_cert_expiry.load_and_handle_cert = fake_load_and_handle_cert
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        openshift_cert_expiry.load_and_handle_cert = self.load_and_handle_cert
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, name, content):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'w') as fp:
+            fp.write(content)
+        return path
+
+    def cert_checks(self, count):
+        return [openshift_cert_expiry.cert_check('ocp_certs', self.write('cert-%d.crt' % i,
+                                                                         'cert-%d %d' % (i, (i * 37) % 400 - 100)))
+                for i in range(count)]
+
+    def test_check_kinds(self):
+        kubeconfig = self.write('admin.kubeconfig', 'users:\n- user:\n    client-certificate-data: %s\n'
+                                % base64.b64encode(b'admin 10').decode('ascii'))
+        checks = [
+            openshift_cert_expiry.cert_check('etcd', self.write('ca.crt', 'etcd-ca -5')),
+            openshift_cert_expiry.cert_check('kubeconfigs', kubeconfig, kind='kubeconfig'),
+            openshift_cert_expiry.cert_check('router', '/api/v1/namespaces/default/secrets/router-certs',
+                                             kind='secret', data=base64.b64encode(b'router 100')),
+        ]
+        classified = openshift_cert_expiry.scan_certificates(checks, NOW, WINDOW, workers=1)
+
+        self.assertEqual([], classified['ocp_certs'])
+        self.assertEqual([], classified['registry'])
+        self.assertEqual([dict(cert_cn='CN:etcd-ca', path=checks[0]['path'], expiry='2016-12-27 00:00:00',
+                               days_remaining=-5, health='expired')], classified['etcd'])
+        self.assertEqual('warning', classified['kubeconfigs'][0]['health'])
+        self.assertEqual(kubeconfig, classified['kubeconfigs'][0]['path'])
+        self.assertEqual('ok', classified['router'][0]['health'])
+        self.assertEqual(100, classified['router'][0]['days_remaining'])
+
+    def test_workers_merge_in_check_order(self):
+        checks = self.cert_checks(200)
+        serial = openshift_cert_expiry.scan_certificates(checks, NOW, WINDOW, workers=1)
+        self.assertEqual(serial, openshift_cert_expiry.scan_certificates(checks, NOW, WINDOW, workers=4))
+        self.assertEqual([check['path'] for check in checks], [cert['path'] for cert in serial['ocp_certs']])
+
+    def test_workers_bounded_by_checks(self):
+        checks = self.cert_checks(1)
+        classified = openshift_cert_expiry.scan_certificates(checks, NOW, WINDOW, workers=8)
+        self.assertEqual(1, len(classified['ocp_certs']))
+        self.assertEqual([], openshift_cert_expiry.scan_certificates([], NOW, WINDOW)['ocp_certs'])
+
+    def test_default_workers(self):
+        self.assertEqual(1, openshift_cert_expiry.scan_workers(None, 0))
+        self.assertEqual(1, openshift_cert_expiry.scan_workers(None, openshift_cert_expiry.POOL_MIN_CHECKS - 1))
+        workers = openshift_cert_expiry.scan_workers(None, 10000)
+        self.assertTrue(1 <= workers <= openshift_cert_expiry.POOL_MAX_WORKERS)
+        # an explicit number of workers is only bounded by the certificates to parse
+        self.assertEqual(8, openshift_cert_expiry.scan_workers(8, 20))
+        self.assertEqual(3, openshift_cert_expiry.scan_workers(8, 3))
+        self.assertEqual(1, openshift_cert_expiry.scan_workers(8, 0))
+
+    def test_cached_checks_do_not_need_parsing(self):
+        checks = self.cert_checks(2) + [openshift_cert_expiry.cert_check('router', 'router-certs', kind='secret',
+                                                                         data=base64.b64encode(b'router 100'))]
+        cache = openshift_cert_expiry.CertMetadataCache()
+        openshift_cert_expiry.scan_certificates(checks, NOW, WINDOW, workers=1, cache=cache)
+        self.assertEqual([False, False, False], [openshift_cert_expiry.needs_parsing(check, cache.get(check))
+                                                 for check in checks])
+        self.write('cert-1.crt', 'cert-1 123456')
+        checks[2]['data'] = base64.b64encode(b'router 200')
+        self.assertEqual([False, True, True], [openshift_cert_expiry.needs_parsing(check, cache.get(check))
+                                               for check in checks])
+        self.assertTrue(openshift_cert_expiry.needs_parsing(checks[0], None))
+
+    def test_parse_errors_are_raised(self):
+        checks = self.cert_checks(3) + [openshift_cert_expiry.cert_check('etcd', '/does/not/exist.crt')]
+        self.assertRaises(IOError, openshift_cert_expiry.scan_certificates, checks, NOW, WINDOW, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,255 @@
+""" Tests for listing the certificate secrets in openshift_cert_expiry. """
+# pylint: disable=missing-docstring,invalid-name
+
+import base64
+import datetime
+import json
+import os
+import shutil
+import ssl
+import sys
+import tempfile
+import threading
+import unittest
+
+from six.moves import BaseHTTPServer, http_client
+
+sys.path = [os.path.abspath(os.path.dirname(__file__) + "/../library/")] + sys.path
+
+# pylint: disable=import-error,wrong-import-position
+import openshift_cert_expiry  # noqa: E402
+
+try:
+    import ipaddress
+    from cryptography import x509
+    from cryptography.hazmat.backends import default_backend
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.x509.oid import NameOID
+    HAVE_CRYPTOGRAPHY = True
+except ImportError:
+    HAVE_CRYPTOGRAPHY = False
+
+
+def secret(namespace, name, data, secret_type='Opaque'):
+    return {'metadata': {'namespace': namespace, 'name': name,
+                         'selfLink': '/api/v1/namespaces/%s/secrets/%s' % (namespace, name)},
+            'type': secret_type,
+            'data': data}
+
+
+SECRETS = [
+    secret('default', 'registry-certificates', {'registry.crt': 'cmVnaXN0cnk=', 'registry.key': 'a2V5'}),
+    secret('default', 'router-certs', {'tls.crt': 'cm91dGVy', 'tls.key': 'a2V5'}, 'kubernetes.io/tls'),
+    secret('myapp', 'web', {'tls.crt': 'd2Vi'}, 'kubernetes.io/tls'),
+    secret('myapp', 'api', {'tls.crt': 'YXBp'}, 'kubernetes.io/tls'),
+    secret('myapp', 'settings', {'settings': 'e30='}),
+    secret('other', 'web', {'tls.crt': 'b3RoZXI='}, 'kubernetes.io/tls'),
+]
+
+
+class SecretCertChecksTests(unittest.TestCase):
+
+    def test_router_and_registry(self):
+        checks = openshift_cert_expiry.secret_cert_checks(SECRETS)
+        self.assertEqual([('router', '/api/v1/namespaces/default/secrets/router-certs', 'cm91dGVy'),
+                          ('registry', '/api/v1/namespaces/default/secrets/registry-certificates', 'cmVnaXN0cnk=')],
+                         [(check['category'], check['path'], check['data']) for check in checks])
+        self.assertEqual(['secret', 'secret'], [check['kind'] for check in checks])
+
+    def test_tls_secret_namespaces(self):
+        checks = openshift_cert_expiry.secret_cert_checks(SECRETS, ['myapp', 'default'])
+        self.assertEqual(['router', 'registry', 'secrets', 'secrets'], [check['category'] for check in checks])
+        self.assertEqual(['/api/v1/namespaces/myapp/secrets/api', '/api/v1/namespaces/myapp/secrets/web'],
+                         [check['path'] for check in checks[2:]])
+
+    def test_missing_secrets(self):
+        self.assertEqual([], openshift_cert_expiry.secret_cert_checks([]))
+        router = secret('default', 'router-certs', {'tls.key': 'a2V5'}, 'kubernetes.io/tls')
+        self.assertEqual([], openshift_cert_expiry.secret_cert_checks([router]))
+
+    def test_secrets_api_path(self):
+        self.assertEqual('/api/v1/namespaces/default/secrets?fieldSelector=type%21%3Dkubernetes.io%2Fservice-account-token'
+                         '%2Ctype%21%3Dkubernetes.io%2Fdockercfg',
+                         openshift_cert_expiry.secrets_api_path(['default']))
+        self.assertTrue(openshift_cert_expiry.secrets_api_path(['default', 'myapp']).startswith('/api/v1/secrets?'))
+
+
+class FakePopen(object):
+    commands = []
+    output = b''
+
+    def __init__(self, command, stdout=None):
+        self.commands.append(command)
+
+    def communicate(self):
+        return self.output, None
+
+
+class FakeSubprocess(object):
+    PIPE = None
+    Popen = FakePopen
+
+
+class FetchSecretsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.subprocess = openshift_cert_expiry.subprocess
+        openshift_cert_expiry.subprocess = FakeSubprocess
+        FakePopen.commands = []
+        FakePopen.output = json.dumps({'kind': 'List', 'items': SECRETS}).encode('utf-8')
+
+    def tearDown(self):
+        openshift_cert_expiry.subprocess = self.subprocess
+
+    def test_fallback_to_a_single_oc_command(self):
+        secrets = openshift_cert_expiry.fetch_secrets('/does/not/exist.kubeconfig', ['default', 'default'])
+        self.assertEqual([['oc', 'get', 'secrets', '-o', 'json', '-n', 'default']], FakePopen.commands)
+        self.assertEqual(['registry-certificates', 'router-certs'], [s['metadata']['name'] for s in secrets])
+
+        openshift_cert_expiry.fetch_secrets('/does/not/exist.kubeconfig', ['default', 'myapp'])
+        self.assertEqual(['oc', 'get', 'secrets', '-o', 'json', '--all-namespaces'], FakePopen.commands[1])
+
+    def test_fallback_on_a_broken_http_response(self):
+        def fetch_secrets_from_api(*_):
+            raise http_client.BadStatusLine('')
+
+        original = openshift_cert_expiry.fetch_secrets_from_api
+        openshift_cert_expiry.fetch_secrets_from_api = fetch_secrets_from_api
+        try:
+            secrets = openshift_cert_expiry.fetch_secrets('/etc/origin/master/admin.kubeconfig', ['default'])
+        finally:
+            openshift_cert_expiry.fetch_secrets_from_api = original
+        self.assertEqual(1, len(FakePopen.commands))
+        self.assertEqual(['registry-certificates', 'router-certs'], [s['metadata']['name'] for s in secrets])
+
+    def test_fallback_on_a_malformed_kubeconfig_or_response(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            kubeconfig = os.path.join(tmpdir, 'admin.kubeconfig')
+            for content in ['', '- a list', 'contexts: []', 'contexts:\n- name: admin\n  context: null', '{']:
+                with open(kubeconfig, 'w') as fp:
+                    fp.write(content)
+                secrets = openshift_cert_expiry.fetch_secrets(kubeconfig, ['default'])
+                self.assertEqual(['registry-certificates', 'router-certs'],
+                                 [s['metadata']['name'] for s in secrets])
+        finally:
+            shutil.rmtree(tmpdir)
+
+        FakePopen.output = json.dumps([SECRETS]).encode('utf-8')
+        self.assertEqual([], openshift_cert_expiry.fetch_secrets('/does/not/exist.kubeconfig', ['default']))
+
+    def test_programming_errors_are_not_hidden(self):
+        def fetch_secrets_from_api(*_):
+            raise TypeError('a bug')
+
+        original = openshift_cert_expiry.fetch_secrets_from_api
+        openshift_cert_expiry.fetch_secrets_from_api = fetch_secrets_from_api
+        try:
+            self.assertRaises(TypeError, openshift_cert_expiry.fetch_secrets,
+                              '/etc/origin/master/admin.kubeconfig', ['default'])
+        finally:
+            openshift_cert_expiry.fetch_secrets_from_api = original
+
+    def test_not_a_master(self):
+        FakePopen.output = b''
+        self.assertEqual([], openshift_cert_expiry.fetch_secrets('/does/not/exist.kubeconfig', ['default']))
+
+
+def make_cert(common_name, key, issuer=None, issuer_key=None, ip=None):
+    now = datetime.datetime.utcnow()
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, common_name)])
+    builder = x509.CertificateBuilder().subject_name(name).issuer_name(issuer or name) \
+        .public_key(key.public_key()).serial_number(x509.random_serial_number()) \
+        .not_valid_before(now - datetime.timedelta(days=1)).not_valid_after(now + datetime.timedelta(days=1))
+    if issuer is None:
+        builder = builder.add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+    if ip is not None:
+        builder = builder.add_extension(x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address(ip))]),
+                                        critical=False)
+    cert = builder.sign(issuer_key or key, hashes.SHA256(), default_backend())
+    return cert.public_bytes(serialization.Encoding.PEM)
+
+
+def make_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048, backend=default_backend())
+
+
+def key_pem(key):
+    return key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.TraditionalOpenSSL,
+                             serialization.NoEncryption())
+
+
+class FakeApiHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    requests = []
+
+    def do_GET(self):
+        self.requests.append((self.path, self.connection.getpeercert()))
+        body = json.dumps({'kind': 'SecretList', 'items': SECRETS}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_):
+        pass
+
+
+@unittest.skipUnless(HAVE_CRYPTOGRAPHY, 'cryptography is needed to generate the certificates')
+class FetchSecretsFromApiTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        ca_key, server_key, client_key = make_key(), make_key(), make_key()
+        ca_cert = make_cert('openshift-signer', ca_key)
+        ca_name = x509.load_pem_x509_certificate(ca_cert, default_backend()).subject
+        server_cert = make_cert('127.0.0.1', server_key, ca_name, ca_key, ip='127.0.0.1')
+        client_cert = make_cert('system:admin', client_key, ca_name, ca_key)
+
+        for name, content in [('ca.crt', ca_cert), ('server.crt', server_cert), ('server.key', key_pem(server_key))]:
+            with open(os.path.join(self.tmpdir, name), 'wb') as fp:
+                fp.write(content)
+
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.verify_mode = ssl.CERT_REQUIRED
+        context.load_verify_locations(os.path.join(self.tmpdir, 'ca.crt'))
+        context.load_cert_chain(os.path.join(self.tmpdir, 'server.crt'), os.path.join(self.tmpdir, 'server.key'))
+        self.server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0), FakeApiHandler)
+        self.server.socket = context.wrap_socket(self.server.socket, server_side=True)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        FakeApiHandler.requests = []
+
+        self.kubeconfig = os.path.join(self.tmpdir, 'admin.kubeconfig')
+        with open(self.kubeconfig, 'w') as fp:
+            json.dump({
+                'clusters': [{'name': 'other', 'cluster': {'server': 'https://192.0.2.1:8443'}},
+                             {'name': 'local', 'cluster': {'server': 'https://127.0.0.1:%d/' % self.server.server_port,
+                                                           'certificate-authority': 'ca.crt'}}],
+                'users': [{'name': 'system:admin/local',
+                           'user': {'client-certificate-data': base64.b64encode(client_cert).decode('ascii'),
+                                    'client-key-data': base64.b64encode(key_pem(client_key)).decode('ascii')}}],
+                'contexts': [{'name': 'default/local/system:admin',
+                              'context': {'cluster': 'local', 'user': 'system:admin/local'}}],
+                'current-context': 'default/local/system:admin',
+            }, fp)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        shutil.rmtree(self.tmpdir)
+
+    def test_single_authenticated_request(self):
+        secrets = openshift_cert_expiry.fetch_secrets(self.kubeconfig, ['default', 'myapp'])
+        self.assertEqual(1, len(FakeApiHandler.requests))
+        path, peer_cert = FakeApiHandler.requests[0]
+        self.assertEqual(openshift_cert_expiry.secrets_api_path(['default', 'myapp']), path)
+        self.assertEqual(((('commonName', 'system:admin'),),), peer_cert['subject'])
+        self.assertEqual(['registry-certificates', 'router-certs', 'web', 'api', 'settings'],
+                         [s['metadata']['name'] for s in secrets])
+
+
+if __name__ == '__main__':
+    unittest.main()
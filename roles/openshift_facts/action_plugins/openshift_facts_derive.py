@@ -0,0 +1,62 @@
+"""
+Controller side generation of the openshift facts.
+
+Run once, the action generates the openshift facts of every host from the
+openshift_probes fact recorded by `openshift_facts: record_probes=true`, in
+a pool of processes. Run on each host with the registered result as
+`derived`, it sets the openshift fact of the host.
+"""
+# pylint: disable=missing-docstring
+
+import imp
+import os
+
+from ansible.plugins.action import ActionBase
+
+
+def load_openshift_facts():
+    """ Load the openshift_facts module of this role """
+    path = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                        '..', 'library', 'openshift_facts.py')
+    return imp.load_source('openshift_facts', path)
+
+
+class ActionModule(ActionBase):
+
+    TRANSFERS_FILES = False
+
+    def run(self, tmp=None, task_vars=None):
+        result = super(ActionModule, self).run(tmp, task_vars)
+        task_vars = task_vars or {}
+
+        derived = self._task.args.get('derived')
+        if derived is not None:
+            host = task_vars['inventory_hostname']
+            if host not in derived:
+                result['failed'] = True
+                result['msg'] = 'No openshift facts were derived for {0}'.format(host)
+                return result
+            result['ansible_facts'] = dict(openshift=derived[host])
+            return result
+
+        hosts = self._task.args.get('hosts') or task_vars.get('ansible_play_hosts') or task_vars['play_hosts']
+        processes = self._task.args.get('processes')
+        hostvars = task_vars['hostvars']
+
+        missing = [host for host in hosts if 'openshift_probes' not in hostvars[host]]
+        if missing:
+            result['failed'] = True
+            result['msg'] = 'openshift_probes is not set for {0}, run openshift_facts with ' \
+                            'record_probes first'.format(', '.join(missing))
+            return result
+
+        openshift_facts = load_openshift_facts()
+        recordings = dict((host, hostvars[host]['openshift_probes']) for host in hosts)
+        try:
+            result['facts'] = openshift_facts.derive_facts_for_hosts(
+                recordings, int(processes) if processes else None)
+        except openshift_facts.OpenShiftFactsProbeNotRecordedError as ex:
+            result['failed'] = True
+            result['msg'] = str(ex)
+        result['changed'] = False
+        return result
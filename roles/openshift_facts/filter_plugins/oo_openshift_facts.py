@@ -0,0 +1,39 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# vim: expandtab:tabstop=4:shiftwidth=4
+"""
+Custom filters for use with the openshift_facts module
+"""
+
+# The setup facts read by the openshift_facts module, keep in sync with
+# SYSTEM_FACTS in library/openshift_facts.py
+SYSTEM_FACTS = ['ansible_default_ipv4', 'ansible_fqdn', 'ansible_nodename', 'ansible_pkg_mgr',
+                'ansible_product_name', 'ansible_product_version',
+                'ansible_virtualization_role', 'ansible_virtualization_type']
+
+
+class FilterModule(object):
+    """ Custom ansible filters """
+
+    @staticmethod
+    def oo_openshift_system_facts(host_vars):
+        """ Select the setup facts read by the openshift_facts module, to
+            pass as its system_facts parameter.
+
+            Ex: system_facts: "{{ hostvars[inventory_hostname] | oo_openshift_system_facts }}"
+
+            Facts which were not gathered are left out, in which case the
+            module gathers the facts it needs itself.
+        """
+        system_facts = dict((fact, host_vars[fact]) for fact in SYSTEM_FACTS if fact in host_vars)
+        for interface in host_vars.get('ansible_interfaces', []):
+            fact = 'ansible_' + interface.replace('-', '_')
+            if fact in host_vars:
+                system_facts[fact] = host_vars[fact]
+        return system_facts
+
+    def filters(self):
+        """ returns a mapping of filters to methods """
+        return {
+            "oo_openshift_system_facts": self.oo_openshift_system_facts,
+        }
@@ -10,13 +10,19 @@
 # pylint: disable=no-name-in-module, import-error, wrong-import-order
 import copy
 import errno
+import hashlib
 import json
 import re
 import io
+import multiprocessing
 import os
 import yaml
 import struct
 import socket
+import tempfile
+import time
+import threading
+from contextlib import contextmanager
 from distutils.util import strtobool
 from distutils.version import LooseVersion
 from six import string_types, text_type
@@ -29,6 +35,7 @@ from ansible.module_utils.basic import *  # noqa: F403
 from ansible.module_utils.facts import *  # noqa: F403
 from ansible.module_utils.urls import *  # noqa: F403
 from ansible.module_utils.six import iteritems, itervalues
+from ansible.module_utils.six.moves import http_client, queue
 from ansible.module_utils.six.moves.urllib.parse import urlparse, urlunparse
 from ansible.module_utils._text import to_native
 
@@ -41,6 +48,61 @@ try:
 except ImportError:
     pass
 
+# Files whose identity changes whenever packages are installed or removed
+RPMDB_SIGNAL_PATHS = ['/var/lib/rpm/Packages', '/var/lib/rpm/rpmdb.sqlite']
+
+DOCKER_SOCKET = '/var/run/docker.sock'
+
+# Files whose identity changes whenever docker is upgraded or restarted
+DOCKER_SIGNAL_PATHS = ['/usr/bin/docker', '/var/run/docker.pid', DOCKER_SOCKET]
+
+HAVE_RPM = False
+
+try:
+    from rpm import TransactionSet
+    from rpm import error as RpmError
+    HAVE_RPM = True
+except ImportError:
+    pass
+
+# Subtrees of the EC2 style metadata tree consumed by normalize_aws_facts
+# and normalize_openstack_facts. True walks the whole subtree, '*' matches
+# any key at that level.
+AWS_METADATA_KEYS = {
+    'instance-id': True,
+    'local-hostname': True,
+    'local-ipv4': True,
+    'public-hostname': True,
+    'public-ipv4': True,
+    'placement': {'availability-zone': True},
+    'network': {
+        'interfaces': {
+            'macs': {
+                '*': {
+                    'device-number': True,
+                    'local-ipv4s': True,
+                    'public-ipv4s': True,
+                    'subnet-id': True,
+                    'vpc-id': True
+                }
+            }
+        }
+    }
+}
+OPENSTACK_EC2_METADATA_KEYS = {
+    'hostname': True,
+    'instance-id': True,
+    'local-ipv4': True,
+    'public-hostname': True,
+    'public-ipv4': True
+}
+
+# The setup facts read by the module, along with the facts of each network
+# interface. Keep in sync with the oo_openshift_system_facts filter.
+SYSTEM_FACTS = ['ansible_default_ipv4', 'ansible_fqdn', 'ansible_nodename', 'ansible_pkg_mgr',
+                'ansible_product_name', 'ansible_product_version',
+                'ansible_virtualization_role', 'ansible_virtualization_type']
+
 DOCUMENTATION = '''
 ---
 module: openshift_facts
@@ -242,6 +304,7 @@ def query_metadata(metadata_url, headers=None, expect_json=False):
         Returns:
             dict or list: metadata request result
     """
+    profiler.count_http_request()
     result, info = fetch_url(module, metadata_url, headers=headers)  # noqa: F405
     if info['status'] != 200:
         raise OpenShiftFactsMetadataUnavailableError("Metadata unavailable")
@@ -251,39 +314,173 @@ def query_metadata(metadata_url, headers=None, expect_json=False):
         return [to_native(line.strip()) for line in result.readlines()]
 
 
-def walk_metadata(metadata_url, headers=None, expect_json=False):
-    """ Walk the metadata tree and return a dictionary of the entire tree
+class MetadataWalker(object):
+    """ Concurrent walker for EC2 style metadata trees
+
+        Sibling keys are fetched in parallel by a small pool of worker
+        threads, each of which reuses a single keep-alive connection to the
+        metadata service. Only the keys present in the allowlist are walked
+        and directories deeper than max_depth are skipped.
+
+        Args:
+            metadata_url (str): metadata url of the tree root
+            headers (dict): headers to set for metadata requests
+            allowlist (dict): nested dict of keys to walk, True walks a
+                              whole subtree and '*' matches any key.
+                              None walks the whole tree.
+            workers (int): number of concurrent connections
+            max_depth (int): maximum directory depth to walk
+            timeout (int): per request timeout in seconds
+    """
+    # pylint: disable=too-many-arguments,too-many-instance-attributes
+    def __init__(self, metadata_url, headers=None, allowlist=None,
+                 workers=4, max_depth=8, timeout=5):
+        parsed_url = urlparse(metadata_url)
+        if parsed_url.scheme == 'https':
+            self.connection_class = http_client.HTTPSConnection
+        else:
+            self.connection_class = http_client.HTTPConnection
+        self.netloc = parsed_url.netloc
+        self.root_path = parsed_url.path or '/'
+        self.headers = headers or {}
+        self.allowlist = True if allowlist is None else allowlist
+        self.workers = workers
+        self.max_depth = max_depth
+        self.timeout = timeout
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.errors = []
+
+    def walk(self):
+        """ Walk the metadata tree
+
+            Returns:
+                dict: the result of walking the metadata tree
+            Raises:
+                OpenShiftFactsMetadataUnavailableError:
+        """
+        metadata = dict()
+        self.errors = []
+        self.queue.put((self.root_path, metadata, None, self.allowlist, 0))
+
+        threads = [threading.Thread(target=self.worker) for _ in range(self.workers)]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        self.queue.join()
+        for _ in threads:
+            self.queue.put(None)
+        for thread in threads:
+            thread.join()
+
+        if self.errors:
+            raise OpenShiftFactsMetadataUnavailableError("Metadata unavailable")
+        return metadata
+
+    def worker(self):
+        """ Fetch queued paths over one persistent connection """
+        connection = None
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                break
+            try:
+                if connection is None:
+                    connection = self.connection_class(self.netloc, timeout=self.timeout)
+                lines = self.fetch(connection, item[0])
+                self.handle(item, lines)
+            # pylint: disable=broad-except
+            except Exception as err:
+                with self.lock:
+                    self.errors.append(err)
+                if connection is not None:
+                    connection.close()
+                    connection = None
+            finally:
+                self.queue.task_done()
+        if connection is not None:
+            connection.close()
+
+    def fetch(self, connection, path):
+        """ GET path, retrying once if the kept-alive connection was closed
+
+            Args:
+                connection (HTTPConnection): connection to use
+                path (str): path to fetch
+            Returns:
+                list: the stripped lines of the response body
+            Raises:
+                OpenShiftFactsMetadataUnavailableError:
+        """
+        for attempt in (1, 2):
+            with self.lock:
+                profiler.count_http_request()
+            try:
+                connection.request('GET', path, headers=self.headers)
+                response = connection.getresponse()
+                body = response.read()
+                break
+            except (http_client.HTTPException, socket.error):
+                connection.close()
+                if attempt == 2:
+                    raise
+        if response.status != 200:
+            raise OpenShiftFactsMetadataUnavailableError("Metadata unavailable")
+        return [to_native(line.strip()) for line in body.splitlines()]
+
+    def handle(self, item, lines):
+        """ Store a fetched value or queue the children of a directory
+
+            Args:
+                item (tuple): (path, parent dict, key, allowlist, depth)
+                lines (list): fetched lines
+        """
+        path, parent, key, allowlist, depth = item
+        if not path.endswith('/') or allowlist is None:
+            # leaf value
+            with self.lock:
+                parent[key] = lines[0] if len(lines) == 1 else lines
+            return
+
+        if key is None:
+            directory = parent
+        else:
+            directory = dict()
+            with self.lock:
+                parent[key] = directory
+
+        for line in lines:
+            name = line[:-1] if line.endswith('/') else line
+            if allowlist is True:
+                child_allowlist = True
+            else:
+                child_allowlist = allowlist.get(name, allowlist.get('*'))
+                if child_allowlist is None:
+                    continue
+            # public-keys/ is fetched as a value rather than walked
+            if line.endswith('/') and line != 'public-keys/':
+                if depth < self.max_depth:
+                    self.queue.put((path + line, directory, name, child_allowlist, depth + 1))
+            else:
+                self.queue.put((path + line, directory, line, None, depth + 1))
+
+
+def walk_metadata(metadata_url, headers=None, allowlist=None):
+    """ Walk the metadata tree and return a dictionary of the tree
 
         Args:
             metadata_url (str): metadata url
             headers (dict): headers to set for metadata request
-            expect_json (bool): does the metadata_url return json
+            allowlist (dict): keys to walk, see MetadataWalker
         Returns:
             dict: the result of walking the metadata tree
     """
-    metadata = dict()
-
-    for line in query_metadata(metadata_url, headers, expect_json):
-        if line.endswith('/') and not line == 'public-keys/':
-            key = line[:-1]
-            metadata[key] = walk_metadata(metadata_url + line,
-                                          headers, expect_json)
-        else:
-            results = query_metadata(metadata_url + line, headers,
-                                     expect_json)
-            if len(results) == 1:
-                # disable pylint maybe-no-member because overloaded use of
-                # the module name causes pylint to not detect that results
-                # is an array or hash
-                # pylint: disable=maybe-no-member
-                metadata[line] = results.pop()
-            else:
-                metadata[line] = results
-    return metadata
+    return MetadataWalker(metadata_url, headers, allowlist).walk()
 
 
 def get_provider_metadata(metadata_url, supports_recursive=False,
-                          headers=None, expect_json=False):
+                          headers=None, expect_json=False, allowlist=None):
     """ Retrieve the provider metadata
 
         Args:
@@ -292,6 +489,7 @@ def get_provider_metadata(metadata_url, supports_recursive=False,
                                        recursion
             headers (dict): headers to set for metadata request
             expect_json (bool): does the metadata_url return json
+            allowlist (dict): keys to walk when recursion is not supported
         Returns:
             dict: the provider metadata
     """
@@ -300,8 +498,7 @@ def get_provider_metadata(metadata_url, supports_recursive=False,
             metadata = query_metadata(metadata_url, headers,
                                       expect_json)
         else:
-            metadata = walk_metadata(metadata_url, headers,
-                                     expect_json)
+            metadata = walk_metadata(metadata_url, headers, allowlist)
     except OpenShiftFactsMetadataUnavailableError:
         metadata = None
     return metadata
@@ -748,9 +945,7 @@ def set_etcd_facts_if_unset(facts):
                 # Parse master config to find actual etcd data dir:
                 master_cfg_path = os.path.join(facts['common']['config_base'],
                                                'master/master-config.yaml')
-                master_cfg_f = open(master_cfg_path, 'r')
-                config = yaml.safe_load(master_cfg_f.read())
-                master_cfg_f.close()
+                config = host_probes.probe('master_config', master_cfg_path, read_master_config)
 
                 etcd_facts['etcd_data_dir'] = \
                     config['etcdConfig']['storageDirectory']
@@ -767,7 +962,7 @@ def set_etcd_facts_if_unset(facts):
         # Read ETCD_DATA_DIR from /etc/etcd/etcd.conf:
         try:
             # Add a fake section for parsing:
-            ini_str = text_type('[root]\n' + open('/etc/etcd/etcd.conf', 'r').read(), 'utf-8')
+            ini_str = text_type('[root]\n' + host_probes.read_file('/etc/etcd/etcd.conf'), 'utf-8')
             ini_fp = io.StringIO(ini_str)
             config = configparser.RawConfigParser()
             config.readfp(ini_fp)
@@ -814,7 +1009,7 @@ def set_deployment_facts_if_unset(facts):
             if deployment_type in ['enterprise']:
                 config_base = '/etc/openshift'
             # Handle upgrade scenarios when symlinks don't yet exist:
-            if not os.path.exists(config_base) and os.path.exists('/etc/openshift'):
+            if not host_probes.path_exists(config_base) and host_probes.path_exists('/etc/openshift'):
                 config_base = '/etc/openshift'
             facts['common']['config_base'] = config_base
         if 'data_dir' not in facts['common']:
@@ -822,7 +1017,7 @@ def set_deployment_facts_if_unset(facts):
             if deployment_type in ['enterprise']:
                 data_dir = '/var/lib/openshift'
             # Handle upgrade scenarios when symlinks don't yet exist:
-            if not os.path.exists(data_dir) and os.path.exists('/var/lib/openshift'):
+            if not host_probes.path_exists(data_dir) and host_probes.path_exists('/var/lib/openshift'):
                 data_dir = '/var/lib/openshift'
             facts['common']['data_dir'] = data_dir
 
@@ -994,10 +1189,8 @@ def set_sdn_facts_if_unset(facts, system_facts):
 
         master_cfg_path = os.path.join(facts['common']['config_base'],
                                        'master/master-config.yaml')
-        if os.path.isfile(master_cfg_path):
-            with open(master_cfg_path, 'r') as master_cfg_f:
-                config = yaml.safe_load(master_cfg_f.read())
-
+        config = host_probes.probe('master_config', master_cfg_path, read_master_config)
+        if config is not None:
             if 'networkConfig' in config:
                 if 'clusterNetworkCIDR' in config['networkConfig']:
                     sdn_cluster_network_cidr = \
@@ -1080,6 +1273,76 @@ def format_url(use_ssl, hostname, port, path=''):
     return url
 
 
+# The kubeconfig credentials `oc config view` redacts by default
+KUBECONFIG_CLUSTER_SECRETS = ['certificate-authority-data']
+KUBECONFIG_USER_SECRETS = ['client-certificate-data', 'client-key-data', 'token', 'password']
+
+
+def load_kubeconfig(kubeconfig_path):
+    """ Load a kubeconfig file with its certificate authority data and
+        user credentials masked
+
+        Args:
+            kubeconfig_path (str): path to the kubeconfig
+        Returns:
+            dict: the masked kubeconfig
+    """
+    with open(kubeconfig_path, 'r') as kubeconfig_file:
+        config = yaml.safe_load(kubeconfig_file)
+
+    for entries, entry_key, secrets in [('clusters', 'cluster', KUBECONFIG_CLUSTER_SECRETS),
+                                        ('users', 'user', KUBECONFIG_USER_SECRETS)]:
+        for entry in config.get(entries) or []:
+            settings = entry.get(entry_key) or {}
+            for key in secrets:
+                if key in settings:
+                    settings[key] = 'masked'
+    return config
+
+
+def read_kubeconfig(kubeconfig_path):
+    """ Load a kubeconfig file with load_kubeconfig
+
+        Args:
+            kubeconfig_path (str): path to the kubeconfig
+        Returns:
+            dict: the masked kubeconfig or None if it can't be read
+    """
+    if not os.path.isfile(kubeconfig_path):
+        return None
+    try:
+        return load_kubeconfig(kubeconfig_path)
+
+    # override pylint broad-except warning, since we do not want
+    # to bubble up any exceptions if the kubeconfig can't be read
+    # pylint: disable=broad-except
+    except Exception:
+        return None
+
+
+def read_master_config(master_cfg_path):
+    """ Load the sections of a master config read by the fact stages
+
+        Only networkConfig and etcdConfig are kept, the rest of the config
+        may hold secrets which should not end up in recorded probes.
+
+        Args:
+            master_cfg_path (str): path to master-config.yaml
+        Returns:
+            dict: the networkConfig and etcdConfig sections or None if the
+                  config doesn't exist
+    """
+    if not os.path.isfile(master_cfg_path):
+        return None
+    try:
+        with open(master_cfg_path, 'r') as master_cfg_f:
+            config = yaml.safe_load(master_cfg_f.read()) or {}
+    except (IOError, yaml.YAMLError):
+        return {}
+    return dict((section, config[section]) for section in ('networkConfig', 'etcdConfig')
+                if section in config)
+
+
 def get_current_config(facts):
     """ Get current openshift config
 
@@ -1109,40 +1372,25 @@ def get_current_config(facts):
             )
 
         kubeconfig_path = os.path.join(kubeconfig_dir, '.kubeconfig')
-        if os.path.isfile('/usr/bin/openshift') and os.path.isfile(kubeconfig_path):
-            try:
-                _, output, _ = module.run_command(  # noqa: F405
-                    ["/usr/bin/openshift", "ex", "config", "view", "-o",
-                     "json", "--kubeconfig=%s" % kubeconfig_path],
-                    check_rc=False
-                )
-                config = json.loads(output)
-
-                cad = 'certificate-authority-data'
-                try:
-                    for cluster in config['clusters']:
-                        config['clusters'][cluster][cad] = 'masked'
-                except KeyError:
-                    pass
-                try:
-                    for user in config['users']:
-                        config['users'][user][cad] = 'masked'
-                        config['users'][user]['client-key-data'] = 'masked'
-                except KeyError:
-                    pass
-
-                current_config['kubeconfig'] = config
-
-            # override pylint broad-except warning, since we do not want
-            # to bubble up any exceptions if oc config view
-            # fails
-            # pylint: disable=broad-except
-            except Exception:
-                pass
+        kubeconfig = host_probes.probe('kubeconfig', kubeconfig_path, read_kubeconfig)
+        if kubeconfig is not None:
+            current_config['kubeconfig'] = kubeconfig
 
     return current_config
 
 
+def set_current_config_facts(facts):
+    """ Set the current_config fact
+
+        Args:
+            facts (dict): existing facts
+        Returns:
+            dict: the facts dict updated with the current openshift config
+    """
+    facts['current_config'] = get_current_config(facts)
+    return facts
+
+
 def build_kubelet_args(facts):
     """Build node kubelet_args
 
@@ -1243,26 +1491,131 @@ def build_api_server_args(facts):
     return facts
 
 
+def systemd_unit_name(unit):
+    """ Return the full unit name, defaulting to a .service unit
+
+        Args:
+            unit (str): unit name with or without a unit type suffix
+        Returns:
+            str: the unit name
+    """
+    return unit if '.' in unit else unit + '.service'
+
+
+class SystemdUnits(object):
+    """ systemd unit queries over a single system bus connection
+
+        The system bus connection and the systemd manager proxy are opened
+        on first use and shared by every later query of the module run.
+    """
+    def __init__(self):
+        self.manager = None
+
+    def get_manager(self):
+        """ Return the (shared) systemd manager interface
+
+            Raises:
+                DBusException:
+        """
+        if self.manager is None:
+            bus = SystemBus()
+            systemd = bus.get_object('org.freedesktop.systemd1', '/org/freedesktop/systemd1')
+            self.manager = Interface(systemd, dbus_interface='org.freedesktop.systemd1.Manager')
+        return self.manager
+
+    def unit_states(self, units):
+        """ Fetch the LoadState and ActiveState of several units in one call
+
+            Args:
+                units (list): unit names, names without a unit type suffix
+                              refer to .service units
+            Returns:
+                dict: load_state and active_state by unit
+            Raises:
+                DBusException:
+        """
+        names = dict((systemd_unit_name(unit), unit) for unit in units)
+        states = dict((unit, dict(load_state='not-found', active_state='inactive'))
+                      for unit in units)
+
+        manager = self.get_manager()
+        try:
+            listed_units = manager.ListUnitsByNames(list(names))
+        except DBusException:
+            # ListUnitsByNames is not available before systemd 227. Units
+            # which are not loaded are missing from ListUnits, as they
+            # would be from GetUnit.
+            listed_units = manager.ListUnits()
+
+        for listed_unit in listed_units:
+            name = str(listed_unit[0])
+            if name in names:
+                states[names[name]] = dict(load_state=str(listed_unit[2]),
+                                           active_state=str(listed_unit[3]))
+        return states
+
+
+# Opens its system bus connection on first use
+systemd_units = SystemdUnits()  # pylint: disable=invalid-name
+
+
 def is_service_running(service):
     """ Queries systemd through dbus to see if the service is running """
-    service_running = False
     try:
-        bus = SystemBus()
-        systemd = bus.get_object('org.freedesktop.systemd1', '/org/freedesktop/systemd1')
-        manager = Interface(systemd, dbus_interface='org.freedesktop.systemd1.Manager')
-        service_unit = service if service.endswith('.service') else manager.GetUnit('{0}.service'.format(service))
-        service_proxy = bus.get_object('org.freedesktop.systemd1', str(service_unit))
-        service_properties = Interface(service_proxy, dbus_interface='org.freedesktop.DBus.Properties')
-        service_load_state = service_properties.Get('org.freedesktop.systemd1.Unit', 'LoadState')
-        service_active_state = service_properties.Get('org.freedesktop.systemd1.Unit', 'ActiveState')
-        if service_load_state == 'loaded' and service_active_state == 'active':
-            service_running = True
+        state = systemd_units.unit_states([service])[service]
     except DBusException:
-        # TODO: do not swallow exception, as it may be hiding useful debugging
-        # information.
-        pass
+        return False
+    return state['load_state'] == 'loaded' and state['active_state'] == 'active'
+
+
+def set_service_facts(facts):
+    """ Set the state of the docker, etcd, openvswitch and openshift services
+
+        Args:
+            facts (dict): existing facts
+        Returns:
+            dict: the facts dict updated with common.services, the
+                  load_state, active_state and running status by service
+    """
+    if 'common' in facts:
+        states = host_probes.probe_many('unit_state',
+                                        get_services(facts['common']['service_type']),
+                                        query_unit_states)
+        services = dict()
+        for service, state in iteritems(states):
+            services[service] = dict(state, running=(state['load_state'] == 'loaded' and
+                                                     state['active_state'] == 'active'))
+        facts['common']['services'] = services
+    return facts
+
 
-    return service_running
+def get_services(service_type):
+    """ Return the services reported in common.services
+
+        Args:
+            service_type (str): openshift service type ex: 'origin'
+        Returns:
+            list: service names
+    """
+    return ['docker', 'etcd', 'openvswitch'] + \
+        ['{0}-{1}'.format(service_type, service)
+         for service in ('master', 'master-api', 'master-controllers', 'node')]
+
+
+def query_unit_states(units):
+    """ Query the state of systemd units, reporting an unknown state with
+        the error if systemd can't be reached
+
+        Args:
+            units (list): unit names
+        Returns:
+            dict: load_state and active_state by unit
+    """
+    try:
+        return systemd_units.unit_states(units)
+    except DBusException as ex:
+        return dict((unit, dict(load_state='unknown', active_state='unknown', error=str(ex)))
+                    for unit in units)
 
 
 def rpm_rebuilddb():
@@ -1287,8 +1640,71 @@ def get_version_output(binary, version_cmd):
 
 
 def get_docker_version_info():
-    """ Parses and returns the docker version info """
-    result = None
+    """ Parses and returns the docker version info
+
+        The result is cached until the docker binary is replaced or the
+        daemon is restarted (new pid file and socket).
+    """
+    signature = [file_signature(path) for path in DOCKER_SIGNAL_PATHS]
+    return probe_cache.get('docker_version_info', signature, probe_docker_version_info)
+
+
+class DockerSocketConnection(http_client.HTTPConnection):
+    """ HTTPConnection over a unix domain socket
+
+        Args:
+            socket_path (str): path to the unix socket
+            timeout (int): socket timeout in seconds
+    """
+    def __init__(self, socket_path, timeout=2):
+        http_client.HTTPConnection.__init__(self, 'localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        """ Connect to the unix socket """
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+def get_docker_api_version_info(socket_path=DOCKER_SOCKET, timeout=2):
+    """ Queries the docker Engine API /version endpoint over the docker
+        socket
+
+        Args:
+            socket_path (str): path to the docker socket
+            timeout (int): socket timeout in seconds
+        Returns:
+            dict: api_version and version of the daemon, or None if the
+                  daemon could not be queried
+    """
+    connection = DockerSocketConnection(socket_path, timeout)
+    try:
+        profiler.count_http_request()
+        connection.request('GET', '/version')
+        response = connection.getresponse()
+        if response.status != 200:
+            return None
+        version_info = json.loads(to_native(response.read()))
+        return {
+            'api_version': version_info['ApiVersion'],
+            'version': version_info['Version']
+        }
+    except (socket.error, http_client.HTTPException, ValueError, KeyError, TypeError):
+        return None
+    finally:
+        connection.close()
+
+
+def probe_docker_version_info():
+    """ Queries the running docker daemon for its version info, through
+        the docker socket if possible and the docker cli otherwise
+    """
+    result = get_docker_api_version_info()
+    if result is not None:
+        return result
+
     if is_service_running('docker'):
         version_info = yaml.safe_load(get_version_output('/usr/bin/docker', 'version'))
         if 'Server' in version_info:
@@ -1332,29 +1748,43 @@ def get_openshift_version(facts):
     """
     version = None
 
-    # No need to run this method repeatedly on a system if we already know the
-    # version
-    # TODO: We need a way to force reload this after upgrading bits.
-    if 'common' in facts:
-        if 'version' in facts['common'] and facts['common']['version'] is not None:
-            return chomp_commit_offset(facts['common']['version'])
-
-    if os.path.isfile('/usr/bin/openshift'):
-        _, output, _ = module.run_command(['/usr/bin/openshift', 'version'])  # noqa: F405
-        version = parse_openshift_version(output)
+    # Querying the binary is cached until the binary itself changes, so
+    # upgrading the bits is picked up by the next run.
+    if host_probes.is_file('/usr/bin/openshift'):
+        version = host_probes.probe('openshift_version', '/usr/bin/openshift', get_binary_openshift_version)
     elif 'common' in facts and 'is_containerized' in facts['common']:
         version = get_container_openshift_version(facts)
 
     # Handle containerized masters that have not yet been configured as a node.
-    # This can be very slow and may get re-run multiple times, so we only use this
-    # if other methods failed to find a version.
-    if not version and os.path.isfile('/usr/local/bin/openshift'):
-        _, output, _ = module.run_command(['/usr/local/bin/openshift', 'version'])  # noqa: F405
-        version = parse_openshift_version(output)
+    # This can be very slow, so we only use this if other methods failed to
+    # find a version.
+    if not version and host_probes.is_file('/usr/local/bin/openshift'):
+        version = host_probes.probe('openshift_version', '/usr/local/bin/openshift', get_binary_openshift_version)
+
+    # Fall back to a version we were given if nothing is installed yet.
+    if not version and 'common' in facts:
+        version = facts['common'].get('version')
 
     return chomp_commit_offset(version)
 
 
+def get_binary_openshift_version(binary):
+    """ Get the version reported by `binary version`, cached on the
+        identity of the binary.
+
+        Args:
+            binary (str): path to an openshift binary
+        Returns:
+            str: the version number
+    """
+    def probe():
+        """ Run the binary to query its version """
+        _, output, _ = module.run_command([binary, 'version'])  # noqa: F405
+        return parse_openshift_version(output)
+
+    return probe_cache.get('openshift_version:' + binary, [file_signature(binary)], probe)
+
+
 def chomp_commit_offset(version):
     """Chomp any "+git.foo" commit offset string from the given `version`
     and return the modified version string.
@@ -1382,17 +1812,17 @@ def get_container_openshift_version(facts):
     """
     for filename in ['/etc/sysconfig/%s-master', '/etc/sysconfig/%s-node']:
         env_path = filename % facts['common']['service_type']
-        if not os.path.exists(env_path):
+        env_file = host_probes.read_file(env_path)
+        if env_file is None:
             continue
 
-        with open(env_path) as env_file:
-            for line in env_file:
-                if line.startswith("IMAGE_VERSION="):
-                    tag = line[len("IMAGE_VERSION="):].strip()
-                    # Remove leading "v" and any trailing release info, we just want
-                    # a version number here:
-                    version = tag[1:].split("-")[0]
-                    return version
+        for line in env_file.splitlines():
+            if line.startswith("IMAGE_VERSION="):
+                tag = line[len("IMAGE_VERSION="):].strip()
+                # Remove leading "v" and any trailing release info, we just want
+                # a version number here:
+                version = tag[1:].split("-")[0]
+                return version
     return None
 
 
@@ -1440,9 +1870,74 @@ def apply_provider_facts(facts, provider_facts):
     return facts
 
 
-# Disabling pylint too many branches. This function needs refactored
-# but is a very core part of openshift_facts.
-# pylint: disable=too-many-branches, too-many-nested-blocks
+# Facts whose lists are combined rather than replaced when merged
+ADDITIVE_FACTS = frozenset(['named_certificates'])
+
+# Facts which may only change in controlled ways when merged
+PROTECTED_FACTS = frozenset(['ha', 'master_count'])
+
+# Facts we do not ever want to merge. These originate in inventory variables
+# and contain JSON dicts. We don't ever want to trigger a merge
+# here, just completely overwrite with the new if they are present there.
+INVENTORY_JSON_FACTS = frozenset(['admission_plugin_config',
+                                  'kube_admission_plugin_config',
+                                  'image_policy_config'])
+
+
+class FactOverwritePaths(object):
+    """ Additive or protected facts to overwrite, compiled into a prefix tree
+
+        When merging descends into `key`, only the paths starting with
+        `key.` stay relevant, and at every level the facts named by the last
+        component of the relevant paths are overwritten. Each node holds
+        those names and builds the node of a child key on first use, so the
+        path lists are scanned once instead of on every merge.
+
+        Attributes:
+            paths (tuple): the relevant paths at this level
+            names (frozenset): fact names to overwrite at this level
+    """
+    _compiled = dict()
+
+    def __init__(self, paths):
+        self.paths = tuple(paths)
+        self.names = frozenset(path.split('.')[-1] for path in self.paths)
+        self.children = dict()
+
+    @classmethod
+    def compile(cls, paths):
+        """ Return the (shared) prefix tree for a list of paths
+
+            Args:
+                paths (list): facts to overwrite in jinja '.' notation
+            Returns:
+                FactOverwritePaths: the root of the prefix tree
+        """
+        paths = tuple(paths or ())
+        node = cls._compiled.get(paths)
+        if node is None:
+            node = cls._compiled[paths] = cls(paths)
+        return node
+
+    def child(self, key):
+        """ Return the node for the facts nested below key
+
+            Args:
+                key (str): fact name
+            Returns:
+                FactOverwritePaths: the node for key
+        """
+        if not self.paths:
+            return self
+        node = self.children.get(key)
+        if node is None:
+            prefix = key + '.'
+            node = self.children[key] = FactOverwritePaths(
+                [path for path in self.paths if path.startswith(prefix)]
+            )
+        return node
+
+
 def merge_facts(orig, new, additive_facts_to_overwrite, protected_facts_to_overwrite):
     """ Recursively merge facts dicts
 
@@ -1457,142 +1952,257 @@ def merge_facts(orig, new, additive_facts_to_overwrite, protected_facts_to_overw
         Returns:
             dict: the merged facts
     """
-    additive_facts = ['named_certificates']
-    protected_facts = ['ha', 'master_count']
+    return merge_fact_trees(orig, new,
+                            FactOverwritePaths.compile(additive_facts_to_overwrite),
+                            FactOverwritePaths.compile(protected_facts_to_overwrite))
 
-    # Facts we do not ever want to merge. These originate in inventory variables
-    # and contain JSON dicts. We don't ever want to trigger a merge
-    # here, just completely overwrite with the new if they are present there.
-    inventory_json_facts = ['admission_plugin_config',
-                            'kube_admission_plugin_config',
-                            'image_policy_config']
 
+# Disabling pylint too many branches. This function needs refactored
+# but is a very core part of openshift_facts.
+# pylint: disable=too-many-branches
+def merge_fact_trees(orig, new, additive, protected):
+    """ Recursively merge facts dicts
+
+        Only the dicts present in both orig and new are rebuilt, every other
+        value is shared with the result rather than copied, so callers must
+        not modify orig or new in place afterwards if they still need the
+        merged facts to stay unchanged.
+
+        Args:
+            orig (dict): existing facts
+            new (dict): facts to update
+            additive (FactOverwritePaths): additive facts to overwrite
+            protected (FactOverwritePaths): protected facts to overwrite
+
+        Returns:
+            dict: the merged facts
+    """
     facts = dict()
     for key, value in iteritems(orig):
-        # Key exists in both old and new facts.
-        if key in new:
-            if key in inventory_json_facts:
-                # Watchout for JSON facts that sometimes load as strings.
-                # (can happen if the JSON contains a boolean)
-                if isinstance(new[key], string_types):
-                    facts[key] = yaml.safe_load(new[key])
-                else:
-                    facts[key] = copy.deepcopy(new[key])
-            # Continue to recurse if old and new fact is a dictionary.
-            elif isinstance(value, dict) and isinstance(new[key], dict):
-                # Collect the subset of additive facts to overwrite if
-                # key matches. These will be passed to the subsequent
-                # merge_facts call.
-                relevant_additive_facts = []
-                for item in additive_facts_to_overwrite:
-                    if '.' in item and item.startswith(key + '.'):
-                        relevant_additive_facts.append(item)
-
-                # Collect the subset of protected facts to overwrite
-                # if key matches. These will be passed to the
-                # subsequent merge_facts call.
-                relevant_protected_facts = []
-                for item in protected_facts_to_overwrite:
-                    if '.' in item and item.startswith(key + '.'):
-                        relevant_protected_facts.append(item)
-                facts[key] = merge_facts(value, new[key], relevant_additive_facts, relevant_protected_facts)
-            # Key matches an additive fact and we are not overwriting
-            # it so we will append the new value to the existing value.
-            elif key in additive_facts and key not in [x.split('.')[-1] for x in additive_facts_to_overwrite]:
-                if isinstance(value, list) and isinstance(new[key], list):
-                    new_fact = []
-                    for item in copy.deepcopy(value) + copy.deepcopy(new[key]):
-                        if item not in new_fact:
-                            new_fact.append(item)
-                    facts[key] = new_fact
-            # Key matches a protected fact and we are not overwriting
-            # it so we will determine if it is okay to change this
-            # fact.
-            elif key in protected_facts and key not in [x.split('.')[-1] for x in protected_facts_to_overwrite]:
-                # The master count (int) can only increase unless it
-                # has been passed as a protected fact to overwrite.
-                if key == 'master_count' and new[key] is not None and new[key] is not '':
-                    if int(value) <= int(new[key]):
-                        facts[key] = copy.deepcopy(new[key])
-                    else:
-                        # pylint: disable=line-too-long
-                        module.fail_json(msg='openshift_facts received a lower value for openshift.master.master_count')  # noqa: F405
-                # ha (bool) can not change unless it has been passed
-                # as a protected fact to overwrite.
-                if key == 'ha':
-                    if safe_get_bool(value) != safe_get_bool(new[key]):
-                        # pylint: disable=line-too-long
-                        module.fail_json(msg='openshift_facts received a different value for openshift.master.ha')  # noqa: F405
-                    else:
-                        facts[key] = value
-            # No other condition has been met. Overwrite the old fact
-            # with the new value.
-            else:
-                facts[key] = copy.deepcopy(new[key])
         # Key isn't in new so add it to facts to keep it.
+        if key not in new:
+            facts[key] = value
+            continue
+
+        new_value = new[key]
+        if key in INVENTORY_JSON_FACTS:
+            # Watchout for JSON facts that sometimes load as strings.
+            # (can happen if the JSON contains a boolean)
+            if isinstance(new_value, string_types):
+                facts[key] = yaml.safe_load(new_value)
+            else:
+                facts[key] = new_value
+        # Continue to recurse if old and new fact is a dictionary.
+        elif isinstance(value, dict) and isinstance(new_value, dict):
+            facts[key] = merge_fact_trees(value, new_value,
+                                          additive.child(key),
+                                          protected.child(key))
+        # Key matches an additive fact and we are not overwriting
+        # it so we will append the new value to the existing value.
+        elif key in ADDITIVE_FACTS and key not in additive.names:
+            if isinstance(value, list) and isinstance(new_value, list):
+                new_fact = []
+                for item in value + new_value:
+                    if item not in new_fact:
+                        new_fact.append(item)
+                facts[key] = new_fact
+        # Key matches a protected fact and we are not overwriting
+        # it so we will determine if it is okay to change this
+        # fact.
+        elif key in PROTECTED_FACTS and key not in protected.names:
+            # The master count (int) can only increase unless it
+            # has been passed as a protected fact to overwrite.
+            if key == 'master_count' and new_value is not None and new_value != '':
+                if int(value) <= int(new_value):
+                    facts[key] = new_value
+                else:
+                    # pylint: disable=line-too-long
+                    module.fail_json(msg='openshift_facts received a lower value for openshift.master.master_count')  # noqa: F405
+            # ha (bool) can not change unless it has been passed
+            # as a protected fact to overwrite.
+            if key == 'ha':
+                if safe_get_bool(value) != safe_get_bool(new_value):
+                    # pylint: disable=line-too-long
+                    module.fail_json(msg='openshift_facts received a different value for openshift.master.ha')  # noqa: F405
+                else:
+                    facts[key] = value
+        # No other condition has been met. Overwrite the old fact
+        # with the new value.
         else:
-            facts[key] = copy.deepcopy(value)
-    new_keys = set(new.keys()) - set(orig.keys())
-    for key in new_keys:
+            facts[key] = new_value
+
+    for key, new_value in iteritems(new):
+        if key in orig:
+            continue
         # Watchout for JSON facts that sometimes load as strings.
         # (can happen if the JSON contains a boolean)
-        if key in inventory_json_facts and isinstance(new[key], string_types):
-            facts[key] = yaml.safe_load(new[key])
+        if key in INVENTORY_JSON_FACTS and isinstance(new_value, string_types):
+            facts[key] = yaml.safe_load(new_value)
         else:
-            facts[key] = copy.deepcopy(new[key])
+            facts[key] = new_value
     return facts
 
 
-def save_local_facts(filename, facts):
-    """ Save local facts
+class LocalFactStore(object):
+    """ The local facts file
+
+        Local facts are stored as JSON. The file is only rewritten,
+        atomically, when the facts differ from the ones it holds. Legacy
+        INI style files are migrated to JSON on the next save.
+
+        A header holding the schema version, the hash of the facts and a
+        generation counter, incremented whenever the facts change, is kept
+        next to it in `<filename>.header`, outside of the ansible_local
+        namespace, so readers can tell whether the local facts changed
+        without parsing them. The probe cache doesn't need it: none of
+        the probes depends on local facts.
 
         Args:
             filename (str): local facts file
-            facts (dict): facts to set
+
+        Attributes:
+            filename (str): local facts file
+            header_filename (str): header file
+            header (dict): the header, None if there is none
+            facts_hash (str): hash of the facts in the file, None if it
+                              has none
+            migrate (bool): the file needs to be converted to JSON
     """
-    try:
-        fact_dir = os.path.dirname(filename)
+    schema_version = 1
+    # written in the facts file by earlier versions, removed on save
+    legacy_header_key = '_header'
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.header_filename = filename + '.header'
+        self.header = None
+        self.facts_hash = None
+        self.migrate = False
+
+    @staticmethod
+    def hash_facts(facts):
+        """ Return the hash of facts """
+        return hashlib.sha256(json.dumps(facts, sort_keys=True).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def read_header(filename):
+        """ Read the header of a local facts file without parsing the facts
+
+            Args:
+                filename (str): local facts file
+            Returns:
+                dict: the header or None if the file has none
+        """
         try:
-            os.makedirs(fact_dir)  # try to make the directory
-        except OSError as exception:
-            if exception.errno != errno.EEXIST:  # but it is okay if it is already there
-                raise  # pass any other exceptions up the chain
-        with open(filename, 'w') as fact_file:
-            fact_file.write(module.jsonify(facts))  # noqa: F405
-        os.chmod(filename, 0o600)
-    except (IOError, OSError) as ex:
-        raise OpenShiftFactsFileWriteError(
-            "Could not create fact file: %s, error: %s" % (filename, ex)
-        )
+            with open(filename + '.header', 'r') as header_file:
+                header = json.load(header_file)
+        except (IOError, OSError, ValueError):
+            return None
+        return header if isinstance(header, dict) else None
 
+    def load(self):
+        """ Read the local facts
 
-def get_local_facts_from_file(filename):
-    """ Retrieve local facts from fact file
+            Returns:
+                dict: the local facts, empty if the file doesn't exist or
+                      can't be parsed
+        """
+        self.header = self.read_header(self.filename)
+        self.facts_hash = None
+        self.migrate = False
+        try:
+            with open(self.filename, 'r') as fact_file:
+                content = fact_file.read()
+        except (IOError, OSError):
+            return dict()
+
+        if content.lstrip().startswith('{'):
+            try:
+                local_facts = json.loads(content)
+            except ValueError:
+                return dict()
+            if not isinstance(local_facts, dict):
+                return dict()
+            if self.legacy_header_key in local_facts:
+                del local_facts[self.legacy_header_key]
+                self.migrate = True
+            self.facts_hash = self.hash_facts(local_facts)
+            return local_facts
 
-        Args:
-            filename (str): local facts file
-        Returns:
-            dict: the retrieved facts
-    """
-    local_facts = dict()
-    try:
         # Handle conversion of INI style facts file to json style
-        ini_facts = configparser.SafeConfigParser()
-        ini_facts.read(filename)
-        for section in ini_facts.sections():
-            local_facts[section] = dict()
-            for key, value in ini_facts.items(section):
-                local_facts[section][key] = value
-
-    except (configparser.MissingSectionHeaderError,
-            configparser.ParsingError):
+        local_facts = dict()
         try:
-            with open(filename, 'r') as facts_file:
-                local_facts = json.load(facts_file)
-        except (ValueError, IOError):
-            pass
+            ini_facts = configparser.SafeConfigParser()
+            ini_facts.readfp(io.StringIO(text_type(content)))
+            for section in ini_facts.sections():
+                local_facts[section] = dict()
+                for key, value in ini_facts.items(section):
+                    local_facts[section][key] = value
+        except (configparser.MissingSectionHeaderError,
+                configparser.ParsingError):
+            return dict()
+        self.migrate = bool(local_facts)
+        return local_facts
+
+    def write(self, filename, content):
+        """ Atomically replace filename with content
+
+            Raises:
+                OpenShiftFactsFileWriteError:
+        """
+        tmp_filename = None
+        try:
+            fact_dir = os.path.dirname(filename)
+            try:
+                os.makedirs(fact_dir)  # try to make the directory
+            except OSError as exception:
+                if exception.errno != errno.EEXIST:  # but it is okay if it is already there
+                    raise  # pass any other exceptions up the chain
+            tmp_fd, tmp_filename = tempfile.mkstemp(dir=fact_dir, prefix='.' + os.path.basename(filename) + '.')
+            with os.fdopen(tmp_fd, 'w') as fact_file:
+                fact_file.write(content)
+                fact_file.flush()
+                os.fsync(fact_file.fileno())
+            # local facts have always been readable by root only
+            os.chmod(tmp_filename, 0o600)
+            os.rename(tmp_filename, filename)
+        except (IOError, OSError) as ex:
+            if tmp_filename is not None and os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
+            raise OpenShiftFactsFileWriteError(
+                "Could not create fact file: %s, error: %s" % (filename, ex)
+            )
 
-    return local_facts
+    def save(self, facts):
+        """ Write the local facts unless the file already holds them, and
+            bring the header up to date
+
+            Args:
+                facts (dict): facts to set
+            Returns:
+                bool: True if the facts file was written
+            Raises:
+                OpenShiftFactsFileWriteError:
+        """
+        facts_hash = self.hash_facts(facts)
+        written = False
+        if self.migrate or self.facts_hash != facts_hash:
+            self.write(self.filename, json.dumps(facts, sort_keys=True) + '\n')
+            self.facts_hash = facts_hash
+            self.migrate = False
+            written = True
+
+        # The header also catches up with facts edited by hand. Only a
+        # change of the facts bumps the generation.
+        header = self.header or dict(generation=0)
+        if header.get('schema') != self.schema_version or header.get('hash') != facts_hash:
+            generation = header.get('generation', 0)
+            if header.get('hash') != facts_hash:
+                generation += 1
+            header = dict(schema=self.schema_version, hash=facts_hash, generation=generation)
+            self.write(self.header_filename, json.dumps(header, sort_keys=True) + '\n')
+            self.header = header
+        return written
 
 
 def sort_unique(alist):
@@ -1724,7 +2334,7 @@ def set_container_facts_if_unset(facts):
         registry_image = 'openshift/origin-docker-registry'
         deployer_image = 'openshift/origin-deployer'
 
-    facts['common']['is_atomic'] = os.path.isfile('/run/ostree-booted')
+    facts['common']['is_atomic'] = host_probes.is_file('/run/ostree-booted')
     if 'is_containerized' not in facts['common']:
         facts['common']['is_containerized'] = facts['common']['is_atomic']
     if 'cli_image' not in facts['common']:
@@ -1754,6 +2364,59 @@ def set_container_facts_if_unset(facts):
     return facts
 
 
+def get_installed_rpms(rpms):
+    """ Determine which of the given rpms are installed with a single
+        rpm database query. The result is cached until the rpm database
+        changes.
+
+        Args:
+            rpms (list): package names
+        Returns:
+            list: the installed packages, in the order they were given
+    """
+    signature = [file_signature(path) for path in RPMDB_SIGNAL_PATHS]
+    installed = probe_cache.get('rpms:' + ','.join(rpms), signature,
+                                lambda: query_installed_rpms(rpms))
+    return [rpm for rpm in rpms if rpm in installed]
+
+
+def query_installed_rpms(rpms):
+    """ Query the rpm database for the installed subset of rpms
+
+        The rpm python bindings are used when available so no process is
+        forked, otherwise all names are passed to a single `rpm -q`.
+
+        Args:
+            rpms (list): package names
+        Returns:
+            list: the installed packages
+    """
+    if HAVE_RPM:
+        try:
+            transaction_set = TransactionSet()
+            return [rpm for rpm in rpms if transaction_set.dbMatch('name', rpm).count() > 0]
+        except RpmError:
+            pass
+
+    # rpm exits non-zero when any package is missing and reports those
+    # packages as "package <name> is not installed", so only lines that are
+    # exactly a queried name denote installed packages.
+    _, output, _ = module.run_command(['rpm', '-q', '--queryformat', '%{NAME}\\n'] + rpms)  # noqa: F405
+    installed = set(line.strip() for line in output.splitlines())
+    return [rpm for rpm in rpms if rpm in installed]
+
+
+def is_rpm_installed(rpm):
+    """ Check whether an rpm is installed
+
+        Args:
+            rpm (str): package name
+        Returns:
+            bool: True if the package is installed
+    """
+    return rpm in get_installed_rpms([rpm])
+
+
 def set_installed_variant_rpm_facts(facts):
     """ Set RPM facts of installed variant
         Args:
@@ -1761,19 +2424,186 @@ def set_installed_variant_rpm_facts(facts):
         Returns:
             dict: the facts dict updated with installed_variant_rpms
                           """
-    installed_rpms = []
+    variant_rpms = get_variant_rpms()
+    installed = host_probes.probe_many('rpm_installed', variant_rpms, query_rpms_installed)
+    facts['common']['installed_variant_rpms'] = [rpm for rpm in variant_rpms if installed[rpm]]
+    return facts
+
+
+def get_variant_rpms():
+    """ Return the rpms of every openshift variant
+
+        Returns:
+            list: package names
+    """
+    variant_rpms = []
     for base_rpm in ['openshift', 'atomic-openshift', 'origin']:
         optional_rpms = ['master', 'node', 'clients', 'sdn-ovs']
-        variant_rpms = [base_rpm] + \
-                       ['{0}-{1}'.format(base_rpm, r) for r in optional_rpms] + \
-                       ['tuned-profiles-%s-node' % base_rpm]
-        for rpm in variant_rpms:
-            exit_code, _, _ = module.run_command(['rpm', '-q', rpm])  # noqa: F405
-            if exit_code == 0:
-                installed_rpms.append(rpm)
-
-    facts['common']['installed_variant_rpms'] = installed_rpms
-    return facts
+        variant_rpms += [base_rpm] + \
+            ['{0}-{1}'.format(base_rpm, r) for r in optional_rpms] + \
+            ['tuned-profiles-%s-node' % base_rpm]
+    return variant_rpms
+
+
+def query_rpms_installed(rpms):
+    """ Check which of the given rpms are installed
+
+        Args:
+            rpms (list): package names
+        Returns:
+            dict: True or False by package name
+    """
+    installed = get_installed_rpms(rpms)
+    return dict((rpm, rpm in installed) for rpm in rpms)
+
+
+class FactStage(object):
+    """ A fact generation stage and the facts it depends on
+
+        Facts are given in jinja '.' notation, a role name covers every fact
+        of that role. Only facts derived by earlier stages need to be listed
+        in reads; defaults, provider and local facts are always available.
+
+        Attributes:
+            func (callable): stage taking and returning the facts dict
+            reads (list): derived facts the stage reads ex: ['master.embedded_etcd']
+            produces (list): facts the stage sets ex: ['etcd.etcd_data_dir']
+            system_facts (bool): also pass the system facts to func
+            when (callable): only run func if when(facts) is true
+    """
+    # pylint: disable=too-many-arguments,too-few-public-methods
+    def __init__(self, func, reads, produces, system_facts=False, when=None):
+        self.func = func
+        self.reads = reads
+        self.produces = produces
+        self.system_facts = system_facts
+        self.when = when
+
+
+def facts_overlap(fact, other):
+    """ Check whether two facts in '.' notation refer to the same facts,
+        either because they are equal or one is nested in the other.
+    """
+    return fact == other or fact.startswith(other + '.') or other.startswith(fact + '.')
+
+
+def plan_fact_stages(stages, targets):
+    """ Select the stages needed to produce the target facts
+
+        Walks the stages backwards, keeping every stage that produces a
+        needed fact and adding the facts it reads to the needed facts.
+
+        Args:
+            stages (list): FactStage objects in execution order
+            targets (list): facts to produce ex: ['common', 'etcd']
+        Returns:
+            list: the needed stages in execution order
+    """
+    needed = list(targets)
+    planned = []
+    for stage in reversed(stages):
+        if any(facts_overlap(fact, need) for fact in stage.produces for need in needed):
+            planned.append(stage)
+            needed.extend(stage.reads)
+    planned.reverse()
+    return planned
+
+
+MASTER_URL_FACTS = ['master.' + fact for fact in (
+    'etcd_port', 'embedded_etcd', 'etcd_urls', 'api_url', 'public_api_url',
+    'loopback_api_url', 'loopback_cluster_name', 'loopback_context_name',
+    'loopback_user', 'console_url', 'public_console_url')]
+
+FACT_STAGES = [
+    FactStage(migrate_oauth_template_facts,
+              reads=[],
+              produces=['master.oauth_templates']),
+    FactStage(set_current_config_facts,
+              reads=['common'],
+              produces=['current_config']),
+    FactStage(set_url_facts_if_unset,
+              reads=['common'] + MASTER_URL_FACTS,
+              produces=MASTER_URL_FACTS),
+    FactStage(set_project_cfg_facts_if_unset,
+              reads=[],
+              produces=['master.' + fact for fact in (
+                  'default_node_selector', 'project_request_message',
+                  'project_request_template', 'mcs_allocator_range',
+                  'mcs_labels_per_project', 'uid_allocator_range')]),
+    FactStage(set_flannel_facts_if_unset,
+              reads=['common'],
+              produces=['common.use_flannel']),
+    FactStage(set_nuage_facts_if_unset,
+              reads=['common'],
+              produces=['common.use_nuage']),
+    FactStage(set_node_schedulability,
+              reads=[],
+              produces=['node.schedulable']),
+    FactStage(set_selectors,
+              reads=['common'],
+              produces=['hosted']),
+    FactStage(set_identity_providers_if_unset,
+              reads=['common'],
+              produces=['master.identity_providers']),
+    FactStage(set_deployment_facts_if_unset,
+              reads=['common'],
+              produces=['common.service_type', 'common.config_base', 'common.data_dir',
+                        'docker.additional_registries', 'master.registry_url',
+                        'master.disabled_features', 'node.registry_url',
+                        'node.storage_plugin_deps']),
+    FactStage(set_service_facts,
+              reads=['common'],
+              produces=['common.services']),
+    FactStage(set_sdn_facts_if_unset,
+              reads=['common'],
+              produces=['common.use_openshift_sdn', 'common.sdn_network_plugin_name',
+                        'master.sdn_cluster_network_cidr', 'master.sdn_host_subnet_length',
+                        'node.sdn_mtu'],
+              system_facts=True),
+    FactStage(set_container_facts_if_unset,
+              reads=['common'],
+              produces=['common', 'etcd.etcd_image', 'master.master_image',
+                        'node.node_image', 'node.ovs_image']),
+    FactStage(build_kubelet_args,
+              reads=['common'],
+              produces=['node.kubelet_args']),
+    FactStage(build_controller_args,
+              reads=['common'],
+              produces=['master.controller_args']),
+    FactStage(build_api_server_args,
+              reads=['common'],
+              produces=['master.api_server_args']),
+    FactStage(set_version_facts_if_unset,
+              reads=['common'],
+              produces=['common']),
+    FactStage(set_evacuate_or_drain_option,
+              reads=['common'],
+              produces=['common.evacuate_or_drain']),
+    FactStage(set_dnsmasq_facts_if_unset,
+              reads=['common'],
+              produces=['common.use_dnsmasq', 'master.dns_port']),
+    FactStage(set_manageiq_facts_if_unset,
+              reads=['common'],
+              produces=['common.use_manageiq']),
+    FactStage(set_aggregate_facts,
+              reads=['common'],
+              produces=['common.kube_svc_ip', 'common.all_hostnames',
+                        'common.internal_hostnames']),
+    FactStage(set_etcd_facts_if_unset,
+              reads=['common', 'master.embedded_etcd'],
+              produces=['etcd.etcd_data_dir']),
+    FactStage(set_proxy_facts,
+              reads=['common'],
+              produces=['common.no_proxy', 'builddefaults',
+                        'master.admission_plugin_config']),
+    FactStage(set_installed_variant_rpm_facts,
+              reads=['common'],
+              produces=['common.installed_variant_rpms'],
+              when=lambda facts: not safe_get_bool(facts['common']['is_containerized'])),
+    FactStage(set_nodename,
+              reads=['common'],
+              produces=['node.nodename']),
+]
 
 
 class OpenShiftFactsInternalError(Exception):
@@ -1796,6 +2626,472 @@ class OpenShiftFactsMetadataUnavailableError(Exception):
     pass
 
 
+class OpenShiftFactsProbeNotRecordedError(Exception):
+    """Origin Facts Probe Not Recorded Error"""
+    pass
+
+
+def file_signature(path):
+    """ Return the identity of a file used to detect that it changed
+
+        Args:
+            path (str): file to stat
+        Returns:
+            list: inode, mtime and size of the file or None if the file
+                  does not exist
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_ino, stat.st_mtime, stat.st_size]
+
+
+class ProbeCache(object):
+    """ On-host cache for the results of expensive host probes
+
+        Every entry is stored with the signature (typically a list of
+        file_signature results) that was current when the probe ran. A
+        cached value is only reused while the signature is unchanged, so
+        upgrading a binary, installing an rpm or restarting a daemon
+        invalidates the matching entries without any explicit reload.
+
+        Attributes:
+            filename (str): cache file, None to keep the cache in memory
+            entries (dict): cached probe results by key
+            changed (bool): entries were updated since the cache was loaded
+    """
+    version = 1
+
+    def __init__(self, filename=None):
+        self.filename = filename
+        self.entries = dict()
+        self.changed = False
+        if filename is not None:
+            try:
+                with open(filename, 'r') as cache_file:
+                    cache = json.load(cache_file)
+                if cache.get('version') == self.version:
+                    self.entries = cache['entries']
+            except (IOError, OSError, ValueError, KeyError, AttributeError):
+                pass
+
+    # pylint: disable=too-many-arguments
+    def get(self, key, signature, probe, ttl=None, refresh=False):
+        """ Return the cached result for key, running probe if the cached
+            signature does not match
+
+            Args:
+                key (str): cache key
+                signature (list): current value of the invalidation signals
+                probe (callable): function returning a JSON serializable
+                                  result for key
+                ttl (int): also run probe if the cached result is older
+                           than ttl seconds
+                refresh (bool): run probe regardless of the cached result
+            Returns:
+                the probe result
+        """
+        now = time.time()
+        entry = self.entries.get(key)
+        if entry is not None and not refresh and entry['signature'] == signature:
+            if ttl is None or now - entry.get('time', 0) < ttl:
+                return entry['value']
+
+        value = probe()
+        self.entries[key] = dict(signature=signature, value=value, time=now)
+        self.changed = True
+        return value
+
+    def invalidate(self, key):
+        """ Drop the cached result for key
+
+            Args:
+                key (str): cache key
+        """
+        if self.entries.pop(key, None) is not None:
+            self.changed = True
+
+    def save(self):
+        """ Persist the cache if it changed. Failing to write the cache
+            is not an error, the probes will simply run again next time.
+        """
+        if self.filename is None or not self.changed:
+            return
+        tmp_filename = self.filename + '.tmp'
+        try:
+            with open(tmp_filename, 'w') as cache_file:
+                json.dump(dict(version=self.version, entries=self.entries), cache_file)
+            os.chmod(tmp_filename, 0o600)
+            os.rename(tmp_filename, self.filename)
+            self.changed = False
+        except (IOError, OSError):
+            pass
+
+
+# Replaced in main() by a cache persisted next to the local facts file.
+probe_cache = ProbeCache()  # pylint: disable=invalid-name
+
+
+def read_file_content(path):
+    """ Read a file
+
+        Args:
+            path (str): file to read
+        Returns:
+            str: the file content or None if it can't be read
+    """
+    try:
+        with open(path, 'r') as content_file:
+            return content_file.read()
+    except (IOError, OSError):
+        return None
+
+
+class HostProbes(object):
+    """ Host state read by the fact generation stages
+
+        Every probe result is recorded under its kind and argument, ex:
+        'is_file:/run/ostree-booted'. When created with recorded results the
+        probes are replayed instead, so the fact generation stages can run
+        away from the host they describe.
+
+        Args:
+            recorded (dict): probe results to replay, None to probe the host
+
+        Attributes:
+            results (dict): the recorded probe results
+    """
+    def __init__(self, recorded=None):
+        self.replay = recorded is not None
+        self.results = dict(recorded or {})
+
+    @staticmethod
+    def key(kind, arg):
+        """ Return the key a probe result is recorded under """
+        return '{0}:{1}'.format(kind, arg)
+
+    def probe(self, kind, arg, func):
+        """ Return func(arg), recording the result
+
+            Args:
+                kind (str): kind of probe ex: 'openshift_version'
+                arg (str): probe argument
+                func (callable): probe
+            Raises:
+                OpenShiftFactsProbeNotRecordedError:
+        """
+        key = self.key(kind, arg)
+        if key not in self.results:
+            if self.replay:
+                raise OpenShiftFactsProbeNotRecordedError('Host probe {0} was not recorded'.format(key))
+            self.results[key] = func(arg)
+        return self.results[key]
+
+    def probe_many(self, kind, args, func):
+        """ Probe several arguments with a single call of func
+
+            Args:
+                kind (str): kind of probe ex: 'rpm_installed'
+                args (list): probe arguments
+                func (callable): probe taking a list of arguments and
+                                 returning the results by argument
+            Returns:
+                dict: the results by argument
+            Raises:
+                OpenShiftFactsProbeNotRecordedError:
+        """
+        missing = [arg for arg in args if self.key(kind, arg) not in self.results]
+        if missing:
+            if self.replay:
+                raise OpenShiftFactsProbeNotRecordedError(
+                    'Host probes {0} were not recorded'.format(', '.join(self.key(kind, arg) for arg in missing)))
+            for arg, result in iteritems(func(missing)):
+                self.results[self.key(kind, arg)] = result
+        return dict((arg, self.results[self.key(kind, arg)]) for arg in args)
+
+    def path_exists(self, path):
+        """ Check whether path exists """
+        return self.probe('path_exists', path, os.path.exists)
+
+    def is_file(self, path):
+        """ Check whether path is a file """
+        return self.probe('is_file', path, os.path.isfile)
+
+    def read_file(self, path):
+        """ Return the content of path, None if it can't be read """
+        return self.probe('read_file', path, read_file_content)
+
+
+# Replaced while deriving facts from the probes recorded on a host.
+host_probes = HostProbes()  # pylint: disable=invalid-name
+
+
+def collect_host_probes(facts):
+    """ Record every host probe the fact generation stages may need
+
+        The probe arguments depend on facts derived by the stages, ex:
+        common.config_base, so each candidate value is probed.
+
+        Args:
+            facts (dict): merged facts the stages start from
+        Returns:
+            dict: the recorded probe results
+    """
+    common = facts.get('common', {})
+    service_types = ['origin', 'atomic-openshift', 'openshift']
+    config_bases = ['/etc/origin', '/etc/openshift']
+    data_dirs = ['/var/lib/origin', '/var/lib/openshift']
+    if common.get('service_type') not in service_types + [None]:
+        service_types.append(common['service_type'])
+    if common.get('config_base') not in config_bases + [None]:
+        config_bases.append(common['config_base'])
+    if common.get('data_dir') not in data_dirs + [None]:
+        data_dirs.append(common['data_dir'])
+
+    for path in config_bases + data_dirs:
+        host_probes.path_exists(path)
+    for config_base in config_bases:
+        host_probes.probe('master_config', os.path.join(config_base, 'master/master-config.yaml'),
+                          read_master_config)
+    host_probes.read_file('/etc/etcd/etcd.conf')
+    host_probes.is_file('/run/ostree-booted')
+
+    for binary in ('/usr/bin/openshift', '/usr/local/bin/openshift'):
+        if host_probes.is_file(binary):
+            host_probes.probe('openshift_version', binary, get_binary_openshift_version)
+    for service_type in service_types:
+        for filename in ['/etc/sysconfig/%s-master', '/etc/sysconfig/%s-node']:
+            host_probes.read_file(filename % service_type)
+
+    kubeconfig_dir = '/var/lib/origin/openshift.local.certificates'
+    for kubeconfig_path in (os.path.join(kubeconfig_dir, '.kubeconfig'),
+                            os.path.join(kubeconfig_dir, 'node-%s' % common.get('hostname'), '.kubeconfig')):
+        host_probes.probe('kubeconfig', kubeconfig_path, read_kubeconfig)
+
+    units = []
+    for service_type in service_types:
+        units += [unit for unit in get_services(service_type) if unit not in units]
+    host_probes.probe_many('unit_state', units, query_unit_states)
+    host_probes.probe_many('rpm_installed', get_variant_rpms(), query_rpms_installed)
+    return host_probes.results
+
+
+def get_interface_facts(system_facts):
+    """ Select the network interface facts
+
+        Args:
+            system_facts (dict): ansible_facts
+        Returns:
+            dict: the facts of every network interface
+    """
+    return dict((key, value) for key, value in iteritems(system_facts)
+                if isinstance(value, dict) and 'mtu' in value)
+
+
+def derive_facts(facts, system_facts, role, scope_to_role=False):
+    """ Run the fact generation stages
+
+        Args:
+            facts (dict): merged local, default and provider facts
+            system_facts (dict): ansible_facts
+            role (str): role the facts are generated for
+            scope_to_role (bool): only run the stages needed for the common
+                                  and role facts
+        Returns:
+            dict: the generated facts
+    """
+    stages = FACT_STAGES
+    if scope_to_role:
+        stages = plan_fact_stages(FACT_STAGES, ['common', role])
+    for stage in stages:
+        if stage.when is not None and not stage.when(facts):
+            continue
+        if stage.system_facts:
+            facts = profiler.run_stage(stage.func, facts, system_facts)
+        else:
+            facts = profiler.run_stage(stage.func, facts)
+    return facts
+
+
+def derive_recorded_facts(recording):
+    """ Generate the facts of a host from the probes recorded on it
+
+        Args:
+            recording (dict): the openshift_probes fact of the host
+        Returns:
+            dict: the generated facts
+        Raises:
+            OpenShiftFactsProbeNotRecordedError:
+    """
+    global host_probes  # pylint: disable=global-statement,invalid-name
+    live_probes = host_probes
+    host_probes = HostProbes(recording['probes'])
+    try:
+        return derive_facts(copy.deepcopy(recording['facts']),
+                            recording['system_facts'],
+                            recording['role'],
+                            recording['scope_to_role'])
+    finally:
+        host_probes = live_probes
+
+
+# Below this many hosts, starting a pool costs more than it saves
+DERIVE_POOL_MIN_HOSTS = 16
+
+
+def derive_pool_size(processes, hosts):
+    """ Size of the pool of processes deriving the facts of some hosts,
+        1 to derive them in this process
+
+        Args:
+            processes (int): requested size of the pool, None for the default
+            hosts (int): number of hosts
+        Returns:
+            int: the number of processes
+    """
+    # The workers are handed derive_recorded_facts by name, from this
+    # module as loaded by the openshift_facts_derive action plugin
+    # (imp.load_source). Only forked workers have it, spawned ones don't.
+    # Python 2 has no get_start_method and always forks.
+    get_start_method = getattr(multiprocessing, 'get_start_method', lambda: 'fork')
+    if get_start_method() != 'fork':
+        return 1
+    # Daemonic processes, ex: ansible workers, can't have children.
+    if multiprocessing.current_process().daemon:
+        return 1
+    if processes is None:
+        if hosts < DERIVE_POOL_MIN_HOSTS:
+            return 1
+        processes = multiprocessing.cpu_count()
+    return max(1, min(processes, hosts))
+
+
+def derive_facts_for_hosts(recordings, processes=None):
+    """ Generate the facts of many hosts from their recorded probes, in a
+        pool of processes when there are enough of them
+
+        Args:
+            recordings (dict): openshift_probes fact by host
+            processes (int): size of the pool, defaults to the number of
+                cpus from DERIVE_POOL_MIN_HOSTS hosts, see derive_pool_size
+        Returns:
+            dict: the generated facts by host
+        Raises:
+            OpenShiftFactsProbeNotRecordedError:
+    """
+    hosts = sorted(recordings)
+    processes = derive_pool_size(processes, len(hosts))
+
+    if processes > 1:
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(derive_recorded_facts, [recordings[host] for host in hosts])
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [derive_recorded_facts(recordings[host]) for host in hosts]
+    return dict(zip(hosts, results))
+
+
+class OpenShiftFactsProfiler(object):
+    """ Per-stage profiler for fact generation
+
+        Records the wall time, the number of subprocesses forked and the
+        number of HTTP requests issued by each stage of fact generation.
+        Stages are only recorded when the profiler is enabled.
+
+        Attributes:
+            enabled (bool): record stage timings
+            stages (list): recorded stages in execution order
+            subprocess_count (int): subprocesses forked so far
+            http_request_count (int): HTTP requests issued so far
+    """
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.stages = []
+        self.subprocess_count = 0
+        self.http_request_count = 0
+        self.start_time = time.time()
+
+    def count_subprocess(self):
+        """ Record that a subprocess was forked """
+        self.subprocess_count += 1
+
+    def count_http_request(self):
+        """ Record that an HTTP request was issued """
+        self.http_request_count += 1
+
+    def attach(self, ansible_module):
+        """ Count every command run through ansible_module.run_command
+
+            Args:
+                ansible_module (AnsibleModule): module to instrument
+        """
+        run_command = ansible_module.run_command
+
+        def counting_run_command(*args, **kwargs):
+            """ run_command wrapper counting forked subprocesses """
+            self.count_subprocess()
+            return run_command(*args, **kwargs)
+
+        ansible_module.run_command = counting_run_command
+
+    @contextmanager
+    def stage(self, name):
+        """ Record wall time and subprocess/HTTP request counts for the
+            enclosed block as stage `name`
+
+            Args:
+                name (str): stage name
+        """
+        if not self.enabled:
+            yield
+            return
+
+        start = time.time()
+        subprocess_count = self.subprocess_count
+        http_request_count = self.http_request_count
+        try:
+            yield
+        finally:
+            self.stages.append(dict(
+                name=name,
+                wall_time=round(time.time() - start, 6),
+                subprocesses=self.subprocess_count - subprocess_count,
+                http_requests=self.http_request_count - http_request_count
+            ))
+
+    def run_stage(self, stage, *args):
+        """ Run stage(*args) as a stage named after the stage function
+
+            Args:
+                stage (callable): fact generation stage
+            Returns:
+                the result of the stage
+        """
+        with self.stage(stage.__name__):
+            return stage(*args)
+
+    def results(self):
+        """ Return the recorded timings
+
+            Returns:
+                dict: total wall time, subprocess and HTTP request counts
+                      and the per-stage breakdown
+        """
+        return dict(wall_time=round(time.time() - self.start_time, 6),
+                    subprocesses=self.subprocess_count,
+                    http_requests=self.http_request_count,
+                    stages=list(self.stages))
+
+
+# Replaced in main() when profiling is requested. The default instance
+# only keeps the counters so library functions can always report to it.
+profiler = OpenShiftFactsProfiler()  # pylint: disable=invalid-name
+
+
 class OpenShiftFacts(object):
     """ Origin Facts
 
@@ -1811,6 +3107,18 @@ class OpenShiftFacts(object):
                                                 '.' notation ex: ['master.named_certificates']
             protected_facts_to_overwrite (list): protected facts to overwrite in jinja
                                                  '.' notation ex: ['master.master_count']
+            provider_facts_ttl (int): seconds to reuse collected provider facts,
+                                      0 to always query the metadata service
+            refresh_provider_facts (bool): query the metadata service even if
+                                           the provider facts snapshot is valid
+            scope_to_role (bool): only run the fact generation stages needed
+                                  for the common and role facts
+            record_probes (bool): return the merged facts and recorded host
+                                  probes as openshift_probes instead of
+                                  running the fact generation stages
+            system_facts (dict): facts already gathered by setup, only
+                                 gathered again if a fact in SYSTEM_FACTS is
+                                 missing
 
         Raises:
             OpenShiftFactsUnsupportedRoleError:
@@ -1831,24 +3139,26 @@ class OpenShiftFacts(object):
                  additive_facts_to_overwrite=None,
                  openshift_env=None,
                  openshift_env_structures=None,
-                 protected_facts_to_overwrite=None):
+                 protected_facts_to_overwrite=None,
+                 provider_facts_ttl=3600,
+                 refresh_provider_facts=False,
+                 scope_to_role=False,
+                 record_probes=False,
+                 system_facts=None):
         self.changed = False
         self.filename = filename
+        self.scope_to_role = scope_to_role
+        self.record_probes = record_probes
+        self.provider_facts_ttl = provider_facts_ttl
+        self.refresh_provider_facts = refresh_provider_facts
         if role not in self.known_roles:
             raise OpenShiftFactsUnsupportedRoleError(
                 "Role %s is not supported by this module" % role
             )
         self.role = role
 
-        try:
-            # ansible-2.1
-            # pylint: disable=too-many-function-args,invalid-name
-            self.system_facts = ansible_facts(module, ['hardware', 'network', 'virtual', 'facter'])  # noqa: F405
-            for (k, v) in self.system_facts.items():
-                self.system_facts["ansible_%s" % k.replace('-', '_')] = v
-        except UnboundLocalError:
-            # ansible-2.2
-            self.system_facts = get_all_facts(module)['ansible_facts']  # noqa: F405
+        with profiler.stage('gather_system_facts'):
+            self.system_facts = self.init_system_facts(system_facts)
 
         self.facts = self.generate_facts(local_facts,
                                          additive_facts_to_overwrite,
@@ -1874,11 +3184,12 @@ class OpenShiftFacts(object):
             Returns:
                 dict: The generated facts
         """
-        local_facts = self.init_local_facts(local_facts,
-                                            additive_facts_to_overwrite,
-                                            openshift_env,
-                                            openshift_env_structures,
-                                            protected_facts_to_overwrite)
+        local_facts = profiler.run_stage(self.init_local_facts,
+                                         local_facts,
+                                         additive_facts_to_overwrite,
+                                         openshift_env,
+                                         openshift_env_structures,
+                                         protected_facts_to_overwrite)
         roles = local_facts.keys()
 
         if 'common' in local_facts and 'deployment_type' in local_facts['common']:
@@ -1891,39 +3202,57 @@ class OpenShiftFacts(object):
         else:
             deployment_subtype = 'basic'
 
-        defaults = self.get_defaults(roles, deployment_type, deployment_subtype)
-        provider_facts = self.init_provider_facts()
-        facts = apply_provider_facts(defaults, provider_facts)
-        facts = merge_facts(facts,
-                            local_facts,
-                            additive_facts_to_overwrite,
-                            protected_facts_to_overwrite)
-        facts = migrate_oauth_template_facts(facts)
-        facts['current_config'] = get_current_config(facts)
-        facts = set_url_facts_if_unset(facts)
-        facts = set_project_cfg_facts_if_unset(facts)
-        facts = set_flannel_facts_if_unset(facts)
-        facts = set_nuage_facts_if_unset(facts)
-        facts = set_node_schedulability(facts)
-        facts = set_selectors(facts)
-        facts = set_identity_providers_if_unset(facts)
-        facts = set_deployment_facts_if_unset(facts)
-        facts = set_sdn_facts_if_unset(facts, self.system_facts)
-        facts = set_container_facts_if_unset(facts)
-        facts = build_kubelet_args(facts)
-        facts = build_controller_args(facts)
-        facts = build_api_server_args(facts)
-        facts = set_version_facts_if_unset(facts)
-        facts = set_evacuate_or_drain_option(facts)
-        facts = set_dnsmasq_facts_if_unset(facts)
-        facts = set_manageiq_facts_if_unset(facts)
-        facts = set_aggregate_facts(facts)
-        facts = set_etcd_facts_if_unset(facts)
-        facts = set_proxy_facts(facts)
-        if not safe_get_bool(facts['common']['is_containerized']):
-            facts = set_installed_variant_rpm_facts(facts)
-        facts = set_nodename(facts)
-        return dict(openshift=facts)
+        defaults = profiler.run_stage(self.get_defaults, roles, deployment_type, deployment_subtype)
+        provider_facts = profiler.run_stage(self.init_provider_facts)
+        facts = profiler.run_stage(apply_provider_facts, defaults, provider_facts)
+        facts = profiler.run_stage(merge_facts,
+                                   facts,
+                                   local_facts,
+                                   additive_facts_to_overwrite,
+                                   protected_facts_to_overwrite)
+        if self.record_probes:
+            # The stages only read the network interface facts
+            return dict(openshift_probes=dict(facts=facts,
+                                              system_facts=get_interface_facts(self.system_facts),
+                                              probes=profiler.run_stage(collect_host_probes, facts),
+                                              role=self.role,
+                                              scope_to_role=self.scope_to_role))
+        return dict(openshift=derive_facts(facts, self.system_facts, self.role, self.scope_to_role))
+
+    @staticmethod
+    def init_system_facts(system_facts=None):
+        """ Get the system facts read by the module
+
+            The facts gathered by setup are used when they include every
+            fact listed in SYSTEM_FACTS. Otherwise only the network and
+            virtual subsets are gathered and the product name and version
+            are read from DMI, rather than gathering the slow hardware
+            subset for them.
+
+            Args:
+                system_facts (dict): facts gathered by setup
+            Returns:
+                dict: the SYSTEM_FACTS and network interface facts
+        """
+        if not system_facts or not all(fact in system_facts for fact in SYSTEM_FACTS):
+            try:
+                # ansible-2.1
+                # pylint: disable=too-many-function-args,invalid-name
+                gathered_facts = ansible_facts(module, ['network', 'virtual'])  # noqa: F405
+                system_facts = dict(("ansible_%s" % k.replace('-', '_'), v) for (k, v) in gathered_facts.items())
+            except UnboundLocalError:
+                # ansible-2.2
+                system_facts = get_all_facts(module)['ansible_facts']  # noqa: F405
+            for fact in ('product_name', 'product_version'):
+                if 'ansible_' + fact not in system_facts:
+                    system_facts['ansible_' + fact] = get_file_content(  # noqa: F405
+                        '/sys/devices/virtual/dmi/id/' + fact, 'NA'
+                    )
+
+        facts = get_interface_facts(system_facts)
+        for fact in SYSTEM_FACTS:
+            facts[fact] = system_facts[fact]
+        return facts
 
     def get_defaults(self, roles, deployment_type, deployment_subtype):
         """ Get default fact values
@@ -1999,8 +3328,7 @@ class OpenShiftFacts(object):
             defaults['docker'] = docker
 
         if 'clock' in roles:
-            exit_code, _, _ = module.run_command(['rpm', '-q', 'chrony'])  # noqa: F405
-            chrony_installed = bool(exit_code == 0)
+            chrony_installed = is_rpm_installed('chrony')
             defaults['clock'] = dict(
                 enabled=True,
                 chrony_installed=chrony_installed)
@@ -2108,7 +3436,8 @@ class OpenShiftFacts(object):
         elif virt_type == 'xen' and virt_role == 'guest' and re.match(r'.*\.amazon$', product_version):
             provider = 'aws'
             metadata_url = 'http://169.254.169.254/latest/meta-data/'
-            metadata = get_provider_metadata(metadata_url)
+            metadata = get_provider_metadata(metadata_url,
+                                             allowlist=AWS_METADATA_KEYS)
         elif re.search(r'OpenStack', product_name):
             provider = 'openstack'
             metadata_url = ('http://169.254.169.254/openstack/latest/'
@@ -2119,7 +3448,7 @@ class OpenShiftFacts(object):
             if metadata:
                 ec2_compat_url = 'http://169.254.169.254/latest/meta-data/'
                 metadata['ec2_compat'] = get_provider_metadata(
-                    ec2_compat_url
+                    ec2_compat_url, allowlist=OPENSTACK_EC2_METADATA_KEYS
                 )
 
                 # disable pylint maybe-no-member because overloaded use of
@@ -2138,6 +3467,33 @@ class OpenShiftFacts(object):
     def init_provider_facts(self):
         """ Initialize the provider facts
 
+            The normalized provider facts are kept in the probe cache for
+            provider_facts_ttl seconds, keyed on the DMI product UUID of the
+            instance, so the metadata service is only queried again once
+            the snapshot expired, the instance identity changed or
+            refresh_provider_facts was requested.
+
+            Returns:
+                dict: The normalized provider facts
+        """
+        identity = get_file_content(  # noqa: F405
+            '/sys/devices/virtual/dmi/id/product_uuid'
+        )
+        if not identity or not self.provider_facts_ttl:
+            return self.collect_provider_facts()
+
+        provider_facts = probe_cache.get('provider_facts', [identity],
+                                         self.collect_provider_facts,
+                                         ttl=self.provider_facts_ttl,
+                                         refresh=self.refresh_provider_facts)
+        # Do not hold on to a failed metadata lookup
+        if not provider_facts:
+            probe_cache.invalidate('provider_facts')
+        return provider_facts
+
+    def collect_provider_facts(self):
+        """ Collect the provider facts from the provider metadata service
+
             Returns:
                 dict: The normalized provider facts
         """
@@ -2236,7 +3592,8 @@ class OpenShiftFacts(object):
                                            additive_facts_to_overwrite=[],
                                            protected_facts_to_overwrite=[])
 
-        local_facts = get_local_facts_from_file(self.filename)
+        fact_store = LocalFactStore(self.filename)
+        local_facts = fact_store.load()
 
         migrated_facts = migrate_local_facts(local_facts)
 
@@ -2264,8 +3621,10 @@ class OpenShiftFacts(object):
         if new_local_facts != local_facts:
             self.validate_local_facts(new_local_facts)
             changed = True
-            if not module.check_mode:  # noqa: F405
-                save_local_facts(self.filename, new_local_facts)
+
+        # Also updates the header of files lacking it and migrates INI files
+        if not module.check_mode:  # noqa: F405
+            fact_store.save(new_local_facts)
 
         self.changed = changed
         return new_local_facts
@@ -2358,7 +3717,7 @@ def main():
     # disabling pylint errors for global-variable-undefined and invalid-name
     # for 'global module' usage, since it is required to use ansible_facts
     # pylint: disable=global-variable-undefined, invalid-name
-    global module
+    global module, profiler, probe_cache
     module = AnsibleModule(  # noqa: F405
         argument_spec=dict(
             role=dict(default='common', required=False,
@@ -2367,7 +3726,13 @@ def main():
             additive_facts_to_overwrite=dict(default=[], type='list', required=False),
             openshift_env=dict(default={}, type='dict', required=False),
             openshift_env_structures=dict(default=[], type='list', required=False),
-            protected_facts_to_overwrite=dict(default=[], type='list', required=False)
+            protected_facts_to_overwrite=dict(default=[], type='list', required=False),
+            profile=dict(default=False, type='bool', required=False),
+            provider_facts_ttl=dict(default=3600, type='int', required=False),
+            refresh_provider_facts=dict(default=False, type='bool', required=False),
+            scope_to_role=dict(default=False, type='bool', required=False),
+            record_probes=dict(default=False, type='bool', required=False),
+            system_facts=dict(default=None, type='dict', required=False)
         ),
         supports_check_mode=True,
         add_file_common_args=True,
@@ -2376,7 +3741,13 @@ def main():
     if not HAVE_DBUS:
         module.fail_json(msg="This module requires dbus python bindings")  # noqa: F405
 
-    module.params['gather_subset'] = ['hardware', 'network', 'virtual', 'facter']  # noqa: F405
+    profile = module.params['profile'] or \
+        safe_get_bool(os.environ.get('OPENSHIFT_FACTS_PROFILE', 'false'))
+    profiler = OpenShiftFactsProfiler(enabled=profile)
+    if profile:
+        profiler.attach(module)
+
+    module.params['gather_subset'] = ['!all', 'network', 'virtual']  # noqa: F405
     module.params['gather_timeout'] = 10  # noqa: F405
     module.params['filter'] = '*'  # noqa: F405
 
@@ -2386,8 +3757,14 @@ def main():
     openshift_env = module.params['openshift_env']  # noqa: F405
     openshift_env_structures = module.params['openshift_env_structures']  # noqa: F405
     protected_facts_to_overwrite = module.params['protected_facts_to_overwrite']  # noqa: F405
+    provider_facts_ttl = module.params['provider_facts_ttl']  # noqa: F405
+    refresh_provider_facts = module.params['refresh_provider_facts']  # noqa: F405
+    scope_to_role = module.params['scope_to_role']  # noqa: F405
+    record_probes = module.params['record_probes']  # noqa: F405
+    system_facts = module.params['system_facts']  # noqa: F405
 
     fact_file = '/etc/ansible/facts.d/openshift.fact'
+    probe_cache = ProbeCache(os.path.join(os.path.dirname(fact_file), 'openshift_probes.json'))
 
     openshift_facts = OpenShiftFacts(role,
                                      fact_file,
@@ -2395,7 +3772,15 @@ def main():
                                      additive_facts_to_overwrite,
                                      openshift_env,
                                      openshift_env_structures,
-                                     protected_facts_to_overwrite)
+                                     protected_facts_to_overwrite,
+                                     provider_facts_ttl,
+                                     refresh_provider_facts,
+                                     scope_to_role,
+                                     record_probes,
+                                     system_facts)
+
+    if not module.check_mode:  # noqa: F405
+        probe_cache.save()
 
     file_params = module.params.copy()  # noqa: F405
     file_params['path'] = fact_file
@@ -2403,8 +3788,11 @@ def main():
     changed = module.set_fs_attributes_if_different(file_args,  # noqa: F405
                                                     openshift_facts.changed)
 
-    return module.exit_json(changed=changed,  # noqa: F405
-                            ansible_facts=openshift_facts.facts)
+    result = dict(changed=changed, ansible_facts=openshift_facts.facts)
+    if profile:
+        result['openshift_facts_timing'] = profiler.results()
+
+    return module.exit_json(**result)  # noqa: F405
 
 
 if __name__ == '__main__':
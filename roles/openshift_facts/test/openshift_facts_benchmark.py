@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+""" Benchmarks for the openshift_facts module.
+
+Runs the recorded host scenarios of openshift_facts_scenarios, reporting the
+wall time, subprocess count, HTTP request count and allocation peak of each
+one, cold (empty probe cache) and warm, followed by micro-benchmarks.
+
+Not collected by the test runner, run it directly:
+
+    python roles/openshift_facts/test/openshift_facts_benchmark.py
+
+Save the results of a release with --save and compare a later tree to them
+with --baseline, which exits non-zero when a scenario got slower than the
+tolerance allows or forks more subprocesses or issues more HTTP requests.
+"""
+# pylint: disable=missing-docstring,invalid-name
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+
+sys.path = [os.path.abspath(os.path.dirname(__file__))] + sys.path
+sys.path = [os.path.abspath(os.path.dirname(__file__) + "/../library/")] + sys.path
+
+# pylint: disable=import-error,wrong-import-position
+import openshift_facts  # noqa: E402
+from openshift_facts_merge_facts_tests import legacy_merge_facts  # noqa: E402
+from openshift_facts_scenarios import SCENARIOS, run_scenario  # noqa: E402
+
+
+def large_facts_document(rng, roles=('common', 'master', 'node', 'docker', 'hosted', 'etcd'), keys=80):
+    """ A facts document of several hundred keys shaped like the real one """
+    facts = dict()
+    for role in roles:
+        facts[role] = dict(('%s_fact_%d' % (role, i), rng.choice(['value', 8443, True, ['a', 'b']]))
+                           for i in range(keys))
+        facts[role]['nested'] = dict(('sub_%d' % i, {'kind': None, 'size': '10Gi'}) for i in range(10))
+    facts['master']['named_certificates'] = [{'certfile': '/etc/origin/master/named_%d.crt' % i}
+                                             for i in range(5)]
+    return facts
+
+
+def report(name, number, seconds):
+    print('%-40s %10.1f ops/s  (%d in %.3fs)' % (name, number / seconds, number, seconds))
+
+
+def bench(name, func, number):
+    report(name, number, timeit.timeit(func, number=number))
+
+
+def bench_merge_facts(number=200):
+    rng = random.Random(0)
+    orig = large_facts_document(rng)
+    new = large_facts_document(rng, roles=('common', 'master', 'node'), keys=40)
+    overwrite = ['master.named_certificates']
+    keys = sum(len(role) for role in orig.values())
+    print('merge_facts on a %d key document' % keys)
+    bench('  legacy deep copying merge', lambda: legacy_merge_facts(orig, new, overwrite, []), number)
+    bench('  structural merge', lambda: openshift_facts.merge_facts(orig, new, overwrite, []), number)
+
+
+def bench_scenarios(names, number, show_stages=False):
+    """ Run each scenario number times cold and warm, keeping the median
+        wall time of each
+    """
+    results = dict()
+    print('%-24s %10s %8s %8s %10s' % ('scenario', 'wall ms', 'forks', 'http', 'peak KiB'))
+    for scenario in SCENARIOS:
+        if names and scenario.name not in names:
+            continue
+        for state in ('cold', 'warm'):
+            runs = []
+            for _ in range(number):
+                probe_cache = None
+                if state == 'warm':
+                    probe_cache = run_scenario(scenario)[2]
+                runs.append(run_scenario(scenario, probe_cache)[0])
+            runs.sort(key=lambda run: run['wall_time'])
+            metrics = runs[len(runs) // 2]
+            # tracing allocations slows the run down, so trace a separate one
+            metrics['peak_kib'] = run_scenario(scenario, probe_cache, trace_allocations=True)[0]['peak_kib']
+            name = '%s/%s' % (scenario.name, state)
+            results[name] = dict((key, value) for key, value in metrics.items() if key != 'stages')
+            print('%-24s %10.2f %8d %8d %10s' % (name, metrics['wall_time'] * 1000, metrics['subprocesses'],
+                                                 metrics['http_requests'], metrics['peak_kib']))
+            if show_stages:
+                for stage, wall_time in sorted(metrics['stages'].items(), key=lambda item: -item[1]):
+                    print('    %-36s %8.2f' % (stage, wall_time * 1000))
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """ Return the regressions of results against baseline """
+    regressions = []
+    for name, metrics in sorted(results.items()):
+        if name not in baseline:
+            continue
+        base = baseline[name]
+        if metrics['wall_time'] > base['wall_time'] * (1 + tolerance):
+            regressions.append('%s: wall time %.2fms > %.2fms' % (
+                name, metrics['wall_time'] * 1000, base['wall_time'] * 1000))
+        for key in ('subprocesses', 'http_requests'):
+            if metrics[key] > base[key]:
+                regressions.append('%s: %s %d > %d' % (name, key, metrics[key], base[key]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the openshift_facts module')
+    parser.add_argument('--scenario', action='append', help='only run this scenario')
+    parser.add_argument('--number', type=int, default=5, help='runs per scenario')
+    parser.add_argument('--stages', action='store_true', help='show the wall time of each stage')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare the results to this JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed wall time increase over the baseline')
+    args = parser.parse_args()
+
+    results = bench_scenarios(args.scenario, args.number, args.stages)
+    if args.save:
+        with open(args.save, 'w') as results_file:
+            json.dump(results, results_file, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        if regressions:
+            print('\n'.join(['', 'Regressions:'] + regressions))
+            sys.exit(1)
+
+    print()
+    bench_merge_facts()
+
+
+if __name__ == '__main__':
+    main()
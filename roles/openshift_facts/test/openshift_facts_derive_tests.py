@@ -0,0 +1,134 @@
+""" Tests for generating the openshift facts from recorded host probes. """
+# pylint: disable=missing-docstring,invalid-name
+
+import copy
+import json
+import multiprocessing
+import os
+import sys
+import unittest
+
+sys.path = [os.path.abspath(os.path.dirname(__file__) + "/../library/")] + sys.path
+
+# pylint: disable=import-error
+import openshift_facts  # noqa: E402
+
+
+class FakeModule(object):
+    @staticmethod
+    def run_command(*_, **__):
+        return 1, '', ''
+
+
+class FakeSystemdUnits(object):
+    def __init__(self):
+        self.queries = 0
+
+    def unit_states(self, units):
+        self.queries += 1
+        return dict((unit, dict(load_state='loaded', active_state='active')) for unit in units)
+
+
+SYSTEM_FACTS = {'ansible_eth0': {'mtu': 1500, 'ipv4': {'address': '10.0.0.5'}},
+                'ansible_hostname': 'master1'}
+
+FACTS = {
+    'common': dict(use_openshift_sdn=True, ip='10.0.0.5', public_ip='10.0.0.5',
+                   deployment_type='origin', deployment_subtype='basic',
+                   hostname='master1.example.com', public_hostname='master1.example.com',
+                   portal_net='172.30.0.0/16', client_binary='oc', admin_binary='oadm',
+                   dns_domain='cluster.local', install_examples=True, debug_level=2),
+    'master': dict(api_use_ssl=True, api_port='8443', controllers_port='8444',
+                   console_use_ssl=True, console_path='/console', console_port='8443',
+                   etcd_use_ssl=True, etcd_hosts=['etcd1.example.com'], etcd_port='2379',
+                   embedded_etcd=True, bind_addr='0.0.0.0'),
+    'node': dict(labels={}, annotations={}, iptables_sync_period='30s'),
+    'docker': dict(disable_push_dockerhub=False),
+}
+
+
+def record(facts, role='master'):
+    probes = openshift_facts.collect_host_probes(facts)
+    return dict(facts=facts, system_facts=dict(ansible_eth0=SYSTEM_FACTS['ansible_eth0']),
+                probes=copy.deepcopy(probes), role=role, scope_to_role=False)
+
+
+class DeriveFactsTests(unittest.TestCase):
+
+    def setUp(self):
+        openshift_facts.module = FakeModule()
+        openshift_facts.probe_cache = openshift_facts.ProbeCache()
+        self.systemd_units = FakeSystemdUnits()
+        openshift_facts.systemd_units = self.systemd_units
+        openshift_facts.host_probes = openshift_facts.HostProbes()
+
+    def test_recording_is_json(self):
+        recording = record(copy.deepcopy(FACTS))
+        self.assertEqual(recording, json.loads(json.dumps(recording)))
+        self.assertEqual(1, self.systemd_units.queries)
+
+    def test_recorded_facts_match_host_generation(self):
+        recording = record(copy.deepcopy(FACTS))
+        expected = openshift_facts.derive_facts(copy.deepcopy(FACTS), SYSTEM_FACTS, 'master')
+        self.assertEqual(expected, openshift_facts.derive_recorded_facts(recording))
+        # every probe the stages made was recorded up front
+        self.assertEqual(sorted(recording['probes']), sorted(openshift_facts.host_probes.results))
+
+    def test_recorded_results_are_replayed(self):
+        recording = record(copy.deepcopy(FACTS))
+        recording['probes']['is_file:/run/ostree-booted'] = True
+        recording['probes']['read_file:/etc/sysconfig/origin-master'] = 'IMAGE_VERSION=v1.5.1\n'
+        facts = openshift_facts.derive_recorded_facts(recording)
+        self.assertTrue(facts['common']['is_atomic'])
+        self.assertEqual('1.5.1', facts['common']['version'])
+        self.assertEqual('/usr/local/bin/oc', facts['common']['client_binary'])
+
+    def test_missing_probe(self):
+        recording = record(copy.deepcopy(FACTS))
+        del recording['probes']['is_file:/run/ostree-booted']
+        self.assertRaises(openshift_facts.OpenShiftFactsProbeNotRecordedError,
+                          openshift_facts.derive_recorded_facts, recording)
+
+    def test_recording_is_not_modified(self):
+        recording = record(copy.deepcopy(FACTS))
+        original = copy.deepcopy(recording)
+        openshift_facts.derive_recorded_facts(recording)
+        self.assertEqual(original, recording)
+
+    def test_hosts_in_pool(self):
+        recordings = {}
+        for index in range(4):
+            facts = copy.deepcopy(FACTS)
+            facts['common']['hostname'] = 'master%d.example.com' % index
+            recordings[facts['common']['hostname']] = record(facts)
+        expected = openshift_facts.derive_facts_for_hosts(recordings, processes=1)
+        self.assertEqual(expected, openshift_facts.derive_facts_for_hosts(recordings, processes=2))
+        self.assertEqual('master2.example.com', expected['master2.example.com']['common']['hostname'])
+        self.assertIn('master2.example.com', expected['master2.example.com']['common']['all_hostnames'])
+
+    def test_pool_size(self):
+        hosts = openshift_facts.DERIVE_POOL_MIN_HOSTS
+        self.assertEqual(1, openshift_facts.derive_pool_size(None, hosts - 1))
+        self.assertEqual(min(multiprocessing.cpu_count(), hosts), openshift_facts.derive_pool_size(None, hosts))
+        self.assertEqual(2, openshift_facts.derive_pool_size(2, 4))
+        self.assertEqual(4, openshift_facts.derive_pool_size(8, 4))
+        self.assertEqual(1, openshift_facts.derive_pool_size(8, 0))
+
+    @unittest.skipUnless(hasattr(multiprocessing, 'get_start_method'), 'python 2 always forks')
+    def test_no_pool_unless_forking(self):
+        get_start_method = multiprocessing.get_start_method
+        pool = multiprocessing.Pool
+        multiprocessing.get_start_method = lambda: 'spawn'
+        multiprocessing.Pool = None
+        try:
+            self.assertEqual(1, openshift_facts.derive_pool_size(2, 4))
+            recordings = dict((host, record(copy.deepcopy(FACTS))) for host in ['master1', 'master2'])
+            facts = openshift_facts.derive_facts_for_hosts(recordings, processes=2)
+        finally:
+            multiprocessing.get_start_method = get_start_method
+            multiprocessing.Pool = pool
+        self.assertEqual(['master1', 'master2'], sorted(facts))
+
+
+if __name__ == '__main__':
+    unittest.main()
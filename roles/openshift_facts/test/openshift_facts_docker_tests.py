@@ -0,0 +1,121 @@
+""" Tests for the docker version probe of the openshift_facts module. """
+# pylint: disable=missing-docstring,invalid-name
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+from six.moves import BaseHTTPServer, socketserver
+
+sys.path = [os.path.abspath(os.path.dirname(__file__) + "/../library/")] + sys.path
+
+# pylint: disable=import-error
+import openshift_facts  # noqa: E402
+
+DOCKER_VERSION = {
+    'Version': '1.12.6',
+    'ApiVersion': '1.24',
+    'GitCommit': '78d1802',
+    'GoVersion': 'go1.6.2',
+    'Os': 'linux',
+    'Arch': 'amd64'
+}
+
+
+class FakeDockerSocket(object):
+    """ Serves the docker Engine API /version endpoint on a unix socket """
+    def __init__(self, socket_path, status=200, body=None):
+        self.requests = []
+        fake = self
+
+        class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+            def do_GET(self):
+                fake.requests.append(self.path)
+                payload = json.dumps(DOCKER_VERSION) if body is None else body
+                payload = payload.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def address_string(self):
+                return 'unix'
+
+            def log_message(self, *_):
+                pass
+
+        self.server = socketserver.UnixStreamServer(socket_path, Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, kwargs={'poll_interval': 0.05})
+        self.thread.daemon = True
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *_):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class DockerVersionTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.tmpdir, 'docker.sock')
+        openshift_facts.profiler = openshift_facts.OpenShiftFactsProfiler()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_version_from_socket(self):
+        with FakeDockerSocket(self.socket_path) as docker:
+            version_info = openshift_facts.get_docker_api_version_info(self.socket_path)
+        self.assertEqual({'api_version': '1.24', 'version': '1.12.6'}, version_info)
+        self.assertEqual(['/version'], docker.requests)
+        self.assertEqual(1, openshift_facts.profiler.http_request_count)
+
+    def test_socket_connection(self):
+        with FakeDockerSocket(self.socket_path) as docker:
+            connection = openshift_facts.DockerSocketConnection(self.socket_path)
+            try:
+                connection.request('GET', '/version')
+                self.assertEqual(200, connection.getresponse().status)
+            finally:
+                connection.close()
+        self.assertEqual(['/version'], docker.requests)
+
+    def test_missing_socket(self):
+        self.assertIsNone(openshift_facts.get_docker_api_version_info(self.socket_path))
+
+    def test_error_response(self):
+        with FakeDockerSocket(self.socket_path, status=500, body='{"message": "oops"}'):
+            self.assertIsNone(openshift_facts.get_docker_api_version_info(self.socket_path))
+
+    def test_unexpected_body(self):
+        with FakeDockerSocket(self.socket_path, body='not json'):
+            self.assertIsNone(openshift_facts.get_docker_api_version_info(self.socket_path))
+
+    def test_falls_back_to_cli(self):
+        calls = []
+        get_api_version_info = openshift_facts.get_docker_api_version_info
+        is_service_running = openshift_facts.is_service_running
+        get_version_output = openshift_facts.get_version_output
+        try:
+            openshift_facts.get_docker_api_version_info = lambda: None
+            openshift_facts.is_service_running = lambda service: calls.append(service) or True
+            openshift_facts.get_version_output = lambda binary, cmd: (
+                'Client:\n Version: 1.12.6\n API version: 1.24\n'
+                'Server:\n Version: 1.12.6\n API version: 1.24\n')
+            version_info = openshift_facts.probe_docker_version_info()
+        finally:
+            openshift_facts.get_docker_api_version_info = get_api_version_info
+            openshift_facts.is_service_running = is_service_running
+            openshift_facts.get_version_output = get_version_output
+        self.assertEqual(['docker'], calls)
+        # the cli output is parsed as YAML, which turns the api version into a float
+        self.assertEqual({'api_version': 1.24, 'version': '1.12.6'}, version_info)
@@ -0,0 +1,73 @@
+""" Tests for installed rpm detection in the openshift_facts module. """
+# pylint: disable=missing-docstring,invalid-name
+
+import os
+import sys
+import unittest
+
+sys.path = [os.path.abspath(os.path.dirname(__file__) + "/../library/")] + sys.path
+
+# pylint: disable=import-error
+import openshift_facts  # noqa: E402
+
+
+class FakeRpmModule(object):
+    """ Answers `rpm -q` queries from a fixed set of installed packages """
+    def __init__(self, installed):
+        self.installed = installed
+        self.commands = []
+
+    def run_command(self, cmd, **_):
+        self.commands.append(cmd)
+        names = [arg for arg in cmd[2:] if not arg.startswith('-') and arg != '%{NAME}\\n']
+        lines = []
+        for name in names:
+            if name in self.installed:
+                lines.append(name)
+            else:
+                lines.append('package %s is not installed' % name)
+        missing = len([name for name in names if name not in self.installed])
+        return missing, '\n'.join(lines) + '\n', ''
+
+
+class InstalledRpmsTests(unittest.TestCase):
+
+    # module is only set by main()
+    patched = ['module', 'probe_cache', 'host_probes', 'HAVE_RPM']
+    missing = object()
+
+    def setUp(self):
+        self.saved = dict((name, getattr(openshift_facts, name, self.missing)) for name in self.patched)
+        self.module = FakeRpmModule(['atomic-openshift', 'atomic-openshift-node',
+                                     'tuned-profiles-atomic-openshift-node', 'chrony'])
+        openshift_facts.module = self.module
+        openshift_facts.probe_cache = openshift_facts.ProbeCache()
+        openshift_facts.host_probes = openshift_facts.HostProbes()
+        openshift_facts.HAVE_RPM = False
+
+    def tearDown(self):
+        for name, value in self.saved.items():
+            if value is self.missing:
+                delattr(openshift_facts, name)
+            else:
+                setattr(openshift_facts, name, value)
+
+    def test_installed_variant_rpms(self):
+        facts = openshift_facts.set_installed_variant_rpm_facts({'common': {}})
+        self.assertEqual(['atomic-openshift', 'atomic-openshift-node',
+                          'tuned-profiles-atomic-openshift-node'],
+                         facts['common']['installed_variant_rpms'])
+
+    def test_single_query_for_all_variants(self):
+        openshift_facts.set_installed_variant_rpm_facts({'common': {}})
+        self.assertEqual(1, len(self.module.commands))
+        self.assertEqual(18, len(self.module.commands[0]) - 4)
+
+    def test_query_is_cached(self):
+        openshift_facts.set_installed_variant_rpm_facts({'common': {}})
+        openshift_facts.set_installed_variant_rpm_facts({'common': {}})
+        self.assertEqual(1, len(self.module.commands))
+
+    def test_is_rpm_installed(self):
+        self.assertTrue(openshift_facts.is_rpm_installed('chrony'))
+        self.assertFalse(openshift_facts.is_rpm_installed('ntp'))
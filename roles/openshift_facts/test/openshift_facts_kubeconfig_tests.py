@@ -0,0 +1,71 @@
+""" Tests for kubeconfig loading in the openshift_facts module. """
+# pylint: disable=missing-docstring,invalid-name
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path = [os.path.abspath(os.path.dirname(__file__) + "/../library/")] + sys.path
+
+# pylint: disable=import-error
+import openshift_facts  # noqa: E402
+
+KUBECONFIG = """apiVersion: v1
+kind: Config
+clusters:
+- cluster:
+    certificate-authority-data: LS0tLS1CRUdJTi==
+    server: https://master1.example.com:8443
+  name: master1-example-com:8443
+contexts:
+- context:
+    cluster: master1-example-com:8443
+    namespace: default
+    user: system:admin/master1-example-com:8443
+  name: default/master1-example-com:8443/system:admin
+current-context: default/master1-example-com:8443/system:admin
+users:
+- name: system:admin/master1-example-com:8443
+  user:
+    client-certificate-data: LS0tLS1DRVJU==
+    client-key-data: LS0tLS1LRVk==
+- name: developer/master1-example-com:8443
+  user:
+    token: sha256~dG9rZW4
+- name: admin/master1-example-com:8443
+  user:
+    username: admin
+    password: s3cr3t
+"""
+
+
+class LoadKubeconfigTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, '.kubeconfig')
+        with open(self.path, 'w') as kubeconfig:
+            kubeconfig.write(KUBECONFIG)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_secrets_are_masked(self):
+        config = openshift_facts.load_kubeconfig(self.path)
+        self.assertEqual('masked', config['clusters'][0]['cluster']['certificate-authority-data'])
+        self.assertEqual('masked', config['users'][0]['user']['client-key-data'])
+        self.assertEqual('masked', config['users'][0]['user']['client-certificate-data'])
+        self.assertNotIn('certificate-authority-data', config['users'][0]['user'])
+
+    def test_token_and_password_are_masked(self):
+        config = openshift_facts.load_kubeconfig(self.path)
+        self.assertEqual({'token': 'masked'}, config['users'][1]['user'])
+        self.assertEqual({'username': 'admin', 'password': 'masked'}, config['users'][2]['user'])
+
+    def test_other_settings_are_kept(self):
+        config = openshift_facts.load_kubeconfig(self.path)
+        self.assertEqual('https://master1.example.com:8443', config['clusters'][0]['cluster']['server'])
+        self.assertEqual('system:admin/master1-example-com:8443', config['users'][0]['name'])
+        self.assertEqual('default/master1-example-com:8443/system:admin', config['current-context'])
@@ -0,0 +1,174 @@
+""" Tests for the local facts file of the openshift_facts module. """
+# pylint: disable=missing-docstring,invalid-name
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path = [os.path.abspath(os.path.dirname(__file__) + "/../library/")] + sys.path
+
+# pylint: disable=import-error
+import openshift_facts  # noqa: E402
+
+FACTS = {'common': {'deployment_type': 'origin', 'hostname': 'master1.example.com'},
+         'master': {'api_port': '8443', 'named_certificates': [{'certfile': '/etc/cert.crt'}]}}
+
+
+class LocalFactStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'facts.d', 'openshift.fact')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def store(self):
+        store = openshift_facts.LocalFactStore(self.filename)
+        return store, store.load()
+
+    def test_missing_file(self):
+        store, facts = self.store()
+        self.assertEqual({}, facts)
+        self.assertIsNone(store.header)
+        self.assertIsNone(openshift_facts.LocalFactStore.read_header(self.filename))
+
+    def test_round_trip(self):
+        store, _ = self.store()
+        self.assertTrue(store.save(FACTS))
+        store, facts = self.store()
+        self.assertEqual(FACTS, facts)
+        self.assertEqual(1, store.header['generation'])
+        self.assertEqual(openshift_facts.LocalFactStore.hash_facts(FACTS), store.header['hash'])
+        self.assertEqual(0o600, os.stat(self.filename).st_mode & 0o777)
+        self.assertEqual(['openshift.fact', 'openshift.fact.header'],
+                         sorted(os.listdir(os.path.dirname(self.filename))))
+
+    def test_file_is_json(self):
+        store, _ = self.store()
+        store.save(FACTS)
+        with open(self.filename) as fact_file:
+            self.assertEqual(FACTS, json.load(fact_file))
+        with open(self.filename + '.header') as header_file:
+            self.assertEqual(store.header, json.load(header_file))
+
+    def test_read_header(self):
+        store, _ = self.store()
+        store.save(FACTS)
+        self.assertEqual(store.header, openshift_facts.LocalFactStore.read_header(self.filename))
+
+    def test_empty_facts(self):
+        store, _ = self.store()
+        store.save({})
+        store, facts = self.store()
+        self.assertEqual({}, facts)
+        self.assertEqual(store.header, openshift_facts.LocalFactStore.read_header(self.filename))
+
+    def test_unchanged_facts_are_not_written(self):
+        store, _ = self.store()
+        store.save(FACTS)
+        before = os.stat(self.filename)
+        store, facts = self.store()
+        self.assertFalse(store.save(facts))
+        after = os.stat(self.filename)
+        self.assertEqual((before.st_ino, before.st_mtime), (after.st_ino, after.st_mtime))
+
+    def test_generation_increments(self):
+        store, facts = self.store()
+        store.save(FACTS)
+        store, facts = self.store()
+        facts['common']['hostname'] = 'master2.example.com'
+        self.assertTrue(store.save(facts))
+        self.assertEqual(2, openshift_facts.LocalFactStore.read_header(self.filename)['generation'])
+
+    def test_generation_is_kept_on_unchanged_save(self):
+        store, _ = self.store()
+        store.save(FACTS)
+        before = os.stat(self.filename + '.header')
+        store, facts = self.store()
+        self.assertFalse(store.save(facts))
+        self.assertEqual(1, openshift_facts.LocalFactStore.read_header(self.filename)['generation'])
+        self.assertEqual(before.st_mtime, os.stat(self.filename + '.header').st_mtime)
+
+    def test_header_of_an_older_schema_keeps_its_generation(self):
+        store, _ = self.store()
+        store.save(FACTS)
+        with open(self.filename + '.header', 'w') as header_file:
+            json.dump({'schema': 0, 'hash': store.facts_hash, 'generation': 5}, header_file)
+        store, facts = self.store()
+        self.assertFalse(store.save(facts))
+        header = openshift_facts.LocalFactStore.read_header(self.filename)
+        self.assertEqual((1, 5), (header['schema'], header['generation']))
+
+    def test_hand_edited_file_is_rewritten(self):
+        store, _ = self.store()
+        store.save(FACTS)
+        with open(self.filename, 'w') as fact_file:
+            json.dump({'common': {'hostname': 'edited.example.com'}}, fact_file)
+        store, facts = self.store()
+        self.assertEqual({'common': {'hostname': 'edited.example.com'}}, facts)
+        self.assertTrue(store.save(FACTS))
+        self.assertEqual(FACTS, self.store()[1])
+        # back to the facts of the header
+        self.assertEqual(1, openshift_facts.LocalFactStore.read_header(self.filename)['generation'])
+
+    def test_header_follows_hand_edits(self):
+        store, _ = self.store()
+        store.save(FACTS)
+        edited = {'common': {'hostname': 'edited.example.com'}}
+        with open(self.filename, 'w') as fact_file:
+            json.dump(edited, fact_file)
+        store, facts = self.store()
+        self.assertFalse(store.save(facts))
+        header = openshift_facts.LocalFactStore.read_header(self.filename)
+        self.assertEqual(openshift_facts.LocalFactStore.hash_facts(edited), header['hash'])
+        self.assertEqual(2, header['generation'])
+
+    def test_header_in_facts_file_is_removed(self):
+        os.makedirs(os.path.dirname(self.filename))
+        with open(self.filename, 'w') as fact_file:
+            json.dump(dict(FACTS, _header={'schema': 1, 'generation': 3}), fact_file)
+        store, facts = self.store()
+        self.assertEqual(FACTS, facts)
+        self.assertTrue(store.save(facts))
+        with open(self.filename) as fact_file:
+            self.assertEqual(FACTS, json.load(fact_file))
+
+    def test_legacy_json_gets_header(self):
+        os.makedirs(os.path.dirname(self.filename))
+        with open(self.filename, 'w') as fact_file:
+            json.dump(FACTS, fact_file)
+        store, facts = self.store()
+        self.assertEqual(FACTS, facts)
+        self.assertIsNone(store.header)
+        before = os.stat(self.filename)
+        self.assertFalse(store.save(facts))
+        self.assertEqual(before.st_mtime, os.stat(self.filename).st_mtime)
+        self.assertEqual(1, openshift_facts.LocalFactStore.read_header(self.filename)['generation'])
+
+    def test_ini_is_migrated(self):
+        os.makedirs(os.path.dirname(self.filename))
+        with open(self.filename, 'w') as fact_file:
+            fact_file.write('[common]\nhostname = master1.example.com\n\n[master]\napi_port = 8443\n')
+        store, facts = self.store()
+        self.assertEqual({'common': {'hostname': 'master1.example.com'},
+                          'master': {'api_port': '8443'}}, facts)
+        self.assertTrue(store.migrate)
+        self.assertTrue(store.save(facts))
+        store, migrated = self.store()
+        self.assertEqual(facts, migrated)
+        self.assertFalse(store.migrate)
+        self.assertFalse(store.save(migrated))
+
+    def test_invalid_file(self):
+        os.makedirs(os.path.dirname(self.filename))
+        with open(self.filename, 'w') as fact_file:
+            fact_file.write('{"common": ')
+        self.assertEqual({}, self.store()[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
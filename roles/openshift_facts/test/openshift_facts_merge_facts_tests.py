@@ -0,0 +1,225 @@
+""" Equivalence tests for merge_facts in the openshift_facts module. """
+# pylint: disable=missing-docstring,invalid-name
+
+import copy
+import os
+import random
+import sys
+import unittest
+
+import yaml
+from six import iteritems, string_types
+
+sys.path = [os.path.abspath(os.path.dirname(__file__) + "/../library/")] + sys.path
+
+# pylint: disable=import-error
+import openshift_facts  # noqa: E402
+
+
+# The merge_facts implementation the merge engine replaced, kept verbatim
+# (apart from names) as the reference for the equivalence tests.
+# pylint: disable=too-many-branches, too-many-nested-blocks
+def legacy_merge_facts(orig, new, additive_facts_to_overwrite, protected_facts_to_overwrite):
+    """ Recursively merge facts dicts
+
+        Args:
+            orig (dict): existing facts
+            new (dict): facts to update
+            additive_facts_to_overwrite (list): additive facts to overwrite in jinja
+                                                '.' notation ex: ['master.named_certificates']
+            protected_facts_to_overwrite (list): protected facts to overwrite in jinja
+                                                 '.' notation ex: ['master.master_count']
+
+        Returns:
+            dict: the merged facts
+    """
+    additive_facts = ['named_certificates']
+    protected_facts = ['ha', 'master_count']
+
+    # Facts we do not ever want to merge. These originate in inventory variables
+    # and contain JSON dicts. We don't ever want to trigger a merge
+    # here, just completely overwrite with the new if they are present there.
+    inventory_json_facts = ['admission_plugin_config',
+                            'kube_admission_plugin_config',
+                            'image_policy_config']
+
+    facts = dict()
+    for key, value in iteritems(orig):
+        # Key exists in both old and new facts.
+        if key in new:
+            if key in inventory_json_facts:
+                # Watchout for JSON facts that sometimes load as strings.
+                # (can happen if the JSON contains a boolean)
+                if isinstance(new[key], string_types):
+                    facts[key] = yaml.safe_load(new[key])
+                else:
+                    facts[key] = copy.deepcopy(new[key])
+            # Continue to recurse if old and new fact is a dictionary.
+            elif isinstance(value, dict) and isinstance(new[key], dict):
+                # Collect the subset of additive facts to overwrite if
+                # key matches. These will be passed to the subsequent
+                # merge_facts call.
+                relevant_additive_facts = []
+                for item in additive_facts_to_overwrite:
+                    if '.' in item and item.startswith(key + '.'):
+                        relevant_additive_facts.append(item)
+
+                # Collect the subset of protected facts to overwrite
+                # if key matches. These will be passed to the
+                # subsequent merge_facts call.
+                relevant_protected_facts = []
+                for item in protected_facts_to_overwrite:
+                    if '.' in item and item.startswith(key + '.'):
+                        relevant_protected_facts.append(item)
+                facts[key] = legacy_merge_facts(value, new[key], relevant_additive_facts, relevant_protected_facts)
+            # Key matches an additive fact and we are not overwriting
+            # it so we will append the new value to the existing value.
+            elif key in additive_facts and key not in [x.split('.')[-1] for x in additive_facts_to_overwrite]:
+                if isinstance(value, list) and isinstance(new[key], list):
+                    new_fact = []
+                    for item in copy.deepcopy(value) + copy.deepcopy(new[key]):
+                        if item not in new_fact:
+                            new_fact.append(item)
+                    facts[key] = new_fact
+            # Key matches a protected fact and we are not overwriting
+            # it so we will determine if it is okay to change this
+            # fact.
+            elif key in protected_facts and key not in [x.split('.')[-1] for x in protected_facts_to_overwrite]:
+                # The master count (int) can only increase unless it
+                # has been passed as a protected fact to overwrite.
+                if key == 'master_count' and new[key] is not None and new[key] != '':
+                    if int(value) <= int(new[key]):
+                        facts[key] = copy.deepcopy(new[key])
+                    else:
+                        # pylint: disable=line-too-long
+                        openshift_facts.module.fail_json(msg='openshift_facts received a lower value for openshift.master.master_count')
+                # ha (bool) can not change unless it has been passed
+                # as a protected fact to overwrite.
+                if key == 'ha':
+                    if openshift_facts.safe_get_bool(value) != openshift_facts.safe_get_bool(new[key]):
+                        # pylint: disable=line-too-long
+                        openshift_facts.module.fail_json(msg='openshift_facts received a different value for openshift.master.ha')
+                    else:
+                        facts[key] = value
+            # No other condition has been met. Overwrite the old fact
+            # with the new value.
+            else:
+                facts[key] = copy.deepcopy(new[key])
+        # Key isn't in new so add it to facts to keep it.
+        else:
+            facts[key] = copy.deepcopy(value)
+    new_keys = set(new.keys()) - set(orig.keys())
+    for key in new_keys:
+        # Watchout for JSON facts that sometimes load as strings.
+        # (can happen if the JSON contains a boolean)
+        if key in inventory_json_facts and isinstance(new[key], string_types):
+            facts[key] = yaml.safe_load(new[key])
+        else:
+            facts[key] = copy.deepcopy(new[key])
+    return facts
+
+
+class FailJson(Exception):
+    pass
+
+
+class FakeModule(object):
+    @staticmethod
+    def fail_json(**kwargs):
+        raise FailJson(kwargs['msg'])
+
+
+def random_facts(rng, width, depth):
+    """ Build a facts document mixing nested dicts, scalars, additive,
+        protected and inventory JSON facts """
+    facts = dict()
+    for i in range(width):
+        kind = rng.randint(0, 9)
+        if kind < 3 and depth > 0:
+            facts['key%d' % i] = random_facts(rng, width, depth - 1)
+        elif kind < 6:
+            facts['key%d' % i] = rng.choice(['a', 'b', 1, 2, True, None, '', ['x', 'y']])
+        elif kind == 6:
+            facts['named_certificates'] = [{'certfile': 'c%d' % rng.randint(0, 3)}
+                                           for _ in range(rng.randint(0, 3))]
+        elif kind == 7:
+            facts['admission_plugin_config'] = rng.choice(['{"a": true}', {'b': {'c': 1}}])
+        elif kind == 8:
+            facts['master_count'] = rng.choice([1, 3, '3', '', None])
+        else:
+            facts['ha'] = rng.choice([True, 'true', 'false'])
+    return facts
+
+
+def merge(merge_func, orig, new, additive, protected):
+    try:
+        return merge_func(orig, new, additive, protected)
+    except FailJson as err:
+        return ('failed', str(err))
+    except (TypeError, ValueError) as err:
+        # invalid master_count values fail the same way in both
+        return ('error', type(err).__name__)
+
+
+class MergeFactsTests(unittest.TestCase):
+
+    def setUp(self):
+        openshift_facts.module = FakeModule()
+
+    def assertEquivalent(self, orig, new, additive=None, protected=None):
+        additive = additive or []
+        protected = protected or []
+        orig_copy = copy.deepcopy(orig)
+        new_copy = copy.deepcopy(new)
+        expected = merge(legacy_merge_facts, orig, new, additive, protected)
+        self.assertEqual(expected, merge(openshift_facts.merge_facts, orig, new, additive, protected))
+        # inputs are shared, never modified
+        self.assertEqual(orig_copy, orig)
+        self.assertEqual(new_copy, new)
+
+    def test_named_certificates(self):
+        orig = {'master': {'named_certificates': [{'certfile': 'a'}], 'api_port': '8443'}}
+        new = {'master': {'named_certificates': [{'certfile': 'b'}, {'certfile': 'a'}]}}
+        self.assertEquivalent(orig, new)
+        self.assertEquivalent(orig, new, additive=['master.named_certificates'])
+
+    def test_protected_facts(self):
+        orig = {'master': {'master_count': '3', 'ha': True}}
+        self.assertEquivalent(orig, {'master': {'master_count': '5', 'ha': 'true'}})
+        self.assertEquivalent(orig, {'master': {'master_count': '1'}})
+        self.assertEquivalent(orig, {'master': {'master_count': '1', 'ha': False}},
+                              protected=['master.master_count', 'master.ha'])
+        self.assertEquivalent(orig, {'master': {'ha': False}})
+
+    def test_inventory_json_facts(self):
+        orig = {'master': {'admission_plugin_config': {'a': {'b': 1}}}}
+        self.assertEquivalent(orig, {'master': {'admission_plugin_config': '{"c": true}'}})
+        self.assertEquivalent({}, {'image_policy_config': '{"d": false}'})
+
+    def test_overwrite_paths_only_apply_below_their_prefix(self):
+        orig = {'master': {'named_certificates': ['a']}, 'node': {'named_certificates': ['b']}}
+        new = {'master': {'named_certificates': ['c']}, 'node': {'named_certificates': ['d']}}
+        self.assertEquivalent(orig, new, additive=['master.named_certificates'])
+        self.assertEquivalent(orig, new, additive=['named_certificates'])
+
+    def test_random_documents(self):
+        rng = random.Random(4242)
+        paths = ['master.named_certificates', 'master.master_count', 'key1.ha',
+                 'key2.key3.named_certificates', 'ha', 'master_count']
+        for _ in range(300):
+            orig = random_facts(rng, 6, 3)
+            new = random_facts(rng, 6, 3)
+            # merge into subtrees that exist on both sides as well
+            new['master'] = random_facts(rng, 5, 2)
+            orig['master'] = random_facts(rng, 5, 2)
+            self.assertEquivalent(orig, new,
+                                  rng.sample(paths, rng.randint(0, 3)),
+                                  rng.sample(paths, rng.randint(0, 3)))
+
+    def test_unchanged_subtrees_are_shared(self):
+        orig = {'common': {'hostname': 'a'}, 'hosted': {'metrics': {'deploy': False}}}
+        new = {'common': {'hostname': 'b'}, 'node': {'labels': {'region': 'infra'}}}
+        facts = openshift_facts.merge_facts(orig, new, [], [])
+        self.assertIs(orig['hosted'], facts['hosted'])
+        self.assertIs(new['node'], facts['node'])
+        self.assertIsNot(orig['common'], facts['common'])
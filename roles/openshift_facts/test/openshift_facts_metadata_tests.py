@@ -0,0 +1,187 @@
+""" Tests for the provider metadata walker of the openshift_facts module. """
+# pylint: disable=missing-docstring,invalid-name
+
+import os
+import sys
+import threading
+import time
+import unittest
+
+from six.moves import BaseHTTPServer, socketserver
+
+sys.path = [os.path.abspath(os.path.dirname(__file__) + "/../library/")] + sys.path
+
+# pylint: disable=import-error
+import openshift_facts  # noqa: E402
+
+AWS_METADATA = {
+    'ami-id': 'ami-12345',
+    'block-device-mapping': {'ami': '/dev/sda1', 'root': '/dev/sda1'},
+    'hostname': 'ip-10-0-0-5.ec2.internal',
+    'instance-id': 'i-0123456789',
+    'instance-type': 'm4.large',
+    'local-hostname': 'ip-10-0-0-5.ec2.internal',
+    'local-ipv4': '10.0.0.5',
+    'public-hostname': 'ec2-52-0-0-5.compute-1.amazonaws.com',
+    'public-ipv4': '52.0.0.5',
+    'placement': {'availability-zone': 'us-east-1a'},
+    'public-keys': {'0': {'openssh-key': 'ssh-rsa AAAA'}},
+    'security-groups': 'default',
+    'network': {
+        'interfaces': {
+            'macs': {
+                '0e:00:00:00:00:01': {
+                    'device-number': '0',
+                    'local-hostname': 'ip-10-0-0-5.ec2.internal',
+                    'local-ipv4s': '10.0.0.5',
+                    'mac': '0e:00:00:00:00:01',
+                    'public-ipv4s': '52.0.0.5',
+                    'security-group-ids': 'sg-1',
+                    'subnet-id': 'subnet-1',
+                    'vpc-id': 'vpc-1'
+                },
+                '0e:00:00:00:00:02': {
+                    'device-number': '1',
+                    'local-ipv4s': ['10.0.1.5', '10.0.1.6'],
+                    'mac': '0e:00:00:00:00:02',
+                    'subnet-id': 'subnet-2',
+                    'vpc-id': 'vpc-1'
+                }
+            }
+        }
+    }
+}
+
+
+class FakeMetadataServer(object):
+    """ Local stand-in for an EC2 style metadata service
+
+        Serves `tree` below /latest/meta-data/ over keep-alive HTTP/1.1,
+        optionally delaying every response, and counts requests and
+        connections.
+    """
+    def __init__(self, tree, latency=0):
+        self.tree = tree
+        self.latency = latency
+        self.requests = []
+        self.connections = 0
+        fake = self
+
+        class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                fake.connections += 1
+                BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+
+            def do_GET(self):
+                fake.requests.append(self.path)
+                time.sleep(fake.latency)
+                body = fake.lookup(self.path)
+                status = 200
+                if body is None:
+                    status, body = 404, 'Not Found'
+                body = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *_):
+                pass
+
+        class Server(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+            daemon_threads = True
+
+        self.server = Server(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:%d/latest/meta-data/' % self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, kwargs={'poll_interval': 0.05})
+        self.thread.daemon = True
+
+    def lookup(self, path):
+        prefix = '/latest/meta-data/'
+        if not path.startswith(prefix):
+            return None
+        node = self.tree
+        for key in [k for k in path[len(prefix):].split('/') if k]:
+            if not isinstance(node, dict) or key not in node:
+                return None
+            node = node[key]
+        if isinstance(node, dict):
+            return '\n'.join(k + '/' if isinstance(v, dict) else k
+                             for k, v in sorted(node.items()))
+        if isinstance(node, list):
+            return '\n'.join(node)
+        return node
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *_):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class MetadataWalkerTests(unittest.TestCase):
+
+    def setUp(self):
+        openshift_facts.profiler = openshift_facts.OpenShiftFactsProfiler()
+
+    def test_allowlisted_walk(self):
+        with FakeMetadataServer(AWS_METADATA) as server:
+            metadata = openshift_facts.walk_metadata(server.url,
+                                                     allowlist=openshift_facts.AWS_METADATA_KEYS)
+        self.assertEqual('i-0123456789', metadata['instance-id'])
+        self.assertEqual('us-east-1a', metadata['placement']['availability-zone'])
+        self.assertNotIn('ami-id', metadata)
+        self.assertNotIn('public-keys', metadata)
+        macs = metadata['network']['interfaces']['macs']
+        self.assertEqual({'device-number': '1', 'local-ipv4s': ['10.0.1.5', '10.0.1.6'],
+                          'subnet-id': 'subnet-2', 'vpc-id': 'vpc-1'},
+                         macs['0e:00:00:00:00:02'])
+        self.assertEqual(len(server.requests), openshift_facts.profiler.http_request_count)
+
+    def test_allowlisted_walk_normalizes(self):
+        with FakeMetadataServer(AWS_METADATA) as server:
+            metadata = openshift_facts.walk_metadata(server.url,
+                                                     allowlist=openshift_facts.AWS_METADATA_KEYS)
+        facts = openshift_facts.normalize_provider_facts('aws', metadata)
+        self.assertEqual('10.0.0.5', facts['network']['ip'])
+        self.assertEqual('ec2-52-0-0-5.compute-1.amazonaws.com', facts['network']['public_hostname'])
+        self.assertEqual(['vpc', 'vpc'], [i['network_type'] for i in facts['network']['interfaces']])
+        self.assertEqual(['10.0.0.5'], facts['network']['interfaces'][0]['ips'])
+
+    def test_full_walk(self):
+        with FakeMetadataServer(AWS_METADATA) as server:
+            metadata = openshift_facts.walk_metadata(server.url)
+            full_requests = len(server.requests)
+        self.assertEqual('ami-12345', metadata['ami-id'])
+        self.assertEqual({'ami': '/dev/sda1', 'root': '/dev/sda1'}, metadata['block-device-mapping'])
+        # public-keys/ is fetched as a value, never walked
+        self.assertEqual('0/', metadata['public-keys/'])
+
+        with FakeMetadataServer(AWS_METADATA) as server:
+            openshift_facts.walk_metadata(server.url, allowlist=openshift_facts.AWS_METADATA_KEYS)
+            self.assertLess(len(server.requests), full_requests)
+
+    def test_connections_are_reused(self):
+        with FakeMetadataServer(AWS_METADATA, latency=0.01) as server:
+            walker = openshift_facts.MetadataWalker(server.url, workers=4)
+            start = time.time()
+            walker.walk()
+            elapsed = time.time() - start
+        self.assertLessEqual(server.connections, 4)
+        # requests overlap, so the walk takes less than their summed latency
+        self.assertLess(elapsed, len(server.requests) * server.latency)
+
+    def test_max_depth(self):
+        with FakeMetadataServer(AWS_METADATA) as server:
+            metadata = openshift_facts.MetadataWalker(server.url, max_depth=1).walk()
+        self.assertEqual({}, metadata['network'])
+
+    def test_metadata_unavailable(self):
+        with FakeMetadataServer({}) as server:
+            url = server.url.replace('/latest/meta-data/', '/missing/')
+            self.assertIsNone(openshift_facts.get_provider_metadata(url))
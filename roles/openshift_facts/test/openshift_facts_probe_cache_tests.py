@@ -0,0 +1,80 @@
+""" Tests for the probe cache of the openshift_facts module. """
+# pylint: disable=missing-docstring,invalid-name
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path = [os.path.abspath(os.path.dirname(__file__) + "/../library/")] + sys.path
+
+# pylint: disable=import-error
+import openshift_facts  # noqa: E402
+
+
+class Probe(object):
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.value
+
+
+class ProbeCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'openshift_probes.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_reused_while_signature_matches(self):
+        cache = openshift_facts.ProbeCache()
+        probe = Probe('3.5.0')
+        self.assertEqual('3.5.0', cache.get('version', [1], probe))
+        self.assertEqual('3.5.0', cache.get('version', [1], probe))
+        self.assertEqual(1, probe.calls)
+        cache.get('version', [2], probe)
+        self.assertEqual(2, probe.calls)
+
+    def test_file_signature_tracks_changes(self):
+        path = os.path.join(self.tmpdir, 'openshift')
+        self.assertIsNone(openshift_facts.file_signature(path))
+        with open(path, 'w') as binary:
+            binary.write('v1')
+        first = openshift_facts.file_signature(path)
+        with open(path, 'w') as binary:
+            binary.write('v1.1')
+        self.assertNotEqual(first, openshift_facts.file_signature(path))
+
+    def test_ttl_and_refresh(self):
+        cache = openshift_facts.ProbeCache()
+        probe = Probe({'name': 'aws'})
+        cache.get('provider_facts', ['uuid'], probe, ttl=3600)
+        cache.get('provider_facts', ['uuid'], probe, ttl=3600)
+        self.assertEqual(1, probe.calls)
+        cache.entries['provider_facts']['time'] -= 3601
+        cache.get('provider_facts', ['uuid'], probe, ttl=3600)
+        self.assertEqual(2, probe.calls)
+        cache.get('provider_facts', ['uuid'], probe, ttl=3600, refresh=True)
+        self.assertEqual(3, probe.calls)
+
+    def test_persisted(self):
+        cache = openshift_facts.ProbeCache(self.filename)
+        cache.get('rpms:chrony', [[1, 2.5, 3]], Probe(['chrony']))
+        cache.save()
+        self.assertFalse(cache.changed)
+
+        probe = Probe([])
+        reloaded = openshift_facts.ProbeCache(self.filename)
+        self.assertEqual(['chrony'], reloaded.get('rpms:chrony', [[1, 2.5, 3]], probe))
+        self.assertEqual(0, probe.calls)
+
+    def test_corrupt_cache_is_ignored(self):
+        with open(self.filename, 'w') as cache_file:
+            cache_file.write('{not json')
+        self.assertEqual({}, openshift_facts.ProbeCache(self.filename).entries)
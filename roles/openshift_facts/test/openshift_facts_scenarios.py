@@ -0,0 +1,325 @@
+""" Recorded host scenarios driving the openshift_facts module off-host.
+
+Each scenario replays the openshift_facts calls a playbook makes on one kind
+of host, with the system facts recorded from such a host (fixtures/), stubbed
+commands, systemd and files, a local fake metadata service and a fake docker
+socket. Shared by the benchmark and the scenario regression tests.
+"""
+# pylint: disable=missing-docstring,invalid-name,too-few-public-methods
+
+import copy
+import functools
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+sys.path = [os.path.abspath(os.path.dirname(__file__))] + sys.path
+sys.path = [os.path.abspath(os.path.dirname(__file__) + "/../library/")] + sys.path
+
+# pylint: disable=import-error,wrong-import-position
+import openshift_facts  # noqa: E402
+from openshift_facts_docker_tests import FakeDockerSocket  # noqa: E402
+from openshift_facts_metadata_tests import AWS_METADATA, FakeMetadataServer  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+EC2_METADATA_URL = 'http://169.254.169.254/latest/meta-data/'
+
+OPENSHIFT_VERSION_OUTPUT = 'openshift v3.5.5.5\nkubernetes v1.5.2+43a9be4\netcd 3.1.0\n'
+
+ENTERPRISE_RPMS = ['atomic-openshift', 'atomic-openshift-clients', 'atomic-openshift-master',
+                   'atomic-openshift-node', 'atomic-openshift-sdn-ovs',
+                   'tuned-profiles-atomic-openshift-node']
+
+
+def load_system_facts(name):
+    with open(os.path.join(FIXTURES, 'system_facts_%s.json' % name)) as facts_file:
+        return json.load(facts_file)
+
+
+class Scenario(object):
+    """ The openshift_facts calls made on one kind of host
+
+        Args:
+            name (str): scenario name, also names the system facts fixture
+            calls (list): (role, local_facts) of each openshift_facts call
+            files (dict): content of the files present on the host, None
+                          for files which are only checked for
+            installed_rpms (list): installed packages
+            active_units (list): active systemd units
+            provider (str): 'aws' to serve the EC2 metadata, None otherwise
+    """
+    # pylint: disable=too-many-arguments
+    def __init__(self, name, calls, files=None, installed_rpms=None, active_units=None, provider=None):
+        self.name = name
+        self.calls = calls
+        self.files = files or {}
+        self.installed_rpms = installed_rpms or []
+        self.active_units = active_units or []
+        self.provider = provider
+        self.system_facts = load_system_facts(name)
+
+
+def common_call(hostname, **local_facts):
+    facts = dict(debug_level=2, deployment_type='openshift-enterprise', cluster_id='default',
+                 hostname=hostname, ip=None, public_hostname=None, public_ip=None,
+                 portal_net=None, http_proxy=None, https_proxy=None, no_proxy=None,
+                 generate_no_proxy_hosts=True, sdn_network_plugin_name=None,
+                 use_openshift_sdn=None)
+    facts.update(local_facts)
+    return ('common', facts)
+
+
+MASTER_CALL = ('master', dict(
+    api_port='8443', api_url=None, api_use_ssl=None, public_api_url=None,
+    console_path=None, console_port='8443', console_url=None, console_use_ssl=None,
+    public_console_url=None, portal_net=None, session_max_seconds=None,
+    session_name=None, session_secrets_file=None, access_token_max_seconds=None,
+    auth_token_max_seconds=None, dynamic_provisioning_enabled=True,
+    embedded_etcd=False, etcd_hosts=['etcd1.example.com', 'etcd2.example.com', 'etcd3.example.com'],
+    etcd_port='2379', etcd_use_ssl=True, cluster_method='native', cluster_hostname='master.example.com',
+    named_certificates=[{'certfile': '/etc/origin/master/named_certificates/master.crt',
+                         'keyfile': '/etc/origin/master/named_certificates/master.key',
+                         'names': ['master.example.com']}],
+    identity_providers=[{'name': 'htpasswd_auth', 'login': 'true', 'challenge': 'true',
+                         'kind': 'HTPasswdPasswordIdentityProvider',
+                         'filename': '/etc/origin/master/htpasswd'}],
+    master_count='3', controller_args=None, api_server_args=None))
+
+NODE_CALL = ('node', dict(
+    labels={'region': 'primary', 'zone': 'east'}, annotations={}, kubelet_args=None,
+    iptables_sync_period='30s', sdn_mtu=None, schedulable=None, local_quota_per_fsgroup=None))
+
+DOCKER_CALL = ('docker', dict(
+    additional_registries='registry.example.com', insecure_registries='', blocked_registries='',
+    log_driver='journald', log_options=None, options=None, disable_push_dockerhub=None,
+    selinux_enabled=True, hosted_registry_insecure=False))
+
+ETCD_CALL = ('etcd', dict(etcd_data_dir=None))
+
+SCENARIOS = [
+    Scenario('master',
+             calls=[common_call('ip-10-0-0-5.ec2.internal'), MASTER_CALL, NODE_CALL, DOCKER_CALL],
+             files={'/usr/bin/openshift': None, '/etc/origin': None, '/var/lib/origin': None},
+             installed_rpms=ENTERPRISE_RPMS,
+             active_units=['docker.service', 'openvswitch.service', 'atomic-openshift-master-api.service',
+                           'atomic-openshift-master-controllers.service', 'atomic-openshift-node.service'],
+             provider='aws'),
+    Scenario('node',
+             calls=[common_call('node1.example.com'), NODE_CALL, DOCKER_CALL],
+             files={'/usr/bin/openshift': None, '/etc/origin': None, '/var/lib/origin': None},
+             installed_rpms=[rpm for rpm in ENTERPRISE_RPMS if rpm != 'atomic-openshift-master'],
+             active_units=['docker.service', 'openvswitch.service', 'atomic-openshift-node.service']),
+    Scenario('etcd',
+             calls=[common_call('etcd1.example.com'), ETCD_CALL],
+             files={'/etc/etcd/etcd.conf': 'ETCD_NAME=etcd1.example.com\n'
+                                           'ETCD_DATA_DIR=/var/lib/etcd/\n'
+                                           'ETCD_LISTEN_CLIENT_URLS=https://192.168.10.31:2379\n'},
+             installed_rpms=['etcd'],
+             active_units=['etcd.service']),
+    Scenario('containerized',
+             calls=[common_call('ip-10-0-1-7.ec2.internal', is_containerized=True), NODE_CALL, DOCKER_CALL],
+             files={'/run/ostree-booted': None, '/etc/origin': None, '/var/lib/origin': None,
+                    '/etc/sysconfig/atomic-openshift-node': 'OPTIONS=--loglevel=2\n'
+                                                            'CONFIG_FILE=/etc/origin/node/node-config.yaml\n'
+                                                            'IMAGE_VERSION=v3.5.5.5\n'},
+             active_units=['docker.service', 'atomic-openshift-node.service'],
+             provider='aws'),
+]
+
+
+class ScenarioFailed(Exception):
+    pass
+
+
+class ScenarioModule(object):
+    """ AnsibleModule stand-in answering commands from the scenario """
+    check_mode = False
+
+    def __init__(self, scenario):
+        self.scenario = scenario
+        self.commands = []
+
+    def run_command(self, args, **_):
+        if not isinstance(args, list):
+            args = args.split()
+        self.commands.append(args)
+        if args[:2] == ['hostname', '-f']:
+            return 0, self.scenario.system_facts['ansible_fqdn'] + '\n', ''
+        if args[0] == 'rpm' and '-q' in args:
+            names = [arg for arg in args[1:] if not arg.startswith('-') and arg != '%{NAME}\\n']
+            lines = [name if name in self.scenario.installed_rpms else 'package %s is not installed' % name
+                     for name in names]
+            return 0, '\n'.join(lines) + '\n', ''
+        if args[0] in self.scenario.files and args[1:] == ['version']:
+            return 0, OPENSHIFT_VERSION_OUTPUT, ''
+        return 127, '', '%s: command not found' % args[0]
+
+    @staticmethod
+    def fail_json(**kwargs):
+        raise ScenarioFailed(kwargs['msg'])
+
+
+class ScenarioHostProbes(openshift_facts.HostProbes):
+    """ Host probes answered from the files of the scenario """
+    def __init__(self, files):
+        super(ScenarioHostProbes, self).__init__()
+        self.files = files
+
+    def path_exists(self, path):
+        return self.probe('path_exists', path,
+                          lambda p: p in self.files or any(f.startswith(p + '/') for f in self.files))
+
+    def is_file(self, path):
+        return self.probe('is_file', path, lambda p: p in self.files)
+
+    def read_file(self, path):
+        return self.probe('read_file', path, self.files.get)
+
+
+class FakeSystemBus(object):
+    def __init__(self, active_units):
+        self.active_units = active_units
+
+    @staticmethod
+    def get_object(bus_name, object_path):
+        return (bus_name, object_path)
+
+    def ListUnitsByNames(self, names):
+        return [(name, '', 'loaded', 'active' if name in self.active_units else 'inactive', '', '', '', 0, '', '/')
+                for name in names]
+
+
+class FakeDBusException(Exception):
+    pass
+
+
+class ScenarioEnvironment(object):
+    """ Points the openshift_facts module globals at the scenario stubs
+
+        Args:
+            scenario (Scenario): scenario to run
+            probe_cache (ProbeCache): probe cache to start from, None for an
+                                      empty one
+    """
+    patched = ('module', 'ansible_facts', 'get_all_facts', 'get_file_content',
+               'get_provider_metadata', 'get_docker_api_version_info', 'SystemBus',
+               'Interface', 'DBusException', 'systemd_units', 'host_probes', 'probe_cache',
+               'profiler')
+
+    def __init__(self, scenario, probe_cache=None):
+        self.scenario = scenario
+        self.probe_cache = probe_cache or openshift_facts.ProbeCache()
+        self.tmpdir = None
+        self.metadata = None
+        self.docker = None
+        self.originals = {}
+        self.fact_file = None
+
+    def __enter__(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.fact_file = os.path.join(self.tmpdir, 'facts.d', 'openshift.fact')
+        self.originals = dict((name, getattr(openshift_facts, name, None)) for name in self.patched)
+        self.docker = FakeDockerSocket(os.path.join(self.tmpdir, 'docker.sock')).__enter__()
+        if self.scenario.provider == 'aws':
+            self.metadata = FakeMetadataServer(AWS_METADATA).__enter__()
+
+        scenario = self.scenario
+
+        def ansible_facts(*_):
+            # ansible >= 2.2 only provides get_all_facts
+            raise UnboundLocalError()
+
+        def get_all_facts(_):
+            return dict(ansible_facts=copy.deepcopy(scenario.system_facts))
+
+        def get_file_content(path, default=None, strip=True):  # pylint: disable=unused-argument
+            if path.endswith('/product_uuid'):
+                return scenario.system_facts['ansible_product_uuid']
+            return default
+
+        def get_provider_metadata(metadata_url, *args, **kwargs):
+            if self.metadata is not None:
+                metadata_url = metadata_url.replace(EC2_METADATA_URL, self.metadata.url)
+            return self.originals['get_provider_metadata'](metadata_url, *args, **kwargs)
+
+        bus = FakeSystemBus(scenario.active_units)
+        openshift_facts.ansible_facts = ansible_facts
+        openshift_facts.get_all_facts = get_all_facts
+        openshift_facts.get_file_content = get_file_content
+        openshift_facts.get_provider_metadata = get_provider_metadata
+        openshift_facts.get_docker_api_version_info = functools.partial(
+            self.originals['get_docker_api_version_info'], os.path.join(self.tmpdir, 'docker.sock'))
+        openshift_facts.SystemBus = lambda: bus
+        openshift_facts.Interface = lambda obj, dbus_interface: bus
+        openshift_facts.DBusException = FakeDBusException
+        openshift_facts.probe_cache = self.probe_cache
+        return self
+
+    def new_module_run(self):
+        """ Reset the per process state, as every module call is a new process """
+        module = ScenarioModule(self.scenario)
+        openshift_facts.module = module
+        openshift_facts.systemd_units = openshift_facts.SystemdUnits()
+        openshift_facts.host_probes = ScenarioHostProbes(self.scenario.files)
+        openshift_facts.profiler = openshift_facts.OpenShiftFactsProfiler(enabled=True)
+        openshift_facts.profiler.attach(module)
+        return module
+
+    def __exit__(self, *_):
+        for name, value in self.originals.items():
+            setattr(openshift_facts, name, value)
+        if self.metadata is not None:
+            self.metadata.__exit__()
+        self.docker.__exit__()
+        shutil.rmtree(self.tmpdir)
+
+
+def run_scenario(scenario, probe_cache=None, trace_allocations=False):
+    """ Run the openshift_facts calls of a scenario
+
+        Args:
+            scenario (Scenario): scenario to run
+            probe_cache (ProbeCache): probe cache left by an earlier run, None
+                                      to start cold
+            trace_allocations (bool): record the allocation peak, which
+                                      slows the run down noticeably
+        Returns:
+            tuple: the metrics of the run, the openshift facts returned by
+                   the last call and the probe cache
+    """
+    metrics = dict(wall_time=0.0, subprocesses=0, http_requests=0, peak_kib=None, stages={})
+    facts = None
+    with ScenarioEnvironment(scenario, probe_cache) as env:
+        for role, local_facts in scenario.calls:
+            env.new_module_run()
+            tracing = trace_allocations and tracemalloc is not None
+            if tracing:
+                tracemalloc.start()
+            start = time.time()
+            facts = openshift_facts.OpenShiftFacts(role, env.fact_file, copy.deepcopy(local_facts),
+                                                   additive_facts_to_overwrite=[],
+                                                   openshift_env={},
+                                                   openshift_env_structures=[],
+                                                   protected_facts_to_overwrite=[]).facts
+            metrics['wall_time'] += time.time() - start
+            if tracing:
+                peak = tracemalloc.get_traced_memory()[1] // 1024
+                tracemalloc.stop()
+                metrics['peak_kib'] = max(metrics['peak_kib'] or 0, peak)
+
+            results = openshift_facts.profiler.results()
+            metrics['subprocesses'] += results['subprocesses']
+            metrics['http_requests'] += results['http_requests']
+            for stage in results['stages']:
+                metrics['stages'][stage['name']] = metrics['stages'].get(stage['name'], 0) + stage['wall_time']
+        probe_cache = env.probe_cache
+    return metrics, facts['openshift'], probe_cache
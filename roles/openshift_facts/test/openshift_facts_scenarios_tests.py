@@ -0,0 +1,62 @@
+""" Regression tests running the recorded host scenarios of the openshift_facts module. """
+# pylint: disable=missing-docstring,invalid-name
+
+import os
+import sys
+import unittest
+
+sys.path = [os.path.abspath(os.path.dirname(__file__))] + sys.path
+
+# pylint: disable=import-error,wrong-import-position
+from openshift_facts_scenarios import SCENARIOS, run_scenario  # noqa: E402
+
+# Most subprocesses and HTTP requests allowed for each scenario, cold (empty
+# probe cache) and warm. Lower these when an optimization lands, raising them
+# needs a good reason.
+BUDGETS = {
+    'master': dict(cold=(6, 23), warm=(4, 0)),
+    'node': dict(cold=(5, 1), warm=(3, 0)),
+    'etcd': dict(cold=(3, 1), warm=(2, 0)),
+    'containerized': dict(cold=(3, 23), warm=(3, 0)),
+}
+
+
+class ScenarioTests(unittest.TestCase):
+
+    def run_scenarios(self):
+        for scenario in SCENARIOS:
+            cold, facts, probe_cache = run_scenario(scenario)
+            warm, warm_facts, _ = run_scenario(scenario, probe_cache)
+            yield scenario, cold, warm, facts, warm_facts
+
+    def test_budgets(self):
+        for scenario, cold, warm, _, _ in self.run_scenarios():
+            for state, metrics in (('cold', cold), ('warm', warm)):
+                subprocesses, http_requests = BUDGETS[scenario.name][state]
+                self.assertLessEqual(metrics['subprocesses'], subprocesses, (scenario.name, state))
+                self.assertLessEqual(metrics['http_requests'], http_requests, (scenario.name, state))
+
+    def test_warm_facts_match_cold_facts(self):
+        for scenario, _, _, facts, warm_facts in self.run_scenarios():
+            self.assertEqual(facts, warm_facts, scenario.name)
+
+    def test_generated_facts(self):
+        facts = dict((scenario.name, facts) for scenario, _, _, facts, _ in self.run_scenarios())
+        self.assertEqual('aws', facts['master']['provider']['name'])
+        self.assertEqual('52.0.0.5', facts['master']['common']['public_ip'])
+        self.assertEqual('3.5.5.5', facts['master']['common']['version'])
+        self.assertEqual('https://ec2-52-0-0-5.compute-1.amazonaws.com:8443',
+                         facts['master']['master']['public_api_url'])
+        self.assertIn('atomic-openshift-master', facts['master']['common']['installed_variant_rpms'])
+        self.assertEqual('8951', facts['master']['node']['sdn_mtu'])
+        self.assertTrue(facts['node']['common']['services']['atomic-openshift-node']['running'])
+        self.assertEqual('1.12.6', facts['node']['docker']['version'])
+        self.assertNotIn('provider', facts['node'])
+        self.assertFalse(facts['etcd']['common']['services']['docker']['running'])
+        self.assertTrue(facts['containerized']['common']['is_atomic'])
+        self.assertEqual('3.5.5.5', facts['containerized']['common']['version'])
+        self.assertEqual('/usr/local/bin/oc', facts['containerized']['common']['client_binary'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+""" Tests for the role scoped fact stage planning of the openshift_facts module. """
+# pylint: disable=missing-docstring,invalid-name
+
+import copy
+import os
+import sys
+import unittest
+
+sys.path = [os.path.abspath(os.path.dirname(__file__) + "/../library/")] + sys.path
+
+# pylint: disable=import-error
+import openshift_facts  # noqa: E402
+
+
+class FakeModule(object):
+    @staticmethod
+    def run_command(*_, **__):
+        return 1, '', ''
+
+
+class FakeSystemdUnits(object):
+    @staticmethod
+    def unit_states(units):
+        return dict((unit, dict(load_state='loaded', active_state='active')) for unit in units)
+
+
+SYSTEM_FACTS = {'ansible_eth0': {'mtu': 1500, 'ipv4': {'address': '10.0.0.5'}}}
+
+MERGED_FACTS = {
+    'common': dict(use_openshift_sdn=True, ip='10.0.0.5', public_ip='10.0.0.5',
+                   deployment_type='origin', deployment_subtype='basic',
+                   hostname='master1.example.com', public_hostname='master1.example.com',
+                   portal_net='172.30.0.0/16', client_binary='oc', admin_binary='oadm',
+                   dns_domain='cluster.local', install_examples=True, debug_level=2,
+                   is_containerized=False, http_proxy='http://proxy:3128'),
+    'master': dict(api_use_ssl=True, api_port='8443', controllers_port='8444',
+                   console_use_ssl=True, console_path='/console', console_port='8443',
+                   etcd_use_ssl=True, etcd_hosts=['etcd1.example.com'], etcd_port='2379',
+                   embedded_etcd=True, bind_addr='0.0.0.0'),
+    'node': dict(labels={'region': 'infra'}, annotations={}, iptables_sync_period='30s'),
+    'etcd': dict(),
+    'docker': dict(disable_push_dockerhub=False),
+    'hosted': dict(router=dict()),
+    'cloudprovider': dict(kind='aws'),
+}
+
+
+def run_stages(stages):
+    facts = copy.deepcopy(MERGED_FACTS)
+    for stage in stages:
+        if stage.when is not None and not stage.when(facts):
+            continue
+        if stage.system_facts:
+            facts = stage.func(facts, SYSTEM_FACTS)
+        else:
+            facts = stage.func(facts)
+    return facts
+
+
+def stage_names(stages):
+    return [stage.func.__name__ for stage in stages]
+
+
+class FactStagesTests(unittest.TestCase):
+
+    def setUp(self):
+        openshift_facts.module = FakeModule()
+        openshift_facts.probe_cache = openshift_facts.ProbeCache()
+        openshift_facts.systemd_units = FakeSystemdUnits()
+        openshift_facts.host_probes = openshift_facts.HostProbes()
+
+    def test_etcd_skips_master_and_node_stages(self):
+        names = stage_names(openshift_facts.plan_fact_stages(openshift_facts.FACT_STAGES, ['common', 'etcd']))
+        self.assertIn('set_etcd_facts_if_unset', names)
+        # etcd.etcd_data_dir depends on master.embedded_etcd
+        self.assertIn('set_url_facts_if_unset', names)
+        for skipped in ('build_kubelet_args', 'build_api_server_args', 'set_identity_providers_if_unset',
+                        'set_nodename', 'set_selectors', 'set_current_config_facts'):
+            self.assertNotIn(skipped, names)
+
+    def test_node_plan(self):
+        names = stage_names(openshift_facts.plan_fact_stages(openshift_facts.FACT_STAGES, ['common', 'node']))
+        self.assertIn('build_kubelet_args', names)
+        self.assertIn('set_nodename', names)
+        self.assertNotIn('build_controller_args', names)
+
+    def test_plan_keeps_execution_order(self):
+        plan = openshift_facts.plan_fact_stages(openshift_facts.FACT_STAGES, ['common', 'master'])
+        order = [openshift_facts.FACT_STAGES.index(stage) for stage in plan]
+        self.assertEqual(sorted(order), order)
+
+    def test_scoped_facts_match_full_generation(self):
+        full = run_stages(openshift_facts.FACT_STAGES)
+        for role in openshift_facts.OpenShiftFacts.known_roles:
+            scoped = run_stages(openshift_facts.plan_fact_stages(openshift_facts.FACT_STAGES, ['common', role]))
+            self.assertEqual(full['common'], scoped['common'], role)
+            self.assertEqual(full.get(role), scoped.get(role), role)
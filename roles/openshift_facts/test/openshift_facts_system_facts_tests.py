@@ -0,0 +1,71 @@
+""" Tests for the system facts read by the openshift_facts module. """
+# pylint: disable=missing-docstring,invalid-name
+
+import copy
+import json
+import os
+import sys
+import unittest
+
+sys.path = [os.path.abspath(os.path.dirname(__file__) + "/../library/")] + sys.path
+
+# pylint: disable=import-error
+import openshift_facts  # noqa: E402
+
+with open(os.path.join(os.path.dirname(__file__), 'fixtures', 'system_facts_master.json')) as fixture:
+    SETUP_FACTS = json.load(fixture)
+
+
+class SystemFactsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.gathered = []
+        self.originals = dict((name, getattr(openshift_facts, name))
+                              for name in ('ansible_facts', 'get_all_facts', 'get_file_content'))
+
+        def ansible_facts(*_):
+            raise UnboundLocalError()
+
+        def get_all_facts(_):
+            self.gathered.append(True)
+            facts = dict((key, value) for key, value in SETUP_FACTS.items()
+                         if not key.startswith('ansible_product'))
+            return dict(ansible_facts=facts)
+
+        def get_file_content(path, default=None):
+            return {'/sys/devices/virtual/dmi/id/product_name': 'HVM domU'}.get(path, default)
+
+        openshift_facts.ansible_facts = ansible_facts
+        openshift_facts.get_all_facts = get_all_facts
+        openshift_facts.get_file_content = get_file_content
+        openshift_facts.module = None
+
+    def tearDown(self):
+        for name, value in self.originals.items():
+            setattr(openshift_facts, name, value)
+
+    def test_supplied_facts_are_used(self):
+        facts = openshift_facts.OpenShiftFacts.init_system_facts(copy.deepcopy(SETUP_FACTS))
+        self.assertEqual([], self.gathered)
+        self.assertEqual('4.2.amazon', facts['ansible_product_version'])
+        self.assertEqual(SETUP_FACTS['ansible_eth0'], facts['ansible_eth0'])
+        self.assertNotIn('ansible_mounts', facts)
+
+    def test_incomplete_facts_are_gathered(self):
+        supplied = dict(ansible_default_ipv4=SETUP_FACTS['ansible_default_ipv4'])
+        facts = openshift_facts.OpenShiftFacts.init_system_facts(supplied)
+        self.assertEqual([True], self.gathered)
+        self.assertEqual('HVM domU', facts['ansible_product_name'])
+        self.assertEqual('NA', facts['ansible_product_version'])
+        self.assertEqual(SETUP_FACTS['ansible_fqdn'], facts['ansible_fqdn'])
+        self.assertEqual(SETUP_FACTS['ansible_docker0'], facts['ansible_docker0'])
+
+    def test_facts_are_gathered_when_not_supplied(self):
+        facts = openshift_facts.OpenShiftFacts.init_system_facts()
+        self.assertEqual([True], self.gathered)
+        self.assertEqual(sorted(openshift_facts.SYSTEM_FACTS + ['ansible_docker0', 'ansible_eth0', 'ansible_lo']),
+                         sorted(facts))
+
+
+if __name__ == '__main__':
+    unittest.main()
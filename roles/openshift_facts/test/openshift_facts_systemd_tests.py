@@ -0,0 +1,124 @@
+""" Tests for the systemd unit queries of the openshift_facts module. """
+# pylint: disable=missing-docstring,invalid-name
+
+import os
+import sys
+import unittest
+
+sys.path = [os.path.abspath(os.path.dirname(__file__) + "/../library/")] + sys.path
+
+# pylint: disable=import-error
+import openshift_facts  # noqa: E402
+
+
+class FakeDBusException(Exception):
+    pass
+
+
+def listed_unit(name, load_state, active_state):
+    return (name, 'description', load_state, active_state, 'running', '',
+            '/org/freedesktop/systemd1/unit/x', 0, '', '/')
+
+
+UNITS = {
+    'docker.service': listed_unit('docker.service', 'loaded', 'active'),
+    'origin-node.service': listed_unit('origin-node.service', 'loaded', 'failed'),
+    'etcd.service': listed_unit('etcd.service', 'loaded', 'inactive'),
+}
+
+
+class FakeManager(object):
+    def __init__(self, by_names=True):
+        self.by_names = by_names
+        self.calls = []
+
+    def ListUnitsByNames(self, names):
+        self.calls.append('ListUnitsByNames')
+        if not self.by_names:
+            raise FakeDBusException('org.freedesktop.DBus.Error.UnknownMethod')
+        return [UNITS.get(name, listed_unit(name, 'not-found', 'inactive')) for name in names]
+
+    def ListUnits(self):
+        self.calls.append('ListUnits')
+        return list(UNITS.values())
+
+
+class FakeBus(object):
+    connections = 0
+
+    def __init__(self):
+        FakeBus.connections += 1
+
+    @staticmethod
+    def get_object(bus_name, object_path):
+        return (bus_name, object_path)
+
+
+class SystemdUnitsTests(unittest.TestCase):
+
+    # without dbus, SystemBus, Interface and DBusException don't exist
+    patched = ['SystemBus', 'Interface', 'DBusException', 'systemd_units', 'host_probes']
+    missing = object()
+
+    def setUp(self):
+        self.saved = dict((name, getattr(openshift_facts, name, self.missing)) for name in self.patched)
+        FakeBus.connections = 0
+        self.manager = FakeManager()
+        openshift_facts.SystemBus = FakeBus
+        openshift_facts.Interface = lambda obj, dbus_interface: self.manager
+        openshift_facts.DBusException = FakeDBusException
+        openshift_facts.systemd_units = openshift_facts.SystemdUnits()
+        openshift_facts.host_probes = openshift_facts.HostProbes()
+
+    def tearDown(self):
+        for name, value in self.saved.items():
+            if value is self.missing:
+                delattr(openshift_facts, name)
+            else:
+                setattr(openshift_facts, name, value)
+
+    def test_unit_states_single_query(self):
+        states = openshift_facts.systemd_units.unit_states(['docker', 'origin-node', 'openvswitch'])
+        self.assertEqual(states['docker'], dict(load_state='loaded', active_state='active'))
+        self.assertEqual(states['origin-node'], dict(load_state='loaded', active_state='failed'))
+        self.assertEqual(states['openvswitch'], dict(load_state='not-found', active_state='inactive'))
+        self.assertEqual(self.manager.calls, ['ListUnitsByNames'])
+
+    def test_unit_states_list_units_fallback(self):
+        self.manager.by_names = False
+        states = openshift_facts.systemd_units.unit_states(['etcd.service', 'openvswitch'])
+        self.assertEqual(states['etcd.service'], dict(load_state='loaded', active_state='inactive'))
+        self.assertEqual(states['openvswitch'], dict(load_state='not-found', active_state='inactive'))
+        self.assertEqual(self.manager.calls, ['ListUnitsByNames', 'ListUnits'])
+
+    def test_connection_is_shared(self):
+        self.assertTrue(openshift_facts.is_service_running('docker'))
+        self.assertFalse(openshift_facts.is_service_running('origin-node'))
+        self.assertFalse(openshift_facts.is_service_running('docker.socket'))
+        self.assertEqual(FakeBus.connections, 1)
+
+    def test_service_facts(self):
+        facts = openshift_facts.set_service_facts({'common': {'service_type': 'origin'}})
+        services = facts['common']['services']
+        self.assertEqual(sorted(services), ['docker', 'etcd', 'openvswitch', 'origin-master',
+                                            'origin-master-api', 'origin-master-controllers',
+                                            'origin-node'])
+        self.assertTrue(services['docker']['running'])
+        self.assertFalse(services['origin-node']['running'])
+        self.assertEqual(services['origin-node']['active_state'], 'failed')
+        self.assertEqual(self.manager.calls, ['ListUnitsByNames'])
+
+    def test_service_facts_bus_unavailable(self):
+        def no_bus():
+            raise FakeDBusException('Failed to connect to socket')
+        openshift_facts.SystemBus = no_bus
+        facts = openshift_facts.set_service_facts({'common': {'service_type': 'origin'}})
+        docker = facts['common']['services']['docker']
+        self.assertEqual(docker['load_state'], 'unknown')
+        self.assertFalse(docker['running'])
+        self.assertIn('Failed to connect', docker['error'])
+        self.assertFalse(openshift_facts.is_service_running('docker'))
+
+
+if __name__ == '__main__':
+    unittest.main()